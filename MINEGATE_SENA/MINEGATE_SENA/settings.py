@@ -97,6 +97,100 @@ DATABASES = {
 POSTGRES_BIN_DIR = os.getenv("POSTGRES_BIN_DIR", "")
 
 
+# Cache compartida. Debe verse igual desde todos los procesos del servidor:
+# con REDIS_URL se usa Redis y, si no, tablas de la base de datos (crearlas una
+# vez con "python manage.py createcachetable"). CACHE_BACKEND y CACHE_LOCATION
+# permiten forzar otro backend; uno local por proceso (LocMemCache) solo sirve
+# con un único proceso.
+#
+# - default: resultados derivados que se pueden recalcular (roster de
+#   portería, visitas del día, páginas de reportes, notificaciones). Al pasar
+#   de CACHE_MAX_ENTRIES la tabla descarta una tercera parte de las entradas.
+# - coordinacion: contadores de versión (core.versiones) y cupos de los
+#   streams de portería. Son pocas claves pero no pueden perderse por un
+#   descarte: un contador reiniciado o un cupo borrado mientras está en uso
+#   dejaría pasar más streams de los permitidos. Su límite es tan alto que el
+#   descarte no llega a ocurrir.
+REDIS_URL = os.getenv("REDIS_URL", "")
+CACHE_BACKEND = os.getenv(
+    "CACHE_BACKEND",
+    "django.core.cache.backends.redis.RedisCache"
+    if REDIS_URL
+    else "django.core.cache.backends.db.DatabaseCache",
+)
+CACHE_LOCATION = os.getenv("CACHE_LOCATION", REDIS_URL or "sicam_cache")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "5000"))
+
+
+def _opciones_cache(max_entries):
+    # Redis pasa OPTIONS a su cliente y maneja el espacio por su cuenta.
+    if CACHE_BACKEND.endswith("RedisCache"):
+        return {}
+    return {"MAX_ENTRIES": max_entries, "CULL_FREQUENCY": 3}
+
+
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": CACHE_LOCATION,
+        "OPTIONS": _opciones_cache(CACHE_MAX_ENTRIES),
+    },
+    "coordinacion": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": CACHE_LOCATION
+        if CACHE_BACKEND.endswith("RedisCache")
+        else f"{CACHE_LOCATION}_coordinacion",
+        "KEY_PREFIX": "coordinacion",
+        "OPTIONS": _opciones_cache(1_000_000),
+    },
+}
+
+# Códigos QR de acceso firmados: días de validez posteriores a la fecha de la
+# visita y fecha límite (AAAA-MM-DD) para aceptar el formato anterior sin firma.
+PORTERIA_QR_VIGENCIA_DIAS = int(os.getenv("PORTERIA_QR_VIGENCIA_DIAS", "30"))
+PORTERIA_QR_LEGADO_HASTA = os.getenv("PORTERIA_QR_LEGADO_HASTA", "2027-06-30")
+
+# Pantallas de portería en vivo (Server-Sent Events). El servidor es WSGI
+# síncrono: cada pantalla conectada ocupa un worker (y su conexión a la base de
+# datos) durante PORTERIA_SSE_DURACION_SEGUNDOS, leyendo la versión de la caché
+# "coordinacion" cada PORTERIA_SSE_INTERVALO_SEGUNDOS. Esa lectura solo evita
+# la base de datos con Redis: con la caché en tablas sería una consulta por
+# stream y por segundo, así que sin REDIS_URL los streams quedan deshabilitados
+# y todas las pantallas usan el polling con ETag. Con Redis se admiten a lo
+# sumo PORTERIA_SSE_MAXIMO_STREAMS streams a la vez entre todos los procesos;
+# debe quedar bien por debajo de la cantidad de workers. Las demás pantallas
+# usan el polling, que no retiene workers.
+PORTERIA_SSE_MAXIMO_STREAMS = int(os.getenv("PORTERIA_SSE_MAXIMO_STREAMS", "4"))
+PORTERIA_SSE_DURACION_SEGUNDOS = int(os.getenv("PORTERIA_SSE_DURACION_SEGUNDOS", "55"))
+PORTERIA_SSE_INTERVALO_SEGUNDOS = int(os.getenv("PORTERIA_SSE_INTERVALO_SEGUNDOS", "1"))
+
+# Segundos durante los cuales un nuevo escaneo de la misma persona en la misma
+# visita se considera repetido y no genera otro movimiento (0 lo desactiva).
+PORTERIA_VENTANA_DUPLICADOS_SEGUNDOS = int(os.getenv("PORTERIA_VENTANA_DUPLICADOS_SEGUNDOS", "10"))
+
+# Segundos máximos que un roster de portería (incluida la respuesta "visita no
+# encontrada") se usa desde la caché. Los signals lo invalidan al cambiar la
+# visita o sus asistentes; este límite acota cuánto tarda en verse un cambio
+# que no pasó por ellos (update(), otra base de datos, caché no compartida).
+PORTERIA_ROSTER_CACHE_SEGUNDOS = int(os.getenv("PORTERIA_ROSTER_CACHE_SEGUNDOS", "60"))
+
+# Horas que se conservan los archivos generados por los trabajos de reportes.
+REPORTES_TRABAJOS_RETENCION_HORAS = int(os.getenv("REPORTES_TRABAJOS_RETENCION_HORAS", "24"))
+
+# Segundos que se conservan en caché las filas y páginas de reportes. La clave
+# incluye la versión de los datos, así que el valor solo acota la memoria.
+REPORTES_CACHE_SEGUNDOS = int(os.getenv("REPORTES_CACHE_SEGUNDOS", "600"))
+
+# Procesos del pool compartido que renderiza el PDF general en paralelo (por
+# defecto, uno por núcleo) y visitas que renderiza cada proceso por bloque.
+REPORTES_PDF_PROCESOS = int(os.getenv("REPORTES_PDF_PROCESOS", "0")) or None
+REPORTES_PDF_VISITAS_POR_BLOQUE = int(os.getenv("REPORTES_PDF_VISITAS_POR_BLOQUE", "25"))
+
+# Visitas hasta las que la descarga directa del PDF general se renderiza
+# dentro de la petición; por encima se genera como trabajo en segundo plano.
+REPORTES_PDF_MAXIMO_DIRECTO = int(os.getenv("REPORTES_PDF_MAXIMO_DIRECTO", "200"))
+
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -1,5 +1,5 @@
 ﻿from django.contrib import admin
-from .models import RegistroAccesoMina
+from .models import PresenciaMina, RegistroAccesoMina
 
 
 @admin.register(RegistroAccesoMina)
@@ -15,3 +15,17 @@ class RegistroAccesoMinaAdmin(admin.ModelAdmin):
 
     def has_change_permission(self, request, obj=None):
         return False
+
+
+@admin.register(PresenciaMina)
+class PresenciaMinaAdmin(admin.ModelAdmin):
+    list_display = ['nombre_completo', 'documento', 'visita_tipo', 'visita_id', 'ultimo_tipo', 'fecha_hora']
+    list_filter = ['ultimo_tipo', 'visita_tipo']
+    search_fields = ['documento', 'nombre_completo']
+    ordering = ['-fecha_hora']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
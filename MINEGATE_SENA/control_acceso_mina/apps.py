@@ -4,3 +4,7 @@
 class ControlAccesoMinaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'control_acceso_mina'
+
+    def ready(self):
+        """Registra los signals cuando la app está lista"""
+        import control_acceso_mina.signals  # noqa
@@ -0,0 +1,213 @@
+"""
+Pase de lista de evacuación.
+
+Lista a todas las personas cuyo último movimiento es ENTRADA, agrupadas por
+visita, leyendo solo la tabla de presencia (índice por ultimo_tipo). El costo
+depende de cuántas personas están dentro, no del tamaño del historial de
+RegistroAccesoMina. Durante el pase de lista cada persona puede marcarse como
+verificada; un nuevo movimiento de la persona borra la marca.
+"""
+
+import csv
+from io import BytesIO
+
+from django.utils import timezone
+from django.utils.html import escape
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from .models import PresenciaMina
+
+
+_TIPO_LABEL = {'interna': 'Interna', 'externa': 'Externa'}
+
+
+def _datos_visitas(ids_por_tipo):
+    """Nombre y responsable de las visitas involucradas: una consulta por tipo."""
+    datos = {}
+    if ids_por_tipo.get('interna'):
+        from visitaInterna.models import VisitaInterna
+
+        for visita in VisitaInterna.objects.filter(id__in=ids_por_tipo['interna']).values(
+            'id', 'nombre_programa', 'responsable'
+        ):
+            datos[('interna', visita['id'])] = (visita['nombre_programa'], visita['responsable'])
+
+    if ids_por_tipo.get('externa'):
+        from visitaExterna.models import VisitaExterna
+
+        for visita in VisitaExterna.objects.filter(id__in=ids_por_tipo['externa']).values(
+            'id', 'nombre', 'nombre_responsable'
+        ):
+            datos[('externa', visita['id'])] = (visita['nombre'], visita['nombre_responsable'])
+    return datos
+
+
+def obtener_personas_en_mina():
+    """
+    Retorna las personas dentro de la mina agrupadas por visita, con hora de
+    entrada y estado de verificación, más los totales del pase de lista.
+    """
+    presencias = list(
+        PresenciaMina.objects.filter(ultimo_tipo='ENTRADA').order_by(
+            'visita_tipo', 'visita_id', 'nombre_completo'
+        ).values(
+            'documento', 'nombre_completo', 'categoria', 'visita_tipo', 'visita_id',
+            'fecha_hora', 'verificado_evacuacion_en',
+        )
+    )
+
+    ids_por_tipo = {}
+    for p in presencias:
+        if p['visita_tipo'] and p['visita_id']:
+            ids_por_tipo.setdefault(p['visita_tipo'], set()).add(p['visita_id'])
+    visitas = _datos_visitas(ids_por_tipo)
+
+    grupos = {}
+    for p in presencias:
+        clave = (p['visita_tipo'], p['visita_id'])
+        if clave not in grupos:
+            nombre, responsable = visitas.get(clave, ('Sin visita asociada', ''))
+            grupos[clave] = {
+                'visita_tipo': p['visita_tipo'],
+                'visita_id': p['visita_id'],
+                'tipo_label': _TIPO_LABEL.get(p['visita_tipo'], 'Sin visita'),
+                'nombre': nombre,
+                'responsable': responsable,
+                'personas': [],
+            }
+        verificado_en = p['verificado_evacuacion_en']
+        grupos[clave]['personas'].append({
+            'documento': p['documento'],
+            'nombre_completo': p['nombre_completo'],
+            'categoria': p['categoria'],
+            'hora_entrada': timezone.localtime(p['fecha_hora']).strftime('%d/%m/%Y %H:%M:%S'),
+            'verificado': verificado_en is not None,
+            'verificado_en': timezone.localtime(verificado_en).strftime('%H:%M:%S') if verificado_en else '',
+        })
+
+    verificados = sum(1 for p in presencias if p['verificado_evacuacion_en'])
+    return {
+        'grupos': list(grupos.values()),
+        'total': len(presencias),
+        'verificados': verificados,
+        'pendientes': len(presencias) - verificados,
+        'generado': timezone.localtime().strftime('%d/%m/%Y %H:%M:%S'),
+    }
+
+
+def marcar_verificado(visita_tipo, visita_id, documento, usuario, verificado=True):
+    """
+    Marca (o desmarca) a una persona dentro de la mina como verificada en el
+    pase de lista. Retorna False si la persona no figura dentro de la mina.
+    """
+    actualizados = PresenciaMina.objects.filter(
+        visita_tipo=visita_tipo,
+        visita_id=visita_id,
+        documento=documento,
+        ultimo_tipo='ENTRADA',
+    ).update(
+        verificado_evacuacion_en=timezone.now() if verificado else None,
+        verificado_evacuacion_por=usuario if verificado else None,
+    )
+    return actualizados > 0
+
+
+def reiniciar_pase_lista():
+    """Borra todas las verificaciones para empezar un nuevo pase de lista."""
+    return PresenciaMina.objects.filter(verificado_evacuacion_en__isnull=False).update(
+        verificado_evacuacion_en=None,
+        verificado_evacuacion_por=None,
+    )
+
+
+def escribir_csv(data, destino):
+    writer = csv.writer(destino)
+    writer.writerow([
+        'Tipo visita', 'ID visita', 'Visita', 'Responsable', 'Documento',
+        'Nombre', 'Categoría', 'Hora de entrada', 'Verificado',
+    ])
+    for grupo in data['grupos']:
+        for persona in grupo['personas']:
+            writer.writerow([
+                grupo['tipo_label'],
+                grupo['visita_id'] or '',
+                grupo['nombre'],
+                grupo['responsable'],
+                persona['documento'],
+                persona['nombre_completo'],
+                persona['categoria'],
+                persona['hora_entrada'],
+                f"Sí ({persona['verificado_en']})" if persona['verificado'] else 'No',
+            ])
+
+
+def generar_pdf(data):
+    """PDF imprimible del pase de lista agrupado por visita."""
+    buffer = BytesIO()
+    documento = SimpleDocTemplate(
+        buffer,
+        pagesize=landscape(A4),
+        leftMargin=30,
+        rightMargin=30,
+        topMargin=30,
+        bottomMargin=30,
+    )
+    estilos = getSampleStyleSheet()
+    titulo_estilo = ParagraphStyle(
+        'TituloEvacuacion',
+        parent=estilos['Title'],
+        fontSize=16,
+        textColor=colors.HexColor("#b91c1c"),
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold',
+    )
+
+    elementos = [
+        Paragraph("PASE DE LISTA DE EVACUACIÓN", titulo_estilo),
+        Paragraph(
+            f"<i>Generado: {data['generado']} | Personas dentro: {data['total']} | "
+            f"Verificadas: {data['verificados']} | Pendientes: {data['pendientes']}</i>",
+            estilos["Normal"],
+        ),
+        Spacer(1, 12),
+    ]
+
+    if not data['grupos']:
+        elementos.append(Paragraph("No hay personas registradas dentro de la mina.", estilos["Normal"]))
+
+    for grupo in data['grupos']:
+        titulo = f"{grupo['tipo_label']} #{grupo['visita_id'] or '-'}: {grupo['nombre']}"
+        if grupo['responsable']:
+            titulo += f" (Responsable: {grupo['responsable']})"
+        elementos.append(Paragraph(f"<b>{escape(titulo)}</b> - {len(grupo['personas'])} personas", estilos["Normal"]))
+        elementos.append(Spacer(1, 4))
+
+        filas = [['#', 'Documento', 'Nombre', 'Categoría', 'Hora de entrada', 'Verificado']]
+        for indice, persona in enumerate(grupo['personas'], start=1):
+            filas.append([
+                indice,
+                persona['documento'],
+                persona['nombre_completo'][:60],
+                persona['categoria'][:40],
+                persona['hora_entrada'],
+                persona['verificado_en'] if persona['verificado'] else '[   ]',
+            ])
+
+        tabla = Table(filas, colWidths=[30, 100, 230, 160, 120, 90], repeatRows=1)
+        tabla.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#b91c1c")),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor("#9ca3af")),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor("#f9fafb")]),
+        ]))
+        elementos.append(tabla)
+        elementos.append(Spacer(1, 12))
+
+    documento.build(elementos)
+    return buffer.getvalue()
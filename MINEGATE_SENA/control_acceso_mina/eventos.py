@@ -0,0 +1,41 @@
+"""
+Versiones de cambio para las pantallas de portería.
+
+Cada visita y el listado de visitas de hoy tienen un contador en caché que se
+incrementa cuando cambia algo relevante (registro de acceso, asistente
+aprobado, visita confirmada o reprogramada). Los streams de eventos comparan
+ese contador para decidir si deben volver a consultar la base de datos.
+Los contadores se manejan con core.versiones.
+"""
+
+from core import versiones
+
+
+CACHE_PREFIX = 'porteria:version'
+CLAVE_VISITAS_HOY = 'visitas_hoy'
+
+
+def _clave_cache(clave):
+    return f'{CACHE_PREFIX}:{clave}'
+
+
+def clave_visita(tipo_visita, visita_id):
+    return f'visita:{tipo_visita}:{visita_id}'
+
+
+def obtener_version(clave):
+    return versiones.obtener_version(_clave_cache(clave))
+
+
+def incrementar_version(clave):
+    return versiones.incrementar_version(_clave_cache(clave))
+
+
+def notificar_cambio_visita(tipo_visita, visita_id):
+    """Marca como modificados los datos de portería de una visita puntual."""
+    return incrementar_version(clave_visita(tipo_visita, visita_id))
+
+
+def notificar_cambio_visitas_hoy():
+    """Marca como modificado el listado de visitas confirmadas de hoy."""
+    return incrementar_version(CLAVE_VISITAS_HOY)
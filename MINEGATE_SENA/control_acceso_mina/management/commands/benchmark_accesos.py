@@ -0,0 +1,198 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from control_acceso_mina.models import RegistroAccesoMina
+from core.fechas import rango_dia_local
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera registros de acceso sintéticos y compara planes de consulta y "
+        "tiempos de las consultas de portería antes (filtros __date, sin "
+        "índices compuestos) y después (rangos del día local con índices). "
+        "Todo se ejecuta en una transacción que se revierte al final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--registros",
+            type=int,
+            default=1_000_000,
+            help="Cantidad de registros sintéticos a generar.",
+        )
+        parser.add_argument(
+            "--visitas",
+            type=int,
+            default=500,
+            help="Cantidad de visitas distintas entre las que se reparten los registros.",
+        )
+        parser.add_argument(
+            "--dias",
+            type=int,
+            default=180,
+            help="Días hacia atrás sobre los que se reparten los registros.",
+        )
+        parser.add_argument(
+            "--repeticiones",
+            type=int,
+            default=5,
+            help="Veces que se ejecuta cada consulta para medir el tiempo.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Cantidad de filas insertadas por lote.",
+        )
+        parser.add_argument(
+            "--sin-planes",
+            action="store_true",
+            help="No imprime los planes de ejecución (EXPLAIN).",
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        try:
+            with transaction.atomic():
+                self._ejecutar()
+                raise _Rollback
+        except _Rollback:
+            self.stdout.write("Datos sintéticos revertidos.")
+
+    def _ejecutar(self):
+        opciones = self.options
+        inicio = time.perf_counter()
+        muestra = self._generar_registros(
+            opciones["registros"], opciones["visitas"], opciones["dias"], opciones["batch_size"]
+        )
+        self.stdout.write(
+            f"{opciones['registros']} registros generados en {time.perf_counter() - inicio:.1f}s."
+        )
+
+        indices = list(RegistroAccesoMina._meta.indexes)
+        self._quitar_indices(indices)
+        self._analizar()
+        antes = self._medir(self._consultas_antes(muestra), "Antes")
+
+        self._crear_indices(indices)
+        self._analizar()
+        despues = self._medir(self._consultas_despues(muestra), "Después")
+
+        self.stdout.write("")
+        self.stdout.write(f"{'Consulta':<32}{'Antes (ms)':>12}{'Después (ms)':>14}")
+        for nombre, tiempo_antes in antes.items():
+            self.stdout.write(f"{nombre:<32}{tiempo_antes:>12.2f}{despues[nombre]:>14.2f}")
+
+    def _generar_registros(self, total, visitas, dias, batch_size):
+        aleatorio = random.Random(2024)
+        ahora = timezone.now()
+        segundos_rango = dias * 24 * 3600
+        lote = []
+
+        for i in range(total):
+            visita_id = aleatorio.randint(1, max(visitas, 1))
+            registro = RegistroAccesoMina(
+                documento=str(1000000 + visita_id * 40 + aleatorio.randint(0, 39)),
+                nombre_completo="Persona Sintetica",
+                categoria="Visitante Interno",
+                visita_tipo="interna" if visita_id % 2 else "externa",
+                visita_id=visita_id,
+                tipo="ENTRADA" if i % 2 else "SALIDA",
+                fecha_hora=ahora - timedelta(seconds=aleatorio.randint(0, segundos_rango)),
+            )
+            lote.append(registro)
+            if len(lote) >= batch_size:
+                RegistroAccesoMina.objects.bulk_create(lote)
+                lote = []
+
+        # Garantiza al menos un registro de hoy para la visita de muestra.
+        muestra = RegistroAccesoMina(
+            documento="1000040",
+            nombre_completo="Persona Sintetica",
+            categoria="Visitante Interno",
+            visita_tipo="interna",
+            visita_id=1,
+            tipo="ENTRADA",
+            fecha_hora=ahora,
+        )
+        lote.append(muestra)
+        RegistroAccesoMina.objects.bulk_create(lote)
+        return muestra
+
+    def _consultas_antes(self, muestra):
+        hoy = timezone.localdate()
+        visita = {"visita_tipo": muestra.visita_tipo, "visita_id": muestra.visita_id}
+        return {
+            "registros_hoy_visita": RegistroAccesoMina.objects.filter(
+                fecha_hora__date=hoy, **visita
+            ).order_by("-fecha_hora", "-id")[:50],
+            "ultimo_movimiento_persona": RegistroAccesoMina.objects.filter(
+                documento=muestra.documento, **visita
+            ).order_by("-fecha_hora")[:1],
+            "entradas_hoy_panel": RegistroAccesoMina.objects.filter(
+                fecha_hora__date=hoy, tipo="ENTRADA"
+            ).order_by(),
+        }
+
+    def _consultas_despues(self, muestra):
+        inicio_dia, fin_dia = rango_dia_local()
+        visita = {"visita_tipo": muestra.visita_tipo, "visita_id": muestra.visita_id}
+        return {
+            "registros_hoy_visita": RegistroAccesoMina.objects.filter(
+                fecha_hora__gte=inicio_dia, fecha_hora__lt=fin_dia, **visita
+            ).order_by("-fecha_hora", "-id")[:50],
+            "ultimo_movimiento_persona": RegistroAccesoMina.objects.filter(
+                documento=muestra.documento, **visita
+            ).order_by("-fecha_hora")[:1],
+            "entradas_hoy_panel": RegistroAccesoMina.objects.filter(
+                fecha_hora__gte=inicio_dia, fecha_hora__lt=fin_dia, tipo="ENTRADA"
+            ).order_by(),
+        }
+
+    def _medir(self, consultas, etiqueta):
+        resultados = {}
+        for nombre, queryset in consultas.items():
+            if not self.options["sin_planes"]:
+                self.stdout.write(f"\n[{etiqueta}] {nombre}")
+                self.stdout.write(queryset.explain())
+
+            es_conteo = nombre == "entradas_hoy_panel"
+            tiempos = []
+            for _ in range(max(self.options["repeticiones"], 1)):
+                inicio = time.perf_counter()
+                if es_conteo:
+                    queryset.count()
+                else:
+                    list(queryset.values_list("id", flat=True))
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            resultados[nombre] = statistics.median(tiempos)
+        return resultados
+
+    # El editor solo se usa para generar el SQL; no se abre como contexto para
+    # poder ejecutarlo dentro de la transacción que se revierte al final.
+    def _quitar_indices(self, indices):
+        editor = connection.schema_editor(collect_sql=True)
+        with connection.cursor() as cursor:
+            for index in indices:
+                cursor.execute(str(index.remove_sql(RegistroAccesoMina, editor)))
+
+    def _crear_indices(self, indices):
+        editor = connection.schema_editor(collect_sql=True)
+        with connection.cursor() as cursor:
+            for index in indices:
+                cursor.execute(str(index.create_sql(RegistroAccesoMina, editor)))
+
+    def _analizar(self):
+        tabla = connection.ops.quote_name(RegistroAccesoMina._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {tabla}")
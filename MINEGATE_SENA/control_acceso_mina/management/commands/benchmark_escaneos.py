@@ -0,0 +1,233 @@
+import json
+import random
+import statistics
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from control_acceso_mina.models import PresenciaMina, RegistroAccesoMina
+from control_acceso_mina.qr import generar_datos_qr_firmado
+from control_acceso_mina.roster import invalidar_roster
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el rendimiento de registrar_acceso ante una ráfaga de escaneos: "
+        "crea una visita interna confirmada para hoy con un roster grande, "
+        "dispara escaneos concurrentes con el cliente de pruebas de Django y "
+        "reporta latencias p50/p95/p99, consultas por escaneo y throughput. "
+        "Los datos sembrados se eliminan al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--asistentes",
+            type=int,
+            default=200,
+            help="Cantidad de asistentes aprobados en la visita sembrada.",
+        )
+        parser.add_argument(
+            "--escaneos-por-persona",
+            type=int,
+            default=2,
+            help="Escaneos por asistente (entrada, salida, ...).",
+        )
+        parser.add_argument(
+            "--concurrencia",
+            type=int,
+            default=8,
+            help="Cantidad de porterías simultáneas (hilos).",
+        )
+        parser.add_argument(
+            "--semilla",
+            type=int,
+            default=2024,
+            help="Semilla para el orden de los escaneos.",
+        )
+        parser.add_argument(
+            "--ventana-duplicados",
+            type=int,
+            default=0,
+            help=(
+                "Segundos de la ventana de escaneos repetidos durante la prueba. "
+                "Por defecto 0 para que cada escaneo genere un movimiento."
+            ),
+        )
+        parser.add_argument(
+            "--json",
+            action="store_true",
+            help="Imprime el resultado como JSON para compararlo entre versiones.",
+        )
+        parser.add_argument(
+            "--conservar",
+            action="store_true",
+            help="No elimina la visita, asistentes y registros sembrados.",
+        )
+
+    def handle(self, *args, **options):
+        if options["asistentes"] < 1 or options["concurrencia"] < 1:
+            raise CommandError("--asistentes y --concurrencia deben ser mayores que cero.")
+
+        visita, usuario = self._sembrar(options["asistentes"])
+        try:
+            with override_settings(PORTERIA_VENTANA_DUPLICADOS_SEGUNDOS=options["ventana_duplicados"]):
+                resultado = self._ejecutar(visita, usuario, options)
+        finally:
+            if not options["conservar"]:
+                self._limpiar(visita, usuario)
+
+        if options["json"]:
+            self.stdout.write(json.dumps(resultado, indent=2))
+        else:
+            self._imprimir(resultado)
+
+    def _sembrar(self, cantidad_asistentes):
+        from visitaInterna.models import AsistenteVisitaInterna, VisitaInterna
+
+        sufijo = uuid.uuid4().hex[:8]
+        usuario = User.objects.create_user(username=f"benchmark-porteria-{sufijo}")
+
+        # bulk_create evita los signals de notificación por correo y QR.
+        visita = VisitaInterna.objects.bulk_create([
+            VisitaInterna(
+                estado="aprobada_final",
+                nombre_programa=f"Benchmark porteria {sufijo}",
+                numero_ficha=1,
+                responsable="Instructor Benchmark",
+                tipo_documento_responsable="CC",
+                documento_responsable=f"9{sufijo[:6]}".upper(),
+                correo_responsable="benchmark@example.com",
+                telefono_responsable="3000000000",
+                cantidad_aprendices=cantidad_asistentes,
+                fecha_visita=timezone.localdate(),
+            )
+        ])[0]
+        if visita.pk is None:
+            visita = VisitaInterna.objects.get(nombre_programa=f"Benchmark porteria {sufijo}")
+
+        AsistenteVisitaInterna.objects.bulk_create(
+            [
+                AsistenteVisitaInterna(
+                    visita=visita,
+                    nombre_completo=f"Aprendiz Benchmark {i}",
+                    tipo_documento="CC",
+                    numero_documento=str(80000000 + i),
+                    estado="documentos_aprobados",
+                )
+                for i in range(cantidad_asistentes)
+            ],
+            batch_size=500,
+        )
+        invalidar_roster("interna", visita.id)
+        return visita, usuario
+
+    def _limpiar(self, visita, usuario):
+        RegistroAccesoMina.objects.filter(visita_tipo="interna", visita_id=visita.id).delete()
+        PresenciaMina.objects.filter(visita_tipo="interna", visita_id=visita.id).delete()
+        invalidar_roster("interna", visita.id)
+        visita.delete()
+        usuario.delete()
+
+    def _ejecutar(self, visita, usuario, options):
+        documentos = [str(80000000 + i) for i in range(options["asistentes"])]
+        random.Random(options["semilla"]).shuffle(documentos)
+
+        # Cada persona queda asignada a una sola portería para que sus
+        # escaneos sean secuenciales, como ocurre en la práctica.
+        concurrencia = min(options["concurrencia"], len(documentos))
+        grupos = [documentos[i::concurrencia] for i in range(concurrencia)]
+
+        url = reverse("control_acceso_mina:registrar_acceso")
+        muestras = []
+        bloqueo = threading.Lock()
+
+        def porteria(grupo):
+            # Los errores del servidor se cuentan como respuestas 500 en lugar
+            # de detener la ráfaga (p. ej. bloqueos de SQLite con escrituras
+            # concurrentes; para medir concurrencia real use PostgreSQL).
+            cliente = Client(raise_request_exception=False)
+            cliente.force_login(usuario)
+            locales = []
+            try:
+                for _ in range(options["escaneos_por_persona"]):
+                    for documento in grupo:
+                        cuerpo = json.dumps({
+                            "qr_data": generar_datos_qr_firmado(
+                                "interna", visita.id, documento, visita.fecha_visita
+                            ),
+                            "selected_visit_type": "interna",
+                            "selected_visit_id": visita.id,
+                        })
+                        with CaptureQueriesContext(connection) as consultas:
+                            inicio = time.perf_counter()
+                            respuesta = cliente.post(url, data=cuerpo, content_type="application/json")
+                            duracion = time.perf_counter() - inicio
+                        locales.append((duracion, len(consultas), respuesta.status_code))
+            finally:
+                if threading.current_thread() is not threading.main_thread():
+                    connections.close_all()
+            with bloqueo:
+                muestras.extend(locales)
+
+        inicio_total = time.perf_counter()
+        if concurrencia == 1:
+            porteria(grupos[0])
+        else:
+            with ThreadPoolExecutor(max_workers=concurrencia) as executor:
+                list(executor.map(porteria, grupos))
+        duracion_total = time.perf_counter() - inicio_total
+
+        latencias = sorted(m[0] * 1000 for m in muestras)
+        consultas = [m[1] for m in muestras]
+        return {
+            "asistentes": options["asistentes"],
+            "concurrencia": concurrencia,
+            "escaneos": len(muestras),
+            "duracion_s": round(duracion_total, 3),
+            "throughput_escaneos_s": round(len(muestras) / duracion_total, 1) if duracion_total else 0,
+            "latencia_ms": {
+                "p50": round(self._percentil(latencias, 50), 2),
+                "p95": round(self._percentil(latencias, 95), 2),
+                "p99": round(self._percentil(latencias, 99), 2),
+                "max": round(latencias[-1], 2) if latencias else 0,
+            },
+            "consultas_por_escaneo": {
+                "promedio": round(statistics.mean(consultas), 2) if consultas else 0,
+                "max": max(consultas) if consultas else 0,
+            },
+            "estados_http": dict(sorted(Counter(m[2] for m in muestras).items())),
+        }
+
+    @staticmethod
+    def _percentil(valores_ordenados, percentil):
+        if not valores_ordenados:
+            return 0
+        indice = max(int(round(percentil / 100 * len(valores_ordenados))) - 1, 0)
+        return valores_ordenados[min(indice, len(valores_ordenados) - 1)]
+
+    def _imprimir(self, resultado):
+        latencia = resultado["latencia_ms"]
+        consultas = resultado["consultas_por_escaneo"]
+        self.stdout.write(
+            f"Escaneos: {resultado['escaneos']} ({resultado['asistentes']} asistentes, "
+            f"{resultado['concurrencia']} porterías) en {resultado['duracion_s']}s"
+        )
+        self.stdout.write(f"Throughput: {resultado['throughput_escaneos_s']} escaneos/s")
+        self.stdout.write(
+            f"Latencia (ms): p50={latencia['p50']} p95={latencia['p95']} "
+            f"p99={latencia['p99']} max={latencia['max']}"
+        )
+        self.stdout.write(
+            f"Consultas por escaneo: promedio={consultas['promedio']} max={consultas['max']}"
+        )
+        self.stdout.write(f"Estados HTTP: {resultado['estados_http']}")
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from control_acceso_mina.models import PresenciaMina, RegistroAccesoMina
+from control_acceso_mina.presencia import reconstruir_presencia
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye la tabla de presencia actual en la mina a partir "
+        "del historial de RegistroAccesoMina."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Cantidad de filas leidas/insertadas por lote.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = reconstruir_presencia(
+                RegistroAccesoMina,
+                PresenciaMina,
+                batch_size=options["batch_size"],
+            )
+
+        dentro = PresenciaMina.objects.filter(ultimo_tipo="ENTRADA").count()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Presencia reconstruida: {total} personas/visita, {dentro} dentro de la mina."
+            )
+        )
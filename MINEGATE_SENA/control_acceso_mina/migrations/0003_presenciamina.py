@@ -0,0 +1,67 @@
+# Generated by Django 4.2.27 on 2026-10-18 11:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def poblar_presencia(apps, schema_editor):
+    """Último movimiento de cada persona por visita, según el historial."""
+    RegistroAccesoMina = apps.get_model('control_acceso_mina', 'RegistroAccesoMina')
+    PresenciaMina = apps.get_model('control_acceso_mina', 'PresenciaMina')
+
+    ultimos = {}
+    registros = RegistroAccesoMina.objects.order_by('fecha_hora', 'id').values(
+        'id', 'documento', 'nombre_completo', 'categoria',
+        'visita_tipo', 'visita_id', 'tipo', 'fecha_hora',
+    )
+    for r in registros.iterator(chunk_size=1000):
+        ultimos[(r['visita_tipo'], r['visita_id'], r['documento'])] = r
+
+    PresenciaMina.objects.bulk_create(
+        (
+            PresenciaMina(
+                documento=r['documento'],
+                nombre_completo=r['nombre_completo'],
+                categoria=r['categoria'],
+                visita_tipo=r['visita_tipo'],
+                visita_id=r['visita_id'],
+                ultimo_tipo=r['tipo'],
+                fecha_hora=r['fecha_hora'],
+                ultimo_registro_id=r['id'],
+            )
+            for r in ultimos.values()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('control_acceso_mina', '0002_registroaccesomina_visita_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PresenciaMina',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('documento', models.CharField(max_length=50, verbose_name='Documento')),
+                ('nombre_completo', models.CharField(max_length=200, verbose_name='Nombre Completo')),
+                ('categoria', models.CharField(max_length=100, verbose_name='Categoría')),
+                ('visita_tipo', models.CharField(blank=True, choices=[('interna', 'Interna'), ('externa', 'Externa')], max_length=10, null=True, verbose_name='Tipo de Visita')),
+                ('visita_id', models.PositiveIntegerField(blank=True, null=True, verbose_name='ID de Visita')),
+                ('ultimo_tipo', models.CharField(choices=[('ENTRADA', 'Entrada'), ('SALIDA', 'Salida')], max_length=7, verbose_name='Último Movimiento')),
+                ('fecha_hora', models.DateTimeField(verbose_name='Fecha y Hora del Último Movimiento')),
+                ('ultimo_registro', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='control_acceso_mina.registroaccesomina', verbose_name='Último Registro')),
+            ],
+            options={
+                'verbose_name': 'Presencia en la Mina',
+                'verbose_name_plural': 'Presencias en la Mina',
+                'ordering': ['-fecha_hora'],
+                'indexes': [models.Index(fields=['visita_tipo', 'visita_id', 'ultimo_tipo'], name='presencia_visita_tipo_idx'), models.Index(fields=['ultimo_tipo'], name='presencia_ultimo_tipo_idx')],
+                'unique_together': {('visita_tipo', 'visita_id', 'documento')},
+            },
+        ),
+        migrations.RunPython(poblar_presencia, migrations.RunPython.noop),
+    ]
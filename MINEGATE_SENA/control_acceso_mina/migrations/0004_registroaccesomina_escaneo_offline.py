@@ -0,0 +1,24 @@
+# Generated by Django 4.2.27 on 2026-10-18 11:43
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('control_acceso_mina', '0003_presenciamina'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registroaccesomina',
+            name='id_escaneo_cliente',
+            field=models.CharField(blank=True, help_text='Identificador generado por el dispositivo para escaneos capturados sin conexión.', max_length=64, null=True, unique=True, verbose_name='ID de Escaneo del Dispositivo'),
+        ),
+        migrations.AlterField(
+            model_name='registroaccesomina',
+            name='fecha_hora',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha y Hora'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.27 on 2026-10-18 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('control_acceso_mina', '0004_registroaccesomina_escaneo_offline'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='registroaccesomina',
+            index=models.Index(fields=['visita_tipo', 'visita_id', 'documento', 'fecha_hora'], name='acceso_visita_doc_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registroaccesomina',
+            index=models.Index(fields=['visita_tipo', 'visita_id', 'fecha_hora'], name='acceso_visita_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registroaccesomina',
+            index=models.Index(fields=['fecha_hora', 'tipo'], name='acceso_fecha_tipo_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.27 on 2026-10-18 11:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('control_acceso_mina', '0005_registroaccesomina_indices_compuestos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='presenciamina',
+            name='verificado_evacuacion_en',
+            field=models.DateTimeField(blank=True, help_text='Momento en que se confirmó a la persona durante el pase de lista de evacuación.', null=True, verbose_name='Verificado en Evacuación'),
+        ),
+        migrations.AddField(
+            model_name='presenciamina',
+            name='verificado_evacuacion_por',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Verificado por'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 ﻿from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class RegistroAccesoMina(models.Model):
@@ -52,9 +53,17 @@ class RegistroAccesoMina(models.Model):
         verbose_name="Tipo de Movimiento"
     )
     fecha_hora = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
         verbose_name="Fecha y Hora"
     )
+    id_escaneo_cliente = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        verbose_name="ID de Escaneo del Dispositivo",
+        help_text="Identificador generado por el dispositivo para escaneos capturados sin conexión."
+    )
     registrado_por = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
@@ -67,7 +76,101 @@ class RegistroAccesoMina(models.Model):
         verbose_name = "Registro de Acceso a la Mina"
         verbose_name_plural = "Registros de Acceso a la Mina"
         ordering = ['-fecha_hora']
+        indexes = [
+            # Historial de una persona dentro de una visita (último movimiento).
+            models.Index(
+                fields=['visita_tipo', 'visita_id', 'documento', 'fecha_hora'],
+                name='acceso_visita_doc_fecha_idx',
+            ),
+            # Registros del día de una visita ordenados por hora.
+            models.Index(
+                fields=['visita_tipo', 'visita_id', 'fecha_hora'],
+                name='acceso_visita_fecha_idx',
+            ),
+            # Conteos globales por rango de fechas (panel principal, reportes).
+            models.Index(fields=['fecha_hora', 'tipo'], name='acceso_fecha_tipo_idx'),
+        ]
 
     def __str__(self):
         visita_ref = f"{self.visita_tipo}:{self.visita_id}" if self.visita_tipo and self.visita_id else "sin-visita"
         return f"{self.nombre_completo} - {self.tipo} - {visita_ref} - {self.fecha_hora.strftime('%d/%m/%Y %H:%M')}"
+
+
+class PresenciaMina(models.Model):
+    """
+    Estado actual de cada persona por visita: una fila por documento/visita
+    con su último movimiento. Se actualiza en la misma transacción que el
+    RegistroAccesoMina que lo origina, de modo que los conteos de ocupación
+    no necesitan recorrer todo el historial.
+    """
+    documento = models.CharField(
+        max_length=50,
+        verbose_name="Documento"
+    )
+    nombre_completo = models.CharField(
+        max_length=200,
+        verbose_name="Nombre Completo"
+    )
+    categoria = models.CharField(
+        max_length=100,
+        verbose_name="Categoría"
+    )
+    visita_tipo = models.CharField(
+        max_length=10,
+        choices=RegistroAccesoMina.VISITA_TIPO_CHOICES,
+        null=True,
+        blank=True,
+        verbose_name="Tipo de Visita"
+    )
+    visita_id = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="ID de Visita"
+    )
+    ultimo_tipo = models.CharField(
+        max_length=7,
+        choices=RegistroAccesoMina.TIPO_CHOICES,
+        verbose_name="Último Movimiento"
+    )
+    fecha_hora = models.DateTimeField(
+        verbose_name="Fecha y Hora del Último Movimiento"
+    )
+    ultimo_registro = models.ForeignKey(
+        RegistroAccesoMina,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Último Registro"
+    )
+    verificado_evacuacion_en = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Verificado en Evacuación",
+        help_text="Momento en que se confirmó a la persona durante el pase de lista de evacuación."
+    )
+    verificado_evacuacion_por = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Verificado por"
+    )
+
+    class Meta:
+        verbose_name = "Presencia en la Mina"
+        verbose_name_plural = "Presencias en la Mina"
+        ordering = ['-fecha_hora']
+        unique_together = ['visita_tipo', 'visita_id', 'documento']
+        indexes = [
+            models.Index(
+                fields=['visita_tipo', 'visita_id', 'ultimo_tipo'],
+                name='presencia_visita_tipo_idx',
+            ),
+            models.Index(fields=['ultimo_tipo'], name='presencia_ultimo_tipo_idx'),
+        ]
+
+    def __str__(self):
+        visita_ref = f"{self.visita_tipo}:{self.visita_id}" if self.visita_tipo and self.visita_id else "sin-visita"
+        return f"{self.nombre_completo} - {self.ultimo_tipo} - {visita_ref}"
@@ -0,0 +1,100 @@
+"""
+Mantenimiento de la tabla de presencia actual (PresenciaMina).
+
+La presencia guarda el último movimiento de cada documento por visita, de modo
+que la ocupación y las listas dentro/fuera se resuelven sin recorrer el
+historial completo de RegistroAccesoMina.
+"""
+
+import hashlib
+
+from django.db import connection
+
+
+def _clave_bloqueo(visita_tipo, visita_id, documento):
+    digest = hashlib.blake2b(
+        f'{visita_tipo}:{visita_id}:{documento}'.encode('utf-8'),
+        digest_size=8,
+    ).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def bloquear_personas(visita_tipo, visita_id, documentos):
+    """
+    Serializa los movimientos de las personas indicadas hasta que termine la
+    transacción actual, sin bloquear los escaneos de otras personas.
+
+    En PostgreSQL usa pg_advisory_xact_lock con una clave por visita y
+    documento (sirve aunque la persona aún no tenga fila de presencia). Las
+    claves se toman ordenadas para que dos lotes no se interbloqueen. SQLite
+    ya serializa las escrituras, por lo que ahí no hace nada.
+    """
+    if connection.vendor != 'postgresql':
+        return
+
+    claves = sorted({_clave_bloqueo(visita_tipo, visita_id, d) for d in documentos})
+    with connection.cursor() as cursor:
+        for clave in claves:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [clave])
+
+
+def actualizar_presencia(registro):
+    """
+    Refleja un RegistroAccesoMina recién creado en la tabla de presencia.
+    Debe llamarse dentro de la misma transacción que crea el registro.
+    """
+    from .models import PresenciaMina
+
+    presencia, _ = PresenciaMina.objects.update_or_create(
+        visita_tipo=registro.visita_tipo,
+        visita_id=registro.visita_id,
+        documento=registro.documento,
+        defaults={
+            'nombre_completo': registro.nombre_completo,
+            'categoria': registro.categoria,
+            'ultimo_tipo': registro.tipo,
+            'fecha_hora': registro.fecha_hora,
+            'ultimo_registro': registro,
+            # Un nuevo movimiento invalida la verificación de evacuación previa.
+            'verificado_evacuacion_en': None,
+            'verificado_evacuacion_por': None,
+        },
+    )
+    return presencia
+
+
+def reconstruir_presencia(registro_model, presencia_model, batch_size=1000):
+    """
+    Reconstruye la tabla de presencia a partir del historial completo.
+
+    Recibe los modelos como parámetros (lo usa el comando de gestión
+    reconstruir_presencia). Retorna la cantidad de filas de presencia
+    generadas.
+    """
+    ultimos = {}
+    registros = registro_model.objects.order_by('fecha_hora', 'id').values(
+        'id', 'documento', 'nombre_completo', 'categoria',
+        'visita_tipo', 'visita_id', 'tipo', 'fecha_hora',
+    )
+
+    for r in registros.iterator(chunk_size=batch_size):
+        ultimos[(r['visita_tipo'], r['visita_id'], r['documento'])] = r
+
+    presencia_model.objects.all().delete()
+    presencia_model.objects.bulk_create(
+        (
+            presencia_model(
+                documento=r['documento'],
+                nombre_completo=r['nombre_completo'],
+                categoria=r['categoria'],
+                visita_tipo=r['visita_tipo'],
+                visita_id=r['visita_id'],
+                ultimo_tipo=r['tipo'],
+                fecha_hora=r['fecha_hora'],
+                ultimo_registro_id=r['id'],
+            )
+            for r in ultimos.values()
+        ),
+        batch_size=batch_size,
+    )
+    return len(ultimos)
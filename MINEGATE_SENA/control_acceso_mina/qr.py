@@ -0,0 +1,87 @@
+"""
+Formato firmado de los códigos QR de acceso a la mina.
+
+Formato v2: SENA2|tipo|visita_id|documento|valido_hasta|firma
+- tipo: 'i' (interna) o 'e' (externa)
+- valido_hasta: fecha AAAAMMDD hasta la que se acepta el código
+- firma: HMAC-SHA256 (django.core.signing) con la SECRET_KEY del proyecto
+
+La portería puede rechazar códigos alterados o vencidos sin consultar la base
+de datos. El formato anterior (SENA|visita_id|documento|nombre|tipo) se sigue
+aceptando hasta PORTERIA_QR_LEGADO_HASTA.
+"""
+
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+
+PREFIJO_QR_FIRMADO = 'SENA2'
+PREFIJO_QR_LEGADO = 'SENA'
+
+_TIPOS_CODIGO = {'interna': 'i', 'externa': 'e'}
+_CODIGOS_TIPO = {codigo: tipo for tipo, codigo in _TIPOS_CODIGO.items()}
+
+_signer = signing.Signer(salt='control_acceso_mina.qr', sep='|')
+
+
+def generar_datos_qr_firmado(tipo_visita, visita_id, documento, fecha_visita=None):
+    """
+    Genera el contenido firmado del QR. El código vence PORTERIA_QR_VIGENCIA_DIAS
+    después de la fecha de la visita, para tolerar reprogramaciones cercanas.
+    """
+    vigencia = timedelta(days=getattr(settings, 'PORTERIA_QR_VIGENCIA_DIAS', 30))
+    valido_hasta = (fecha_visita or timezone.localdate()) + vigencia
+
+    contenido = '|'.join([
+        PREFIJO_QR_FIRMADO,
+        _TIPOS_CODIGO[tipo_visita],
+        str(visita_id),
+        str(documento).strip(),
+        valido_hasta.strftime('%Y%m%d'),
+    ])
+    return _signer.sign(contenido)
+
+
+def verificar_datos_qr_firmado(raw_text):
+    """
+    Verifica un QR en formato v2. Retorna un diccionario con visita_id,
+    documento, tipo y valido_hasta, o con 'error' si la firma no es válida
+    o el código está vencido.
+    """
+    try:
+        contenido = _signer.unsign(str(raw_text).strip())
+    except signing.BadSignature:
+        return {'error': 'El código QR no es válido o fue alterado.'}
+
+    parts = contenido.split('|')
+    if len(parts) != 5 or parts[0] != PREFIJO_QR_FIRMADO or parts[1] not in _CODIGOS_TIPO:
+        return {'error': 'El código QR no es válido o fue alterado.'}
+
+    try:
+        valido_hasta = datetime.strptime(parts[4], '%Y%m%d').date()
+    except ValueError:
+        return {'error': 'El código QR no es válido o fue alterado.'}
+
+    if valido_hasta < timezone.localdate():
+        return {'error': 'El código QR está vencido. Solicite uno nuevo.'}
+
+    return {
+        'visita_id': int(parts[2]) if parts[2].isdigit() else None,
+        'documento': parts[3],
+        'tipo': _CODIGOS_TIPO[parts[1]],
+        'valido_hasta': valido_hasta,
+        'firmado': True,
+    }
+
+
+def qr_legado_permitido():
+    """Indica si todavía se aceptan códigos en el formato sin firma."""
+    limite = getattr(settings, 'PORTERIA_QR_LEGADO_HASTA', None)
+    if not limite:
+        return True
+    if isinstance(limite, str):
+        limite = date.fromisoformat(limite)
+    return timezone.localdate() <= limite
@@ -0,0 +1,229 @@
+"""
+Roster precompilado por visita para validar escaneos en portería.
+
+Para cada visita confirmada del día se arma una sola vez un diccionario
+documento -> nombre/categoría (responsable y asistentes aprobados) junto con
+los datos de la visita que muestran las pantallas. Se guarda en la caché
+compartida como máximo PORTERIA_ROSTER_CACHE_SEGUNDOS (y nunca después de la
+medianoche) y los signals lo invalidan cuando cambia la visita o alguno de
+sus asistentes, así que validar un escaneo cuesta una búsqueda en el
+diccionario.
+"""
+
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Count, IntegerField, OuterRef, Subquery, When
+from django.db.models.functions import Coalesce
+from django.urls import reverse
+from django.utils import timezone
+
+from core.fechas import inicio_dia_local
+
+from .eventos import CLAVE_VISITAS_HOY, obtener_version
+
+
+ESTADOS_VISITA_CONFIRMADA = ['confirmada', 'aprobada_final']
+
+CACHE_PREFIX = 'porteria:roster'
+CACHE_PREFIX_VISITAS_HOY = 'porteria:visitas_hoy'
+
+_TOTAL_POR_TIPO = {'interna': 'internas', 'externa': 'externas'}
+
+
+def formatear_horario(hora_inicio, hora_fin):
+    inicio = hora_inicio.strftime('%H:%M') if hora_inicio else 'Por definir'
+    fin = hora_fin.strftime('%H:%M') if hora_fin else 'Por definir'
+    return f'{inicio} - {fin}'
+
+
+def _clave_cache(tipo_visita, visita_id, fecha):
+    return f'{CACHE_PREFIX}:{tipo_visita}:{visita_id}:{fecha.isoformat()}'
+
+
+def _segundos_hasta_medianoche():
+    ahora = timezone.localtime()
+    medianoche = inicio_dia_local(ahora.date() + timedelta(days=1))
+    return max(int((medianoche - ahora).total_seconds()), 1)
+
+
+def _segundos_roster():
+    maximo = getattr(settings, 'PORTERIA_ROSTER_CACHE_SEGUNDOS', 60)
+    return max(min(maximo, _segundos_hasta_medianoche()), 1)
+
+
+def obtener_roster_visita(tipo_visita, visita_id):
+    """
+    Retorna el roster de una visita confirmada para hoy o None si la visita
+    no existe o no está confirmada. El resultado negativo también se guarda
+    en caché para no repetir la consulta con cada escaneo inválido.
+    """
+    if tipo_visita not in ('interna', 'externa'):
+        return None
+
+    hoy = timezone.localdate()
+    clave = _clave_cache(tipo_visita, visita_id, hoy)
+    roster = cache.get(clave)
+    if roster is None:
+        roster = _construir_roster(tipo_visita, visita_id, hoy)
+        cache.set(clave, roster, timeout=_segundos_roster())
+
+    return roster or None
+
+
+def invalidar_roster(tipo_visita, visita_id):
+    cache.delete(_clave_cache(tipo_visita, visita_id, timezone.localdate()))
+
+
+def _construir_roster(tipo_visita, visita_id, fecha):
+    if tipo_visita == 'interna':
+        from visitaInterna.models import AsistenteVisitaInterna, VisitaInterna
+
+        modelo_visita, modelo_asistente = VisitaInterna, AsistenteVisitaInterna
+        campo_nombre, campo_responsable = 'nombre_programa', 'responsable'
+        categoria_responsable, categoria_asistente = 'Instructor Interno', 'Visitante Interno'
+        tipo_label = 'Interna'
+    else:
+        from visitaExterna.models import AsistenteVisitaExterna, VisitaExterna
+
+        modelo_visita, modelo_asistente = VisitaExterna, AsistenteVisitaExterna
+        campo_nombre, campo_responsable = 'nombre', 'nombre_responsable'
+        categoria_responsable, categoria_asistente = 'Instructor Externo', 'Visitante Externo'
+        tipo_label = 'Externa'
+
+    visita = modelo_visita.objects.filter(
+        id=visita_id,
+        estado__in=ESTADOS_VISITA_CONFIRMADA,
+        fecha_visita=fecha,
+    ).values(
+        'id', campo_nombre, campo_responsable, 'documento_responsable',
+        'hora_inicio', 'hora_fin',
+    ).first()
+
+    if not visita:
+        return {}
+
+    asistentes_aprobados = list(
+        modelo_asistente.objects.filter(
+            visita_id=visita_id,
+            estado='documentos_aprobados',
+        ).order_by('nombre_completo').values_list('numero_documento', 'nombre_completo')
+    )
+
+    asistentes = []
+    personas = {}
+
+    documento_responsable = str(visita['documento_responsable'] or '').strip()
+    if documento_responsable:
+        asistentes.append({
+            'documento': visita['documento_responsable'],
+            'nombre_completo': visita[campo_responsable],
+        })
+
+    for documento, nombre_completo in asistentes_aprobados:
+        asistentes.append({
+            'documento': documento,
+            'nombre_completo': nombre_completo,
+        })
+        personas[str(documento).strip()] = {
+            'nombre_completo': nombre_completo,
+            'categoria': categoria_asistente,
+        }
+
+    # El responsable tiene prioridad si también figura como asistente.
+    if documento_responsable:
+        personas[documento_responsable] = {
+            'nombre_completo': visita[campo_responsable],
+            'categoria': categoria_responsable,
+        }
+
+    huella = '|'.join(f"{a['documento']}:{a['nombre_completo']}" for a in asistentes)
+
+    return {
+        'visita': {
+            'tipo': tipo_visita,
+            'tipo_label': tipo_label,
+            'visita_id': visita['id'],
+            'nombre': visita[campo_nombre],
+            'responsable': visita[campo_responsable],
+            'horario': formatear_horario(visita['hora_inicio'], visita['hora_fin']),
+            'asistentes_aprobados': len(asistentes_aprobados),
+            'url_porteria': reverse('control_acceso_mina:porteria_visita', args=[tipo_visita, visita['id']]),
+        },
+        'personas': personas,
+        'asistentes': asistentes,
+        'version': hashlib.md5(huella.encode('utf-8')).hexdigest()[:16],
+    }
+
+
+def obtener_visitas_hoy():
+    """
+    Listado de visitas confirmadas para hoy con su cantidad de asistentes
+    aprobados. Se arma con una consulta a VisitaUnificada y se guarda
+    en caché hasta la medianoche; la clave incluye la versión de
+    CLAVE_VISITAS_HOY, que los signals incrementan al confirmar, reprogramar
+    o aprobar asistentes, así que un cambio invalida el listado.
+    """
+    hoy = timezone.localdate()
+    clave = f'{CACHE_PREFIX_VISITAS_HOY}:{hoy.isoformat()}:{obtener_version(CLAVE_VISITAS_HOY)}'
+    data = cache.get(clave)
+    if data is None:
+        data = _construir_visitas_hoy(hoy)
+        cache.set(clave, data, timeout=_segundos_hasta_medianoche())
+    return data
+
+
+def _aprobados_por_visita(modelo_asistente):
+    return Subquery(
+        modelo_asistente.objects.filter(
+            visita_id=OuterRef('visita_id'),
+            estado='documentos_aprobados',
+        ).order_by().values('visita_id').annotate(total=Count('id')).values('total')[:1]
+    )
+
+
+def _construir_visitas_hoy(fecha):
+    from gestion_visitas.models import VisitaUnificada
+    from visitaExterna.models import AsistenteVisitaExterna
+    from visitaInterna.models import AsistenteVisitaInterna
+
+    # Una sola consulta sobre la vista; los asistentes aprobados se cuentan
+    # con una subconsulta de la tabla de asistentes del tipo de cada visita.
+    # Un error de base de datos se propaga: un listado parcial haría que la
+    # portería trabajara con datos incompletos.
+    filas = VisitaUnificada.objects.filter(
+        estado__in=ESTADOS_VISITA_CONFIRMADA,
+        fecha_visita=fecha,
+    ).annotate(
+        aprobados=Coalesce(
+            Case(
+                When(tipo='interna', then=_aprobados_por_visita(AsistenteVisitaInterna)),
+                When(tipo='externa', then=_aprobados_por_visita(AsistenteVisitaExterna)),
+                output_field=IntegerField(),
+            ),
+            0,
+        ),
+    ).order_by('-tipo', 'hora_inicio', 'visita_id').values(
+        'tipo', 'visita_id', 'nombre', 'responsable', 'hora_inicio', 'hora_fin', 'aprobados',
+    )
+
+    visitas = []
+    totales = {'internas': 0, 'externas': 0}
+    for visita in filas:
+        tipo_visita = visita['tipo']
+        totales[_TOTAL_POR_TIPO[tipo_visita]] += 1
+        visitas.append({
+            'tipo': tipo_visita,
+            'tipo_label': tipo_visita.capitalize(),
+            'visita_id': visita['visita_id'],
+            'nombre': visita['nombre'],
+            'responsable': visita['responsable'],
+            'horario': formatear_horario(visita['hora_inicio'], visita['hora_fin']),
+            'asistentes_aprobados': visita['aprobados'],
+            'url_porteria': reverse('control_acceso_mina:porteria_visita', args=[tipo_visita, visita['visita_id']]),
+        })
+
+    totales['total'] = totales['internas'] + totales['externas']
+    return {'visitas': visitas, 'totales': totales}
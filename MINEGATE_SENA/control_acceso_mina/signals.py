@@ -0,0 +1,48 @@
+"""
+Signals que invalidan el roster en caché y las versiones de portería cuando
+cambian las visitas o sus asistentes, para que la validación de escaneos use
+datos vigentes y los streams de eventos empujen los cambios.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from visitaExterna.models import AsistenteVisitaExterna, VisitaExterna
+from visitaInterna.models import AsistenteVisitaInterna, VisitaInterna
+
+from .eventos import notificar_cambio_visita, notificar_cambio_visitas_hoy
+from .roster import invalidar_roster
+
+
+def _notificar_visita(tipo_visita, visita_id):
+    def _notificar():
+        invalidar_roster(tipo_visita, visita_id)
+        notificar_cambio_visita(tipo_visita, visita_id)
+        notificar_cambio_visitas_hoy()
+
+    transaction.on_commit(_notificar)
+
+
+@receiver(post_save, sender=VisitaInterna)
+@receiver(post_delete, sender=VisitaInterna)
+def visita_interna_modificada(sender, instance, **kwargs):
+    _notificar_visita('interna', instance.id)
+
+
+@receiver(post_save, sender=VisitaExterna)
+@receiver(post_delete, sender=VisitaExterna)
+def visita_externa_modificada(sender, instance, **kwargs):
+    _notificar_visita('externa', instance.id)
+
+
+@receiver(post_save, sender=AsistenteVisitaInterna)
+@receiver(post_delete, sender=AsistenteVisitaInterna)
+def asistente_interno_modificado(sender, instance, **kwargs):
+    _notificar_visita('interna', instance.visita_id)
+
+
+@receiver(post_save, sender=AsistenteVisitaExterna)
+@receiver(post_delete, sender=AsistenteVisitaExterna)
+def asistente_externo_modificado(sender, instance, **kwargs):
+    _notificar_visita('externa', instance.visita_id)
@@ -0,0 +1,161 @@
+(function () {
+    'use strict';
+
+    const app = document.getElementById('evacuacionApp');
+    if (!app) return;
+
+    const DATOS_URL = app.dataset.datosUrl;
+    const VERIFICAR_URL = app.dataset.verificarUrl;
+    const REINICIAR_URL = app.dataset.reiniciarUrl;
+    const POLLING_MS = 5000;
+
+    const contenedor = document.getElementById('evacuacionGrupos');
+    const totalEl = document.getElementById('evacuacionTotal');
+    const verificadosEl = document.getElementById('evacuacionVerificados');
+    const pendientesEl = document.getElementById('evacuacionPendientes');
+    const generadoEl = document.getElementById('evacuacionGenerado');
+    const btnReiniciar = document.getElementById('btnReiniciarEvacuacion');
+
+    function getCookie(name) {
+        const parts = ('; ' + document.cookie).split('; ' + name + '=');
+        if (parts.length === 2) return parts.pop().split(';').shift();
+        return '';
+    }
+
+    function escapeHTML(value) {
+        return String(value || '')
+            .replace(/&/g, '&amp;')
+            .replace(/</g, '&lt;')
+            .replace(/>/g, '&gt;')
+            .replace(/"/g, '&quot;')
+            .replace(/'/g, '&#39;');
+    }
+
+    async function postJSON(url, payload) {
+        const resp = await fetch(url, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': getCookie('csrftoken'),
+            },
+            body: JSON.stringify(payload || {}),
+        });
+        return resp.json();
+    }
+
+    async function cargarEvacuacion() {
+        try {
+            const resp = await fetch(DATOS_URL, { cache: 'no-store' });
+            const data = await resp.json();
+            if (data.success) render(data);
+        } catch (err) {
+            console.error('Error cargando el pase de lista:', err);
+        }
+    }
+
+    function render(data) {
+        totalEl.textContent = data.total;
+        verificadosEl.textContent = data.verificados;
+        pendientesEl.textContent = data.pendientes;
+        generadoEl.textContent = data.generado;
+
+        const grupos = data.grupos || [];
+        if (grupos.length === 0) {
+            contenedor.innerHTML = `
+        <section class="porteria-table-section">
+          <div class="porteria-table-wrapper">
+            <table class="porteria-table">
+              <tbody>
+                <tr class="empty-row">
+                  <td><i class="ri-checkbox-circle-line"></i> No hay personas registradas dentro de la mina</td>
+                </tr>
+              </tbody>
+            </table>
+          </div>
+        </section>`;
+            return;
+        }
+
+        contenedor.innerHTML = grupos.map((g) => `
+        <section class="porteria-table-section section-inside" style="margin-bottom: 20px;">
+          <div class="section-heading-row">
+            <h3 class="table-title">
+              <i class="ri-map-pin-user-line"></i> ${escapeHTML(g.tipo_label)} #${escapeHTML(g.visita_id)} · ${escapeHTML(g.nombre)}
+            </h3>
+            <span class="section-count-pill section-count-pill-inside">${g.personas.length} dentro</span>
+          </div>
+          <div class="porteria-table-wrapper">
+            <table class="porteria-table">
+              <thead>
+                <tr>
+                  <th>Verificado</th>
+                  <th>Documento</th>
+                  <th>Nombre</th>
+                  <th>Categoría</th>
+                  <th>Hora de entrada</th>
+                </tr>
+              </thead>
+              <tbody>
+                ${g.personas.map((p) => `
+                <tr>
+                  <td>
+                    <label>
+                      <input type="checkbox" class="evacuacion-check"
+                        data-visita-tipo="${escapeHTML(g.visita_tipo)}"
+                        data-visita-id="${escapeHTML(g.visita_id)}"
+                        data-documento="${escapeHTML(p.documento)}"
+                        ${p.verificado ? 'checked' : ''}>
+                      ${escapeHTML(p.verificado_en)}
+                    </label>
+                  </td>
+                  <td>${escapeHTML(p.documento)}</td>
+                  <td>${escapeHTML(p.nombre_completo)}</td>
+                  <td>${escapeHTML(p.categoria)}</td>
+                  <td>${escapeHTML(p.hora_entrada)}</td>
+                </tr>`).join('')}
+              </tbody>
+            </table>
+          </div>
+        </section>`).join('');
+    }
+
+    contenedor.addEventListener('change', async (event) => {
+        const check = event.target;
+        if (!check.classList.contains('evacuacion-check')) return;
+
+        check.disabled = true;
+        try {
+            const data = await postJSON(VERIFICAR_URL, {
+                visita_tipo: check.dataset.visitaTipo,
+                visita_id: check.dataset.visitaId,
+                documento: check.dataset.documento,
+                verificado: check.checked,
+            });
+            if (!data.success) {
+                check.checked = !check.checked;
+                alert(data.error || 'No se pudo actualizar la verificación.');
+            }
+        } catch (err) {
+            check.checked = !check.checked;
+            console.error(err);
+        } finally {
+            check.disabled = false;
+            await cargarEvacuacion();
+        }
+    });
+
+    if (btnReiniciar) {
+        btnReiniciar.addEventListener('click', async () => {
+            if (!confirm('¿Iniciar un nuevo pase de lista? Se borrarán las verificaciones actuales.')) return;
+            try {
+                await postJSON(REINICIAR_URL);
+            } catch (err) {
+                console.error(err);
+            }
+            await cargarEvacuacion();
+        });
+    }
+
+    cargarEvacuacion();
+    setInterval(cargarEvacuacion, POLLING_MS);
+})();
@@ -6,11 +6,15 @@
     if (!app) return;
 
     const REGISTRAR_URL = app.dataset.registrarUrl || '/porteria/registrar/';
+    const LOTE_URL = app.dataset.loteUrl || '/porteria/registrar/lote/';
     const DATOS_URL = app.dataset.datosUrl;
+    const EVENTOS_URL = app.dataset.eventosUrl;
     const SELECTED_VISIT_TYPE = app.dataset.tipoVisita;
     const SELECTED_VISIT_ID = parseInt(app.dataset.visitaId || '0', 10);
 
     const POLLING_MS = 30000;
+    const REINTENTO_EVENTOS_MS = 60000;
+    const COLA_OFFLINE_KEY = `porteria_cola_${SELECTED_VISIT_TYPE}_${SELECTED_VISIT_ID}`;
 
     const docInput = document.getElementById('porteriaDocInput');
     const btnRegistrar = document.getElementById('btnRegistrar');
@@ -36,6 +40,15 @@
     let isOpeningCamera = false;
     let isClosingCamera = false;
     let isProcessingQr = false;
+    let eventosActivos = false;
+    let sincronizandoCola = false;
+
+    // Estado local para las consultas incrementales de datos_visita.
+    let cursor = null;
+    let rosterVersion = '';
+    let etagDatos = '';
+    let personasDentro = [];
+    let personasFuera = [];
 
     function getCookie(name) {
         const parts = ('; ' + document.cookie).split('; ' + name + '=');
@@ -65,6 +78,10 @@
             feedbackIcon.innerHTML = '<i class="ri-logout-box-line"></i>';
             feedbackType.textContent = '↑ SALIDA';
         }
+        if (data.duplicado) {
+            // Escaneo repetido dentro de la ventana: no se creó un nuevo movimiento.
+            feedbackType.textContent += ' (ya registrada)';
+        }
 
         feedbackName.textContent = data.nombre_completo;
         feedbackCat.textContent = data.categoria;
@@ -95,13 +112,112 @@
         }, 6000);
     }
 
+    function mostrarFeedbackPendiente(msg) {
+        feedback.style.display = 'block';
+        feedback.className = 'porteria-feedback feedback-error';
+        feedbackIcon.innerHTML = '<i class="ri-wifi-off-line"></i>';
+        feedbackName.textContent = msg;
+        feedbackCat.textContent = '';
+        feedbackType.textContent = 'PENDIENTE';
+
+        feedback.style.animation = 'none';
+        feedback.offsetHeight;
+        feedback.style.animation = '';
+
+        setTimeout(() => {
+            feedback.style.display = 'none';
+        }, 6000);
+    }
+
+    function leerColaOffline() {
+        try {
+            return JSON.parse(localStorage.getItem(COLA_OFFLINE_KEY) || '[]');
+        } catch (err) {
+            return [];
+        }
+    }
+
+    function guardarColaOffline(cola) {
+        try {
+            if (cola.length) {
+                localStorage.setItem(COLA_OFFLINE_KEY, JSON.stringify(cola));
+            } else {
+                localStorage.removeItem(COLA_OFFLINE_KEY);
+            }
+        } catch (err) {
+            console.error('No se pudo guardar la cola offline:', err);
+        }
+    }
+
+    function generarIdEscaneo() {
+        if (window.crypto && typeof window.crypto.randomUUID === 'function') {
+            return window.crypto.randomUUID();
+        }
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+    }
+
+    function encolarEscaneo(documento, qrData) {
+        const cola = leerColaOffline();
+        cola.push({
+            id_escaneo: generarIdEscaneo(),
+            documento: documento,
+            qr_data: qrData,
+            fecha_hora: new Date().toISOString(),
+        });
+        guardarColaOffline(cola);
+        mostrarFeedbackPendiente(`Sin conexión: escaneo guardado (${cola.length} por sincronizar).`);
+    }
+
+    async function sincronizarColaOffline() {
+        if (sincronizandoCola) return;
+        const cola = leerColaOffline();
+        if (cola.length === 0) return;
+
+        sincronizandoCola = true;
+        try {
+            const resp = await fetch(LOTE_URL, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': getCookie('csrftoken'),
+                },
+                body: JSON.stringify({
+                    selected_visit_type: SELECTED_VISIT_TYPE,
+                    selected_visit_id: SELECTED_VISIT_ID,
+                    escaneos: cola,
+                }),
+            });
+            if (!resp.ok) return;
+
+            const data = await resp.json();
+            if (!data.success) return;
+
+            // Registrados, duplicados y rechazados ya fueron procesados por el servidor.
+            const procesados = new Set((data.resultados || []).map((r) => r.id_escaneo));
+            guardarColaOffline(leerColaOffline().filter((e) => !procesados.has(e.id_escaneo)));
+
+            const rechazados = (data.resumen && data.resumen.rechazados) || 0;
+            if (rechazados > 0) {
+                mostrarFeedbackError(`${rechazados} escaneo(s) sin conexión fueron rechazados al sincronizar.`);
+            }
+
+            if (!eventosActivos) await cargarDatosVisita();
+        } catch (err) {
+            console.error('Error sincronizando escaneos offline:', err);
+        } finally {
+            sincronizandoCola = false;
+        }
+    }
+
     function extraerDocumentoQR(decodedText) {
         if (!decodedText) return '';
 
         if (decodedText.includes('|')) {
             const parts = decodedText.split('|');
-            if (parts.length >= 3 && parts[2].trim()) {
-                return parts[2].trim();
+            // Formato firmado: SENA2|tipo|visita_id|documento|valido_hasta|firma
+            const indice = parts[0] === 'SENA2' ? 3 : 2;
+            if (parts.length > indice && parts[indice].trim()) {
+                return parts[indice].trim();
             }
         }
 
@@ -127,24 +243,32 @@
         btnRegistrar.innerHTML = '<span class="scanner-loading"></span>';
 
         try {
-            const resp = await fetch(REGISTRAR_URL, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'X-CSRFToken': getCookie('csrftoken'),
-                },
-                body: JSON.stringify({
-                    documento: doc,
-                    qr_data: qrData,
-                    selected_visit_type: SELECTED_VISIT_TYPE,
-                    selected_visit_id: SELECTED_VISIT_ID,
-                }),
-            });
+            let resp;
+            try {
+                resp = await fetch(REGISTRAR_URL, {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                        'X-CSRFToken': getCookie('csrftoken'),
+                    },
+                    body: JSON.stringify({
+                        documento: doc,
+                        qr_data: qrData,
+                        selected_visit_type: SELECTED_VISIT_TYPE,
+                        selected_visit_id: SELECTED_VISIT_ID,
+                    }),
+                });
+            } catch (networkErr) {
+                // Sin conexión: el escaneo se guarda y se sincroniza en lote después.
+                encolarEscaneo(doc, qrData);
+                console.error(networkErr);
+                return;
+            }
 
             const data = await resp.json();
             if (data.success) {
                 mostrarFeedback(data.data);
-                await cargarDatosVisita();
+                if (!eventosActivos) await cargarDatosVisita();
             } else {
                 mostrarFeedbackError(data.error || 'Documento no autorizado para esta visita.');
             }
@@ -240,36 +364,87 @@
 
     async function cargarDatosVisita() {
         try {
-            const resp = await fetch(DATOS_URL);
-            const data = await resp.json();
+            // Con hay_mas quedan registros posteriores al cursor: se sigue
+            // pidiendo hasta ponerse al día.
+            let hayMas = true;
+            while (hayMas) {
+                const params = new URLSearchParams();
+                if (cursor !== null) params.set('desde', cursor);
+                if (rosterVersion) params.set('roster', rosterVersion);
+
+                const query = params.toString();
+                const resp = await fetch(query ? `${DATOS_URL}?${query}` : DATOS_URL, {
+                    cache: 'no-store',
+                    headers: etagDatos ? { 'If-None-Match': etagDatos } : {},
+                });
+                if (resp.status === 304) return;
+
+                const data = await resp.json();
+
+                if (!data.success) {
+                    mostrarFeedbackError(data.error || 'No fue posible cargar los datos de la visita.');
+                    return;
+                }
 
-            if (!data.success) {
-                mostrarFeedbackError(data.error || 'No fue posible cargar los datos de la visita.');
-                return;
+                etagDatos = resp.headers.get('ETag') || '';
+                renderDatosVisita(data);
+                hayMas = Boolean(data.hay_mas);
             }
+        } catch (err) {
+            console.error('Error cargando datos de visita:', err);
+        }
+    }
+
+    function aplicarCambiosPresencia(cambios) {
+        // Los cambios llegan del más reciente al más antiguo.
+        const documentos = new Set(cambios.map((p) => p.documento));
+        personasDentro = personasDentro.filter((p) => !documentos.has(p.documento));
+        personasFuera = personasFuera.filter((p) => !documentos.has(p.documento));
+
+        personasDentro = cambios.filter((p) => p.estado === 'dentro').concat(personasDentro);
+        personasFuera = cambios.filter((p) => p.estado === 'fuera').concat(personasFuera);
+    }
+
+    function renderDatosVisita(data) {
+        cursor = data.cursor;
+        rosterVersion = data.roster_version || '';
+
+        if (data.incremental) {
+            aplicarCambiosPresencia(data.presencia_cambios || []);
+        } else {
+            personasDentro = data.personas_dentro || [];
+            personasFuera = data.personas_fuera || [];
+        }
 
-            const asistentes = data.asistentes_aprobados || [];
-            if (asistentes.length === 0) {
-                tablaAsistentesBody.innerHTML = `
+        if (data.asistentes_aprobados) {
+            renderAsistentes(data.asistentes_aprobados);
+        }
+        renderPresencia();
+    }
+
+    function renderAsistentes(asistentes) {
+        if (asistentes.length === 0) {
+            tablaAsistentesBody.innerHTML = `
           <tr class="empty-row">
             <td colspan="2"><i class="ri-inbox-line"></i> Sin asistentes aprobados</td>
           </tr>`;
-            } else {
-                tablaAsistentesBody.innerHTML = asistentes.map((a) => `
+        } else {
+            tablaAsistentesBody.innerHTML = asistentes.map((a) => `
           <tr>
             <td>${escapeHTML(a.documento)}</td>
             <td>${escapeHTML(a.nombre_completo)}</td>
           </tr>`).join('');
-            }
+        }
+    }
 
-                        const personasDentro = data.personas_dentro || [];
-                        if (personasDentro.length === 0) {
-                                tablaIngresosBody.innerHTML = `
+    function renderPresencia() {
+        if (personasDentro.length === 0) {
+            tablaIngresosBody.innerHTML = `
                     <tr class="empty-row">
                         <td colspan="5"><i class="ri-inbox-line"></i> Sin personas dentro en esta visita</td>
                     </tr>`;
-                        } else {
-                                tablaIngresosBody.innerHTML = personasDentro.map((p, idx) => `
+        } else {
+            tablaIngresosBody.innerHTML = personasDentro.map((p, idx) => `
                     <tr class="${idx === 0 ? 'row-new' : ''}">
                         <td><strong>${idx + 1}</strong></td>
                         <td><strong>${escapeHTML(p.hora)}</strong></td>
@@ -277,16 +452,15 @@
                         <td>${escapeHTML(p.nombre_completo)}</td>
                         <td>${escapeHTML(p.categoria)}</td>
                     </tr>`).join('');
-                        }
+        }
 
-                        const personasFuera = data.personas_fuera || [];
-                        if (personasFuera.length === 0) {
-                                tablaSalidasBody.innerHTML = `
+        if (personasFuera.length === 0) {
+            tablaSalidasBody.innerHTML = `
                     <tr class="empty-row">
                         <td colspan="5"><i class="ri-inbox-line"></i> Sin personas fuera en esta visita</td>
                     </tr>`;
-                        } else {
-                                tablaSalidasBody.innerHTML = personasFuera.map((p, idx) => `
+        } else {
+            tablaSalidasBody.innerHTML = personasFuera.map((p, idx) => `
                     <tr class="${idx === 0 ? 'row-new' : ''}">
                         <td><strong>${idx + 1}</strong></td>
                         <td><strong>${escapeHTML(p.hora)}</strong></td>
@@ -294,12 +468,41 @@
                         <td>${escapeHTML(p.nombre_completo)}</td>
                         <td>${escapeHTML(p.categoria)}</td>
                     </tr>`).join('');
-                        }
-        } catch (err) {
-            console.error('Error cargando datos de visita:', err);
         }
     }
 
+    function conectarEventos() {
+        if (!EVENTOS_URL || typeof EventSource === 'undefined') return;
+
+        const source = new EventSource(EVENTOS_URL);
+
+        source.addEventListener('open', () => {
+            eventosActivos = true;
+        });
+
+        source.addEventListener('visita', (e) => {
+            try {
+                renderDatosVisita(JSON.parse(e.data));
+            } catch (err) {
+                console.error('Error procesando evento de visita:', err);
+            }
+        });
+
+        source.addEventListener('cerrado', () => {
+            eventosActivos = false;
+            source.close();
+        });
+
+        source.addEventListener('error', () => {
+            // EventSource reintenta solo; mientras tanto se vuelve al polling.
+            eventosActivos = false;
+            // Sin cupo (503) no reintenta: se sigue con polling y se prueba más tarde.
+            if (source.readyState === EventSource.CLOSED) {
+                setTimeout(conectarEventos, REINTENTO_EVENTOS_MS);
+            }
+        });
+    }
+
     btnRegistrar.addEventListener('click', () => registrar());
     btnCamara.addEventListener('click', abrirCamara);
 
@@ -338,6 +541,13 @@
         }
     });
 
+    window.addEventListener('online', sincronizarColaOffline);
+
     cargarDatosVisita();
-    setInterval(cargarDatosVisita, POLLING_MS);
+    conectarEventos();
+    sincronizarColaOffline();
+    setInterval(() => {
+        sincronizarColaOffline();
+        if (!eventosActivos) cargarDatosVisita();
+    }, POLLING_MS);
 })();
@@ -3,12 +3,16 @@
     'use strict';
 
     const VISITAS_URL = '/porteria/visitas-hoy/';
+    const EVENTOS_URL = '/porteria/visitas-hoy/eventos/';
     const POLLING_MS = 30000;
+    const REINTENTO_EVENTOS_MS = 60000;
 
     const tablaVisitasHoyBody = document.getElementById('tablaVisitasHoyBody');
 
     if (!tablaVisitasHoyBody) return;
 
+    let eventosActivos = false;
+
     function escapeHTML(value) {
         return String(value || '')
             .replace(/&/g, '&amp;')
@@ -25,18 +29,25 @@
 
             if (!data.success) return;
 
-            const visitas = data.visitas || [];
-            if (visitas.length === 0) {
-                tablaVisitasHoyBody.innerHTML = `
+            renderVisitasHoy(data);
+        } catch (err) {
+            console.error('Error cargando visitas de hoy:', err);
+        }
+    }
+
+    function renderVisitasHoy(data) {
+        const visitas = data.visitas || [];
+        if (visitas.length === 0) {
+            tablaVisitasHoyBody.innerHTML = `
           <tr class="empty-row">
             <td colspan="6">
               <i class="ri-calendar-line"></i> Sin visitas confirmadas para hoy
             </td>
           </tr>`;
-                return;
-            }
+            return;
+        }
 
-            tablaVisitasHoyBody.innerHTML = visitas.map((v) => `
+        tablaVisitasHoyBody.innerHTML = visitas.map((v) => `
         <tr>
           <td><span class="badge-${escapeHTML(v.tipo)}">${escapeHTML(v.tipo_label)}</span></td>
           <td>${escapeHTML(v.nombre)}</td>
@@ -45,11 +56,39 @@
           <td><strong>${escapeHTML(v.asistentes_aprobados)}</strong></td>
           <td><a class="btn-open-visita" href="${escapeHTML(v.url_porteria)}">Abrir control</a></td>
         </tr>`).join('');
-        } catch (err) {
-            console.error('Error cargando visitas de hoy:', err);
-        }
+    }
+
+    function conectarEventos() {
+        if (typeof EventSource === 'undefined') return;
+
+        const source = new EventSource(EVENTOS_URL);
+
+        source.addEventListener('open', () => {
+            eventosActivos = true;
+        });
+
+        source.addEventListener('visitas', (e) => {
+            try {
+                const data = JSON.parse(e.data);
+                if (data.success) renderVisitasHoy(data);
+            } catch (err) {
+                console.error('Error procesando evento de visitas:', err);
+            }
+        });
+
+        source.addEventListener('error', () => {
+            // EventSource reintenta solo; mientras tanto se vuelve al polling.
+            eventosActivos = false;
+            // Sin cupo (503) no reintenta: se sigue con polling y se prueba más tarde.
+            if (source.readyState === EventSource.CLOSED) {
+                setTimeout(conectarEventos, REINTENTO_EVENTOS_MS);
+            }
+        });
     }
 
     cargarVisitasHoy();
-    setInterval(cargarVisitasHoy, POLLING_MS);
+    conectarEventos();
+    setInterval(() => {
+        if (!eventosActivos) cargarVisitasHoy();
+    }, POLLING_MS);
 })();
@@ -1,11 +1,51 @@
-﻿from django.test import TestCase, Client
+﻿import json
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth.models import User
-from control_acceso_mina.models import RegistroAccesoMina
-from control_acceso_mina.views import _parse_qr_data, _contar_personas_en_visita_mina
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+from control_acceso_mina.evacuacion import obtener_personas_en_mina
+from control_acceso_mina.eventos import CLAVE_VISITAS_HOY, clave_visita, obtener_version
+from control_acceso_mina.models import PresenciaMina, RegistroAccesoMina
+from control_acceso_mina.presencia import actualizar_presencia
+from control_acceso_mina.qr import generar_datos_qr_firmado
+from control_acceso_mina.roster import obtener_roster_visita, obtener_visitas_hoy
+from control_acceso_mina.views import (
+    _buscar_asistente_en_visita,
+    _contar_personas_en_mina,
+    _contar_personas_en_visita_mina,
+    _obtener_estado_actual_visita,
+    _parse_qr_data,
+)
+from core.versiones import cache_coordinacion
+from visitaInterna.models import AsistenteVisitaInterna, VisitaInterna
+
+
+# Las pruebas de "sin consultas" usan una caché en memoria: con la caché por
+# defecto en base de datos cada lectura de la caché también es una consulta.
+CACHE_EN_MEMORIA = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'coordinacion': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'coordinacion',
+    },
+}
+
+CACHE_EN_BASE_DE_DATOS = {
+    'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'sicam_cache'},
+    'coordinacion': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'sicam_cache_coordinacion',
+    },
+}
 
 
 def _registro(documento, tipo, visita_id=1, visita_tipo='interna', nombre='Test Usuario'):
-    return RegistroAccesoMina.objects.create(
+    registro = RegistroAccesoMina.objects.create(
         documento=documento,
         nombre_completo=nombre,
         categoria='Visitante',
@@ -13,6 +53,8 @@ def _registro(documento, tipo, visita_id=1, visita_tipo='interna', nombre='Test
         visita_id=visita_id,
         tipo=tipo,
     )
+    actualizar_presencia(registro)
+    return registro
 
 
 class RegistroAccesoMinaTestCase(TestCase):
@@ -112,4 +154,624 @@ class RegistroAccesoMinaTestCase(TestCase):
         self.client.force_login(self.user)
         resp = self.client.get('/porteria/visita/interna/99999/datos/')
         self.assertEqual(resp.status_code, 404)
-        self.assertFalse(resp.json()['success'])
\ No newline at end of file
+        self.assertFalse(resp.json()['success'])
+
+
+class PresenciaMinaTestCase(TestCase):
+
+    def test_presencia_refleja_ultimo_movimiento(self):
+        _registro('10101010', 'ENTRADA')
+        _registro('10101010', 'SALIDA')
+        presencia = PresenciaMina.objects.get(documento='10101010', visita_tipo='interna', visita_id=1)
+        self.assertEqual(presencia.ultimo_tipo, 'SALIDA')
+        self.assertEqual(PresenciaMina.objects.count(), 1)
+
+    def test_estado_actual_separa_dentro_y_fuera(self):
+        _registro('20202020', 'ENTRADA')
+        _registro('30303030', 'ENTRADA')
+        _registro('30303030', 'SALIDA')
+        estado = _obtener_estado_actual_visita('interna', 1)
+        self.assertEqual([p['documento'] for p in estado['dentro']], ['20202020'])
+        self.assertEqual([p['documento'] for p in estado['fuera']], ['30303030'])
+
+    def test_conteo_global_no_duplica_documentos(self):
+        _registro('40404040', 'ENTRADA', visita_id=1)
+        _registro('40404040', 'ENTRADA', visita_id=2)
+        _registro('50505050', 'ENTRADA', visita_id=2)
+        self.assertEqual(_contar_personas_en_mina(), 2)
+
+    def test_comando_reconstruye_presencia_desde_historial(self):
+        RegistroAccesoMina.objects.create(
+            documento='60606060', nombre_completo='Ana', categoria='Visitante',
+            visita_tipo='externa', visita_id=3, tipo='ENTRADA',
+        )
+        RegistroAccesoMina.objects.create(
+            documento='70707070', nombre_completo='Luis', categoria='Visitante',
+            visita_tipo='externa', visita_id=3, tipo='ENTRADA',
+        )
+        RegistroAccesoMina.objects.create(
+            documento='70707070', nombre_completo='Luis', categoria='Visitante',
+            visita_tipo='externa', visita_id=3, tipo='SALIDA',
+        )
+        self.assertEqual(PresenciaMina.objects.count(), 0)
+
+        call_command('reconstruir_presencia', stdout=StringIO())
+
+        self.assertEqual(PresenciaMina.objects.count(), 2)
+        self.assertEqual(_contar_personas_en_visita_mina('externa', 3), 1)
+
+
+def _visita_interna_hoy(**kwargs):
+    datos = {
+        'estado': 'aprobada_final',
+        'nombre_programa': 'Tecnologia en Minas',
+        'numero_ficha': 12345,
+        'responsable': 'Instructor Interno',
+        'tipo_documento_responsable': 'CC',
+        'documento_responsable': '10001',
+        'correo_responsable': 'interno@example.com',
+        'telefono_responsable': '3000000000',
+        'cantidad_aprendices': 20,
+        'fecha_visita': timezone.localdate(),
+    }
+    datos.update(kwargs)
+    return VisitaInterna.objects.create(**datos)
+
+
+@override_settings(
+    CACHES=CACHE_EN_MEMORIA, PORTERIA_SSE_DURACION_SEGUNDOS=0, PORTERIA_SSE_INTERVALO_SEGUNDOS=0,
+)
+class EventosPorteriaTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        # Las cachés en memoria sobreviven a la prueba; se limpian para no
+        # dejar listados ni versiones a las pruebas siguientes.
+        self.addCleanup(cache.clear)
+        self.addCleanup(cache_coordinacion().clear)
+        self.user = User.objects.create_user(username='portero', password='1234', is_staff=True)
+        self.client.force_login(self.user)
+
+    def test_stream_visita_envia_snapshot_inicial(self):
+        visita = _visita_interna_hoy()
+        resp = self.client.get(f'/porteria/visita/interna/{visita.id}/eventos/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['Content-Type'], 'text/event-stream')
+        contenido = b''.join(resp.streaming_content).decode()
+        self.assertIn('event: visita', contenido)
+        self.assertIn('"personas_en_mina": 0', contenido)
+
+    @override_settings(PORTERIA_SSE_MAXIMO_STREAMS=1)
+    def test_streams_limitados_por_cupo(self):
+        visita = _visita_interna_hoy()
+        primero = self.client.get(f'/porteria/visita/interna/{visita.id}/eventos/')
+        self.assertEqual(primero.status_code, 200)
+
+        sin_cupo = self.client.get('/porteria/visitas-hoy/eventos/')
+        self.assertEqual(sin_cupo.status_code, 503)
+        self.assertIn('Retry-After', sin_cupo)
+
+        # Al terminar el stream se libera el cupo.
+        b''.join(primero.streaming_content)
+        resp = self.client.get('/porteria/visitas-hoy/eventos/')
+        self.assertEqual(resp.status_code, 200)
+        b''.join(resp.streaming_content)
+
+    def test_con_cache_en_base_de_datos_no_se_abren_streams(self):
+        visita = _visita_interna_hoy()
+        with override_settings(CACHES=CACHE_EN_BASE_DE_DATOS):
+            resp = self.client.get('/porteria/visitas-hoy/eventos/')
+            self.assertEqual(resp.status_code, 503)
+            self.assertIn('Retry-After', resp)
+            self.assertEqual(
+                self.client.get(f'/porteria/visita/interna/{visita.id}/eventos/').status_code, 503,
+            )
+
+    def test_stream_visita_inexistente_retorna_404(self):
+        resp = self.client.get('/porteria/visita/interna/99999/eventos/')
+        self.assertEqual(resp.status_code, 404)
+
+    def test_stream_visitas_hoy_lista_visitas(self):
+        _visita_interna_hoy(nombre_programa='Programa Stream')
+        resp = self.client.get('/porteria/visitas-hoy/eventos/')
+        contenido = b''.join(resp.streaming_content).decode()
+        self.assertIn('event: visitas', contenido)
+        self.assertIn('Programa Stream', contenido)
+
+    def test_registrar_acceso_incrementa_version_de_visita(self):
+        visita = _visita_interna_hoy()
+        version_inicial = obtener_version(clave_visita('interna', visita.id))
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(
+                '/porteria/registrar/',
+                data=json.dumps({'documento': '10001', 'qr_data': '',
+                                 'selected_visit_type': 'interna', 'selected_visit_id': visita.id}),
+                content_type='application/json',
+            )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['data']['tipo'], 'ENTRADA')
+        self.assertGreater(obtener_version(clave_visita('interna', visita.id)), version_inicial)
+
+    def test_aprobar_asistente_incrementa_version_visitas_hoy(self):
+        visita = _visita_interna_hoy()
+        version_inicial = obtener_version(CLAVE_VISITAS_HOY)
+        with self.captureOnCommitCallbacks(execute=True):
+            AsistenteVisitaInterna.objects.create(
+                visita=visita, nombre_completo='Aprendiz Uno', tipo_documento='CC',
+                numero_documento='20002', estado='documentos_aprobados',
+            )
+        self.assertGreater(obtener_version(CLAVE_VISITAS_HOY), version_inicial)
+
+
+class DatosVisitaIncrementalTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='portero', password='1234')
+        self.client.force_login(self.user)
+        self.visita = _visita_interna_hoy()
+        self.url = f'/porteria/visita/interna/{self.visita.id}/datos/'
+
+    def test_respuesta_completa_incluye_cursor_y_roster(self):
+        registro = _registro('10001', 'ENTRADA', visita_id=self.visita.id)
+        data = self.client.get(self.url).json()
+        self.assertFalse(data['incremental'])
+        self.assertEqual(data['cursor'], registro.id)
+        self.assertTrue(data['roster_version'])
+        self.assertIn('asistentes_aprobados', data)
+        self.assertEqual(len(data['personas_dentro']), 1)
+
+    def test_etag_sin_cambios_retorna_304(self):
+        resp = self.client.get(self.url)
+        etag = resp['ETag']
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+
+        _registro('10001', 'ENTRADA', visita_id=self.visita.id)
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+
+    def test_desde_retorna_solo_cambios_posteriores(self):
+        _registro('30001', 'ENTRADA', visita_id=self.visita.id)
+        cursor = self.client.get(self.url).json()['cursor']
+        _registro('30002', 'ENTRADA', visita_id=self.visita.id)
+
+        data = self.client.get(self.url, {'desde': cursor}).json()
+        self.assertTrue(data['incremental'])
+        self.assertEqual([r['documento'] for r in data['registros_hoy']], ['30002'])
+        self.assertEqual(
+            [(p['documento'], p['estado']) for p in data['presencia_cambios']],
+            [('30002', 'dentro')],
+        )
+        self.assertEqual(data['personas_en_mina'], 2)
+        self.assertFalse(data['hay_mas'])
+
+    def test_desde_pagina_sin_saltarse_registros(self):
+        cursor = self.client.get(self.url).json()['cursor']
+        creados = [_registro(f'4{i:04d}', 'ENTRADA', visita_id=self.visita.id).id for i in range(60)]
+
+        recibidos = []
+        data = self.client.get(self.url, {'desde': cursor}).json()
+        recibidos.extend(r['id'] for r in data['registros_hoy'])
+        self.assertTrue(data['hay_mas'])
+        self.assertEqual(data['cursor'], creados[49])
+
+        data = self.client.get(self.url, {'desde': data['cursor']}).json()
+        recibidos.extend(r['id'] for r in data['registros_hoy'])
+        self.assertFalse(data['hay_mas'])
+        self.assertEqual(data['cursor'], creados[-1])
+        self.assertEqual(sorted(recibidos), creados)
+
+    def test_roster_no_se_reenvia_si_no_cambia(self):
+        version = self.client.get(self.url).json()['roster_version']
+        data = self.client.get(self.url, {'roster': version}).json()
+        self.assertNotIn('asistentes_aprobados', data)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AsistenteVisitaInterna.objects.create(
+                visita=self.visita, nombre_completo='Aprendiz Uno', tipo_documento='CC',
+                numero_documento='20002', estado='documentos_aprobados',
+            )
+        data = self.client.get(self.url, {'roster': version}).json()
+        self.assertNotEqual(data['roster_version'], version)
+        self.assertEqual(len(data['asistentes_aprobados']), 2)
+
+
+class RegistrarAccesoLoteTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='portero', password='1234')
+        self.client.force_login(self.user)
+        self.visita = _visita_interna_hoy()
+        AsistenteVisitaInterna.objects.create(
+            visita=self.visita, nombre_completo='Aprendiz Uno', tipo_documento='CC',
+            numero_documento='20002', estado='documentos_aprobados',
+        )
+
+    def _enviar(self, escaneos):
+        return self.client.post(
+            '/porteria/registrar/lote/',
+            data=json.dumps({
+                'selected_visit_type': 'interna',
+                'selected_visit_id': self.visita.id,
+                'escaneos': escaneos,
+            }),
+            content_type='application/json',
+        )
+
+    def _escaneo(self, id_escaneo, documento, minutos_atras):
+        fecha = timezone.now() - timedelta(minutes=minutos_atras)
+        return {'id_escaneo': id_escaneo, 'documento': documento, 'qr_data': '', 'fecha_hora': fecha.isoformat()}
+
+    def test_lote_alterna_movimientos_en_orden_cronologico(self):
+        resp = self._enviar([
+            self._escaneo('scan-2', '20002', 1),
+            self._escaneo('scan-1', '20002', 3),
+            self._escaneo('scan-3', '10001', 2),
+        ])
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        tipos = {r['id_escaneo']: r['tipo'] for r in data['resultados']}
+        self.assertEqual(tipos, {'scan-1': 'ENTRADA', 'scan-2': 'SALIDA', 'scan-3': 'ENTRADA'})
+        self.assertEqual(data['resumen']['registrados'], 3)
+        self.assertEqual(data['personas_en_mina'], 1)
+        self.assertEqual(
+            PresenciaMina.objects.get(documento='20002', visita_id=self.visita.id).ultimo_tipo,
+            'SALIDA',
+        )
+
+    def test_lote_reenviado_no_duplica_registros(self):
+        escaneos = [self._escaneo('scan-a', '20002', 2)]
+        self._enviar(escaneos)
+        data = self._enviar(escaneos + [self._escaneo('scan-a', '20002', 2)]).json()
+        self.assertEqual([r['estado'] for r in data['resultados']], ['duplicado', 'duplicado'])
+        self.assertEqual(RegistroAccesoMina.objects.filter(id_escaneo_cliente='scan-a').count(), 1)
+
+    def test_lote_rechaza_documento_fuera_del_roster(self):
+        data = self._enviar([self._escaneo('scan-x', '99999', 1)]).json()
+        self.assertEqual(data['resultados'][0]['estado'], 'rechazado')
+        self.assertFalse(RegistroAccesoMina.objects.exists())
+
+    def test_lote_continua_desde_la_presencia_actual(self):
+        _registro('20002', 'ENTRADA', visita_id=self.visita.id)
+        data = self._enviar([self._escaneo('scan-b', '20002', 0)]).json()
+        self.assertEqual(data['resultados'][0]['tipo'], 'SALIDA')
+
+    def test_lote_vacio_retorna_400(self):
+        self.assertEqual(self._enviar([]).status_code, 400)
+
+    def test_lote_consulta_el_roster_una_sola_vez(self):
+        with mock.patch(
+            'control_acceso_mina.views.obtener_roster_visita', wraps=obtener_roster_visita,
+        ) as roster:
+            self._enviar([self._escaneo('scan-r', '20002', 1)])
+        roster.assert_called_once_with('interna', self.visita.id)
+
+
+class RosterVisitaTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.visita = _visita_interna_hoy()
+        self.asistente = AsistenteVisitaInterna.objects.create(
+            visita=self.visita, nombre_completo='Aprendiz Uno', tipo_documento='CC',
+            numero_documento='20002', estado='documentos_aprobados',
+        )
+
+    def test_roster_incluye_responsable_y_aprobados(self):
+        roster = obtener_roster_visita('interna', self.visita.id)
+        self.assertEqual(roster['personas']['10001']['categoria'], 'Instructor Interno')
+        self.assertEqual(roster['personas']['20002']['nombre_completo'], 'Aprendiz Uno')
+        self.assertEqual(roster['visita']['asistentes_aprobados'], 1)
+
+    @override_settings(CACHES=CACHE_EN_MEMORIA)
+    def test_validacion_con_roster_en_cache_no_consulta_bd(self):
+        obtener_roster_visita('interna', self.visita.id)
+        with self.assertNumQueries(0):
+            asistente, error = _buscar_asistente_en_visita('20002', 'interna', self.visita.id)
+        self.assertIsNone(error)
+        self.assertEqual(asistente['categoria'], 'Visitante Interno')
+
+    @override_settings(PORTERIA_ROSTER_CACHE_SEGUNDOS=5)
+    def test_roster_se_guarda_con_vigencia_corta(self):
+        with mock.patch('control_acceso_mina.roster.cache') as cache_roster:
+            cache_roster.get.return_value = None
+            obtener_roster_visita('interna', self.visita.id)
+            obtener_roster_visita('interna', 999999)
+        # También la respuesta negativa de una visita inexistente.
+        for llamada in cache_roster.set.call_args_list:
+            self.assertLessEqual(llamada.kwargs['timeout'], 5)
+        self.assertEqual(cache_roster.set.call_count, 2)
+
+    def test_cambio_de_estado_invalida_roster(self):
+        obtener_roster_visita('interna', self.visita.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.asistente.estado = 'documentos_rechazados'
+            self.asistente.save()
+        asistente, _ = _buscar_asistente_en_visita('20002', 'interna', self.visita.id)
+        self.assertIsNone(asistente)
+
+    def test_reprogramar_visita_invalida_roster(self):
+        self.assertIsNotNone(obtener_roster_visita('interna', self.visita.id))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.visita.fecha_visita = timezone.localdate() + timedelta(days=1)
+            self.visita.save()
+        self.assertIsNone(obtener_roster_visita('interna', self.visita.id))
+
+
+class QRFirmadoTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='portero', password='1234')
+        self.client.force_login(self.user)
+        self.visita = _visita_interna_hoy()
+        AsistenteVisitaInterna.objects.create(
+            visita=self.visita, nombre_completo='Aprendiz Uno', tipo_documento='CC',
+            numero_documento='20002', estado='documentos_aprobados',
+        )
+
+    def _registrar(self, qr_data, visita_id=None):
+        return self.client.post(
+            '/porteria/registrar/',
+            data=json.dumps({
+                'qr_data': qr_data,
+                'selected_visit_type': 'interna',
+                'selected_visit_id': visita_id or self.visita.id,
+            }),
+            content_type='application/json',
+        )
+
+    def test_parse_qr_firmado_valido(self):
+        qr = generar_datos_qr_firmado('interna', self.visita.id, '20002', timezone.localdate())
+        info = _parse_qr_data(qr)
+        self.assertTrue(info['firmado'])
+        self.assertEqual(info['documento'], '20002')
+        self.assertEqual(info['visita_id'], self.visita.id)
+        self.assertEqual(info['tipo'], 'interna')
+
+    def test_qr_firmado_registra_entrada(self):
+        qr = generar_datos_qr_firmado('interna', self.visita.id, '20002', timezone.localdate())
+        resp = self._registrar(qr)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['data']['tipo'], 'ENTRADA')
+
+    def test_qr_alterado_se_rechaza_sin_consultar_bd(self):
+        qr = generar_datos_qr_firmado('interna', self.visita.id, '20002', timezone.localdate())
+        alterado = qr.replace('|20002|', '|20003|')
+        with self.assertNumQueries(0):
+            info = _parse_qr_data(alterado)
+        self.assertIn('error', info)
+        self.assertEqual(self._registrar(alterado).status_code, 400)
+        self.assertFalse(RegistroAccesoMina.objects.exists())
+
+    @override_settings(PORTERIA_QR_VIGENCIA_DIAS=0)
+    def test_qr_vencido_se_rechaza(self):
+        qr = generar_datos_qr_firmado('interna', self.visita.id, '20002', timezone.localdate() - timedelta(days=1))
+        resp = self._registrar(qr)
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('vencido', resp.json()['error'])
+
+    def test_qr_firmado_de_otra_visita_se_rechaza(self):
+        qr = generar_datos_qr_firmado('interna', self.visita.id + 1, '20002', timezone.localdate())
+        self.assertEqual(self._registrar(qr).status_code, 400)
+
+    def test_qr_legado_se_acepta_durante_transicion(self):
+        qr = f'SENA|{self.visita.id}|20002|Aprendiz Uno|interna'
+        with override_settings(PORTERIA_QR_LEGADO_HASTA=(timezone.localdate() + timedelta(days=1)).isoformat()):
+            self.assertEqual(self._registrar(qr).status_code, 200)
+        with override_settings(PORTERIA_QR_LEGADO_HASTA=(timezone.localdate() - timedelta(days=1)).isoformat()):
+            self.assertIn('error', _parse_qr_data(qr))
+
+
+class BenchmarkAccesosCommandTestCase(TestCase):
+
+    def test_benchmark_revierte_datos_sinteticos(self):
+        salida = StringIO()
+        call_command('benchmark_accesos', registros=50, repeticiones=1, stdout=salida)
+        self.assertIn('registros_hoy_visita', salida.getvalue())
+        self.assertIn('acceso_visita_fecha_idx', salida.getvalue())
+        self.assertFalse(RegistroAccesoMina.objects.exists())
+
+
+class BenchmarkEscaneosCommandTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_benchmark_reporta_metricas_y_limpia_datos(self):
+        salida = StringIO()
+        call_command('benchmark_escaneos', asistentes=5, concurrencia=1, json=True, stdout=salida)
+        resultado = json.loads(salida.getvalue())
+        self.assertEqual(resultado['escaneos'], 10)
+        self.assertEqual(resultado['estados_http'], {'200': 10})
+        self.assertIn('p99', resultado['latencia_ms'])
+        self.assertGreater(resultado['consultas_por_escaneo']['promedio'], 0)
+        self.assertFalse(RegistroAccesoMina.objects.exists())
+        self.assertFalse(VisitaInterna.objects.exists())
+
+
+class EscaneoRepetidoTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='portero', password='1234')
+        self.client.force_login(self.user)
+        self.visita = _visita_interna_hoy()
+
+    def _registrar(self):
+        return self.client.post(
+            '/porteria/registrar/',
+            data=json.dumps({
+                'documento': '10001',
+                'selected_visit_type': 'interna',
+                'selected_visit_id': self.visita.id,
+            }),
+            content_type='application/json',
+        ).json()
+
+    @override_settings(PORTERIA_VENTANA_DUPLICADOS_SEGUNDOS=10)
+    def test_escaneo_repetido_dentro_de_la_ventana_es_idempotente(self):
+        primero = self._registrar()
+        segundo = self._registrar()
+        self.assertEqual(primero['data']['tipo'], 'ENTRADA')
+        self.assertFalse(primero['data']['duplicado'])
+        self.assertEqual(segundo['data']['tipo'], 'ENTRADA')
+        self.assertTrue(segundo['data']['duplicado'])
+        self.assertEqual(RegistroAccesoMina.objects.filter(documento='10001').count(), 1)
+
+    @override_settings(PORTERIA_VENTANA_DUPLICADOS_SEGUNDOS=10)
+    def test_escaneo_fuera_de_la_ventana_alterna_movimiento(self):
+        self._registrar()
+        PresenciaMina.objects.filter(documento='10001').update(
+            fecha_hora=timezone.now() - timedelta(seconds=30)
+        )
+        self.assertEqual(self._registrar()['data']['tipo'], 'SALIDA')
+
+    @override_settings(PORTERIA_VENTANA_DUPLICADOS_SEGUNDOS=0)
+    def test_ventana_desactivada_registra_cada_escaneo(self):
+        self._registrar()
+        self.assertEqual(self._registrar()['data']['tipo'], 'SALIDA')
+        self.assertEqual(RegistroAccesoMina.objects.filter(documento='10001').count(), 2)
+
+
+class VisitasHoyCacheTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.visita = _visita_interna_hoy()
+        for i in range(3):
+            AsistenteVisitaInterna.objects.create(
+                visita=self.visita, nombre_completo=f'Aprendiz {i}', tipo_documento='CC',
+                numero_documento=f'3000{i}', estado='documentos_aprobados' if i else 'pendiente_documentos',
+            )
+
+    @override_settings(CACHES=CACHE_EN_MEMORIA)
+    def test_listado_usa_una_consulta_y_luego_cache(self):
+        with self.assertNumQueries(1):
+            data = obtener_visitas_hoy()
+        self.assertEqual(data['totales'], {'internas': 1, 'externas': 0, 'total': 1})
+        self.assertEqual(data['visitas'][0]['asistentes_aprobados'], 2)
+        with self.assertNumQueries(0):
+            obtener_visitas_hoy()
+
+    def test_listado_combina_internas_y_externas(self):
+        from visitaExterna.models import AsistenteVisitaExterna, VisitaExterna
+
+        # Misma id que la visita interna: los conteos no se cruzan entre tipos.
+        externa = VisitaExterna.objects.create(
+            id=self.visita.id, estado='confirmada', nombre='Colegio Minero', nombre_responsable='Docente Externo',
+            tipo_documento_responsable='CC', documento_responsable='50005',
+            correo_responsable='externo@example.com', telefono_responsable='3100000000',
+            cantidad_visitantes=10, fecha_visita=timezone.localdate(),
+        )
+        AsistenteVisitaExterna.objects.create(
+            visita=externa, nombre_completo='Visitante Uno', tipo_documento='CC',
+            numero_documento='60001', estado='documentos_aprobados',
+        )
+
+        data = obtener_visitas_hoy()
+        self.assertEqual(data['totales'], {'internas': 1, 'externas': 1, 'total': 2})
+        self.assertEqual(
+            [(v['tipo'], v['nombre'], v['responsable'], v['asistentes_aprobados']) for v in data['visitas']],
+            [
+                ('interna', 'Tecnologia en Minas', 'Instructor Interno', 2),
+                ('externa', 'Colegio Minero', 'Docente Externo', 1),
+            ],
+        )
+        self.assertEqual(data['visitas'][1]['tipo_label'], 'Externa')
+
+    def test_aprobar_asistente_invalida_listado(self):
+        obtener_visitas_hoy()
+        with self.captureOnCommitCallbacks(execute=True):
+            asistente = AsistenteVisitaInterna.objects.get(numero_documento='30000')
+            asistente.estado = 'documentos_aprobados'
+            asistente.save()
+        self.assertEqual(obtener_visitas_hoy()['visitas'][0]['asistentes_aprobados'], 3)
+
+    def test_reprogramar_visita_la_quita_del_listado(self):
+        obtener_visitas_hoy()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.visita.fecha_visita = timezone.localdate() + timedelta(days=2)
+            self.visita.save()
+        self.assertEqual(obtener_visitas_hoy()['totales']['total'], 0)
+
+    @override_settings(CACHES=CACHE_EN_MEMORIA)
+    def test_error_de_base_de_datos_se_propaga_y_no_se_guarda(self):
+        from django.db import DatabaseError
+        from gestion_visitas.models import VisitaUnificada
+
+        self.addCleanup(cache.clear)
+        with mock.patch.object(VisitaUnificada.objects, 'filter', side_effect=DatabaseError('caida')):
+            with self.assertRaises(DatabaseError):
+                obtener_visitas_hoy()
+        self.assertEqual(obtener_visitas_hoy()['totales']['total'], 1)
+
+
+class EvacuacionTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='supervisor', password='1234', is_staff=True)
+        self.client.force_login(self.user)
+        self.visita = _visita_interna_hoy()
+        _registro('10001', 'ENTRADA', visita_id=self.visita.id, nombre='Instructor Interno')
+        _registro('20002', 'ENTRADA', visita_id=self.visita.id, nombre='Aprendiz Uno')
+        _registro('20002', 'SALIDA', visita_id=self.visita.id, nombre='Aprendiz Uno')
+        _registro('30003', 'ENTRADA', visita_id=self.visita.id, nombre='Aprendiz Dos')
+
+    def test_lista_solo_personas_dentro_agrupadas_por_visita(self):
+        with self.assertNumQueries(2):
+            data = obtener_personas_en_mina()
+        self.assertEqual(data['total'], 2)
+        self.assertEqual(len(data['grupos']), 1)
+        self.assertEqual(data['grupos'][0]['nombre'], 'Tecnologia en Minas')
+        documentos = {p['documento'] for p in data['grupos'][0]['personas']}
+        self.assertEqual(documentos, {'10001', '30003'})
+
+    def test_verificar_persona_y_nuevo_movimiento_borra_la_marca(self):
+        resp = self.client.post(
+            '/porteria/evacuacion/verificar/',
+            data=json.dumps({'visita_tipo': 'interna', 'visita_id': self.visita.id, 'documento': '30003'}),
+            content_type='application/json',
+        )
+        self.assertEqual(resp.status_code, 200)
+        data = self.client.get('/porteria/evacuacion/datos/').json()
+        self.assertEqual(data['verificados'], 1)
+        self.assertEqual(data['pendientes'], 1)
+
+        _registro('30003', 'SALIDA', visita_id=self.visita.id)
+        _registro('30003', 'ENTRADA', visita_id=self.visita.id)
+        self.assertEqual(obtener_personas_en_mina()['verificados'], 0)
+
+    def test_verificar_persona_fuera_de_la_mina_retorna_404(self):
+        resp = self.client.post(
+            '/porteria/evacuacion/verificar/',
+            data=json.dumps({'visita_tipo': 'interna', 'visita_id': self.visita.id, 'documento': '20002'}),
+            content_type='application/json',
+        )
+        self.assertEqual(resp.status_code, 404)
+
+    def test_reiniciar_pase_de_lista(self):
+        self.client.post(
+            '/porteria/evacuacion/verificar/',
+            data=json.dumps({'visita_tipo': 'interna', 'visita_id': self.visita.id, 'documento': '10001'}),
+            content_type='application/json',
+        )
+        resp = self.client.post('/porteria/evacuacion/reiniciar/')
+        self.assertEqual(resp.json()['reiniciados'], 1)
+        self.assertEqual(obtener_personas_en_mina()['verificados'], 0)
+
+    def test_descargas_csv_y_pdf(self):
+        csv_resp = self.client.get('/porteria/evacuacion/csv/')
+        self.assertEqual(csv_resp.status_code, 200)
+        self.assertIn('30003', csv_resp.content.decode('utf-8-sig'))
+        pdf_resp = self.client.get('/porteria/evacuacion/pdf/')
+        self.assertEqual(pdf_resp['Content-Type'], 'application/pdf')
+        self.assertTrue(pdf_resp.content.startswith(b'%PDF'))
+
+    def test_usuario_sin_permisos_recibe_403(self):
+        otro = User.objects.create_user(username='visitante', password='1234')
+        self.client.force_login(otro)
+        self.assertEqual(self.client.get('/porteria/evacuacion/datos/').status_code, 403)
@@ -5,7 +5,16 @@ app_name: str = 'control_acceso_mina'
 
 urlpatterns = [
     path('registrar/', views.registrar_acceso, name='registrar_acceso'),
+    path('registrar/lote/', views.registrar_acceso_lote, name='registrar_acceso_lote'),
     path('visitas-hoy/', views.visitas_hoy, name='visitas_hoy'),
+    path('visitas-hoy/eventos/', views.eventos_visitas_hoy, name='eventos_visitas_hoy'),
     path('visita/<str:tipo_visita>/<int:visita_id>/', views.porteria_visita, name='porteria_visita'),
     path('visita/<str:tipo_visita>/<int:visita_id>/datos/', views.datos_visita, name='datos_visita'),
+    path('visita/<str:tipo_visita>/<int:visita_id>/eventos/', views.eventos_visita, name='eventos_visita'),
+    path('evacuacion/', views.evacuacion, name='evacuacion'),
+    path('evacuacion/datos/', views.datos_evacuacion, name='datos_evacuacion'),
+    path('evacuacion/csv/', views.evacuacion_csv, name='evacuacion_csv'),
+    path('evacuacion/pdf/', views.evacuacion_pdf, name='evacuacion_pdf'),
+    path('evacuacion/verificar/', views.verificar_evacuacion, name='verificar_evacuacion'),
+    path('evacuacion/reiniciar/', views.reiniciar_evacuacion, name='reiniciar_evacuacion'),
 ]
@@ -1,18 +1,57 @@
-﻿import json
+﻿import hashlib
+import json
+import time
+from datetime import timedelta
 
+from django.conf import settings
+from django.core.cache.backends.db import DatabaseCache
 from django.contrib.auth.decorators import login_required
-from django.db.models import OuterRef, Subquery
-from django.http import JsonResponse
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
-from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import quote_etag
 from django.views.decorators.http import require_GET, require_POST
+from core.fechas import rango_dia_local
 from core.sanitization import sanitize_document_number, sanitize_text, sanitize_token
-
-from .models import RegistroAccesoMina
-
-
-ESTADOS_VISITA_CONFIRMADA = ['confirmada', 'aprobada_final']
+from core.versiones import cache_coordinacion
+from reportes.resumenes import registrar_accesos
+from reportes.versiones import incrementar_version_datos
+
+from .evacuacion import (
+    escribir_csv,
+    generar_pdf,
+    marcar_verificado,
+    obtener_personas_en_mina,
+    reiniciar_pase_lista,
+)
+from .eventos import (
+    CLAVE_VISITAS_HOY,
+    clave_visita,
+    notificar_cambio_visita,
+    obtener_version,
+)
+from .models import PresenciaMina, RegistroAccesoMina
+from .presencia import actualizar_presencia, bloquear_personas
+from .qr import (
+    PREFIJO_QR_FIRMADO,
+    PREFIJO_QR_LEGADO,
+    qr_legado_permitido,
+    verificar_datos_qr_firmado,
+)
+from .roster import obtener_roster_visita, obtener_visitas_hoy
+
+
+MAX_ESCANEOS_LOTE = 500
+TOLERANCIA_RELOJ_DISPOSITIVO = timedelta(minutes=5)
+
+SSE_RETRY_MS = 3000
+SSE_HEARTBEAT_SEGUNDOS = 15
+SSE_CUPO_PREFIX = 'porteria:sse:cupo'
+SSE_REINTENTO_SIN_CUPO_SEGUNDOS = 60
 
 
 @login_required
@@ -40,6 +79,17 @@ def registrar_acceso(request):
         }, status=400)
 
     visita_id = int(selected_visit_id)
+
+    # Los códigos firmados falsos o vencidos se rechazan sin consultar la base de datos.
+    qr_info = _parse_qr_data(qr_data or documento)
+    if qr_info.get('error'):
+        return JsonResponse({'success': False, 'error': qr_info['error']}, status=400)
+    if qr_info.get('firmado') and (qr_info['tipo'] != selected_visit_type or qr_info['visita_id'] != visita_id):
+        return JsonResponse({
+            'success': False,
+            'error': 'El QR escaneado no corresponde a la visita seleccionada.'
+        }, status=400)
+
     visita_data = _obtener_visita_confirmada_hoy(selected_visit_type, visita_id)
     if not visita_data:
         return JsonResponse({
@@ -47,7 +97,6 @@ def registrar_acceso(request):
             'error': 'La visita seleccionada no está confirmada para hoy.'
         }, status=400)
 
-    qr_info = _parse_qr_data(qr_data or documento)
     if qr_info.get('documento'):
         if documento and '|' not in documento and qr_info['documento'] != documento:
             return JsonResponse({
@@ -78,23 +127,51 @@ def registrar_acceso(request):
             'error': f'Documento {documento} no autorizado para la visita seleccionada.'
         }, status=404)
 
-    ultimo_registro = RegistroAccesoMina.objects.filter(
-        documento=documento,
-        visita_tipo=selected_visit_type,
-        visita_id=visita_id,
-    ).order_by('-fecha_hora').first()
+    ventana_duplicados = timedelta(
+        seconds=getattr(settings, 'PORTERIA_VENTANA_DUPLICADOS_SEGUNDOS', 10)
+    )
 
-    tipo_movimiento = 'SALIDA' if (ultimo_registro and ultimo_registro.tipo == 'ENTRADA') else 'ENTRADA'
+    with transaction.atomic():
+        # Dos porterías que escanean a la misma persona a la vez se atienden
+        # una después de la otra; la segunda ve el movimiento de la primera.
+        bloquear_personas(selected_visit_type, visita_id, [documento])
+        presencia = PresenciaMina.objects.filter(
+            documento=documento,
+            visita_tipo=selected_visit_type,
+            visita_id=visita_id,
+        ).values('ultimo_tipo', 'fecha_hora').first()
+
+        if presencia and timezone.now() - presencia['fecha_hora'] < ventana_duplicados:
+            return JsonResponse({
+                'success': True,
+                'data': {
+                    'documento': documento,
+                    'nombre_completo': asistente_data['nombre_completo'],
+                    'categoria': asistente_data['categoria'],
+                    'tipo': presencia['ultimo_tipo'],
+                    'fecha_hora': timezone.localtime(presencia['fecha_hora']).strftime('%d/%m/%Y %H:%M:%S'),
+                    'duplicado': True,
+                    'personas_en_mina': _contar_personas_en_visita_mina(selected_visit_type, visita_id),
+                    'visita': visita_data,
+                }
+            })
 
-    registro = RegistroAccesoMina.objects.create(
-        documento=documento,
-        nombre_completo=asistente_data['nombre_completo'],
-        categoria=asistente_data['categoria'],
-        visita_tipo=selected_visit_type,
-        visita_id=visita_id,
-        tipo=tipo_movimiento,
-        registrado_por=request.user,
-    )
+        ultimo_tipo = presencia['ultimo_tipo'] if presencia else None
+        tipo_movimiento = 'SALIDA' if ultimo_tipo == 'ENTRADA' else 'ENTRADA'
+
+        registro = RegistroAccesoMina.objects.create(
+            documento=documento,
+            nombre_completo=asistente_data['nombre_completo'],
+            categoria=asistente_data['categoria'],
+            visita_tipo=selected_visit_type,
+            visita_id=visita_id,
+            tipo=tipo_movimiento,
+            registrado_por=request.user,
+        )
+        actualizar_presencia(registro)
+        transaction.on_commit(
+            lambda: notificar_cambio_visita(selected_visit_type, visita_id)
+        )
 
     personas_dentro_visita = _contar_personas_en_visita_mina(selected_visit_type, visita_id)
 
@@ -106,12 +183,177 @@ def registrar_acceso(request):
             'categoria': asistente_data['categoria'],
             'tipo': tipo_movimiento,
             'fecha_hora': timezone.localtime(registro.fecha_hora).strftime('%d/%m/%Y %H:%M:%S'),
+            'duplicado': False,
             'personas_en_mina': personas_dentro_visita,
             'visita': visita_data,
         }
     })
 
 
+@login_required
+@require_POST
+def registrar_acceso_lote(request):
+    """
+    Endpoint AJAX para sincronizar escaneos capturados sin conexión.
+
+    Recibe {selected_visit_type, selected_visit_id, escaneos: [...]}, donde cada
+    escaneo trae documento, qr_data, fecha_hora (hora del dispositivo, ISO 8601)
+    e id_escaneo (único por dispositivo). Los escaneos se validan contra el
+    roster de la visita, se ordenan cronológicamente y se insertan en una sola
+    transacción, alternando ENTRADA/SALIDA por persona desde su presencia actual.
+    Los id_escaneo ya sincronizados se reportan como duplicados.
+    """
+    try:
+        body = json.loads(request.body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        body = None
+
+    if not isinstance(body, dict):
+        return JsonResponse({
+            'success': False,
+            'error': 'Formato de lote inválido.'
+        }, status=400)
+
+    selected_visit_id = sanitize_text(str(body.get('selected_visit_id', '')), max_length=12, allow_newlines=False)
+    selected_visit_type = sanitize_token(str(body.get('selected_visit_type', '')), max_length=20)
+    escaneos = body.get('escaneos')
+
+    if selected_visit_type not in ('interna', 'externa') or not selected_visit_id.isdigit():
+        return JsonResponse({
+            'success': False,
+            'error': 'Debe seleccionar una visita válida antes de registrar.'
+        }, status=400)
+
+    if not isinstance(escaneos, list) or not escaneos:
+        return JsonResponse({
+            'success': False,
+            'error': 'El lote no contiene escaneos.'
+        }, status=400)
+
+    if len(escaneos) > MAX_ESCANEOS_LOTE:
+        return JsonResponse({
+            'success': False,
+            'error': f'El lote supera el máximo de {MAX_ESCANEOS_LOTE} escaneos.'
+        }, status=400)
+
+    visita_id = int(selected_visit_id)
+    roster_visita = obtener_roster_visita(selected_visit_type, visita_id)
+    if not roster_visita:
+        return JsonResponse({
+            'success': False,
+            'error': 'La visita seleccionada no está confirmada para hoy.'
+        }, status=400)
+
+    roster = roster_visita['personas']
+    ahora = timezone.now()
+    resultados = [None] * len(escaneos)
+    candidatos = []
+    ids_vistos = set()
+
+    for indice, escaneo in enumerate(escaneos):
+        datos, error = _normalizar_escaneo_offline(
+            escaneo, selected_visit_type, visita_id, roster, ahora
+        )
+        id_escaneo = datos.get('id_escaneo', '') if datos else ''
+        if error:
+            resultados[indice] = {'id_escaneo': id_escaneo, 'estado': 'rechazado', 'error': error}
+            continue
+
+        if id_escaneo in ids_vistos:
+            resultados[indice] = {'id_escaneo': id_escaneo, 'estado': 'duplicado'}
+            continue
+
+        ids_vistos.add(id_escaneo)
+        datos['indice'] = indice
+        candidatos.append(datos)
+
+    ya_sincronizados = set(
+        RegistroAccesoMina.objects.filter(
+            id_escaneo_cliente__in=[c['id_escaneo'] for c in candidatos]
+        ).values_list('id_escaneo_cliente', flat=True)
+    )
+    candidatos.sort(key=lambda c: (c['fecha_hora'], c['indice']))
+
+    try:
+        with transaction.atomic():
+            bloquear_personas(selected_visit_type, visita_id, {c['documento'] for c in candidatos})
+            estado_personas = {
+                documento: (ultimo_tipo, fecha_hora)
+                for documento, ultimo_tipo, fecha_hora in PresenciaMina.objects.filter(
+                    visita_tipo=selected_visit_type,
+                    visita_id=visita_id,
+                    documento__in={c['documento'] for c in candidatos},
+                ).values_list('documento', 'ultimo_tipo', 'fecha_hora')
+            }
+
+            nuevos = []
+            for c in candidatos:
+                if c['id_escaneo'] in ya_sincronizados:
+                    resultados[c['indice']] = {'id_escaneo': c['id_escaneo'], 'estado': 'duplicado'}
+                    continue
+
+                ultimo_tipo, ultima_fecha = estado_personas.get(c['documento'], (None, None))
+                tipo_movimiento = 'SALIDA' if ultimo_tipo == 'ENTRADA' else 'ENTRADA'
+                # El historial de cada persona se mantiene monótono aunque el
+                # reloj del dispositivo vaya atrasado respecto a otra portería.
+                fecha_hora = max(c['fecha_hora'], ultima_fecha) if ultima_fecha else c['fecha_hora']
+                estado_personas[c['documento']] = (tipo_movimiento, fecha_hora)
+
+                nuevos.append(RegistroAccesoMina(
+                    documento=c['documento'],
+                    nombre_completo=c['nombre_completo'],
+                    categoria=c['categoria'],
+                    visita_tipo=selected_visit_type,
+                    visita_id=visita_id,
+                    tipo=tipo_movimiento,
+                    fecha_hora=fecha_hora,
+                    id_escaneo_cliente=c['id_escaneo'],
+                    registrado_por=request.user,
+                ))
+                resultados[c['indice']] = {
+                    'id_escaneo': c['id_escaneo'],
+                    'estado': 'registrado',
+                    'documento': c['documento'],
+                    'nombre_completo': c['nombre_completo'],
+                    'tipo': tipo_movimiento,
+                    'fecha_hora': timezone.localtime(fecha_hora).strftime('%d/%m/%Y %H:%M:%S'),
+                }
+
+            creados = RegistroAccesoMina.objects.bulk_create(nuevos)
+            registrar_accesos(creados)
+
+            ultimos_por_documento = {}
+            for registro in creados:
+                ultimos_por_documento[registro.documento] = registro
+            for registro in ultimos_por_documento.values():
+                actualizar_presencia(registro)
+
+            if creados:
+                transaction.on_commit(
+                    lambda: notificar_cambio_visita(selected_visit_type, visita_id)
+                )
+                # bulk_create no dispara signals: los reportes deben invalidarse aquí.
+                transaction.on_commit(incrementar_version_datos)
+    except IntegrityError:
+        return JsonResponse({
+            'success': False,
+            'error': 'El lote se está sincronizando desde otra conexión. Intente nuevamente.'
+        }, status=409)
+
+    resumen = {
+        'registrados': sum(1 for r in resultados if r['estado'] == 'registrado'),
+        'duplicados': sum(1 for r in resultados if r['estado'] == 'duplicado'),
+        'rechazados': sum(1 for r in resultados if r['estado'] == 'rechazado'),
+    }
+
+    return JsonResponse({
+        'success': True,
+        'resultados': resultados,
+        'resumen': resumen,
+        'personas_en_mina': _contar_personas_en_visita_mina(selected_visit_type, visita_id),
+    })
+
+
 @login_required
 @require_GET
 def visitas_hoy(request):
@@ -126,6 +368,27 @@ def visitas_hoy(request):
     })
 
 
+@login_required
+@require_GET
+def eventos_visitas_hoy(request):
+    """
+    Stream SSE con el listado de visitas de hoy; se reenvía cuando cambia.
+    """
+    def construir_payload():
+        data = _obtener_visitas_hoy_data()
+        return {
+            'success': True,
+            'visitas': data['visitas'],
+            'totales': data['totales'],
+        }
+
+    return _respuesta_eventos(
+        obtener_version=lambda: obtener_version(CLAVE_VISITAS_HOY),
+        construir_payload=construir_payload,
+        evento='visitas',
+    )
+
+
 @login_required
 @require_GET
 def porteria_visita(request, tipo_visita, visita_id):
@@ -146,32 +409,7 @@ def porteria_visita(request, tipo_visita, visita_id):
         )
 
     visita_data = _obtener_visita_confirmada_hoy(tipo_visita, visita_id)
-    es_coordinador = request.user.groups.filter(name='coordinador').exists()
-    es_sst = request.user.groups.filter(name='sst').exists()
-
-    usuario_es_admin_panel = request.user.is_superuser or (
-        request.user.is_staff and not es_sst and not es_coordinador
-    )
-    usuario_solo_sst = es_sst and not request.user.is_superuser
-
-    if usuario_es_admin_panel:
-        panel_role_label = 'Administrador'
-    elif usuario_solo_sst:
-        panel_role_label = 'SST'
-    elif es_coordinador:
-        panel_role_label = 'Coordinador'
-    else:
-        panel_role_label = 'Usuario'
-
-    contexto_base_panel = {
-        'es_superusuario': usuario_es_admin_panel,
-        'solo_sst': usuario_solo_sst,
-        'solo_coordinador': es_coordinador,
-        'perfil': getattr(request.user, 'perfil', None),
-        'perfil_panel': getattr(request.user, 'perfil', None),
-        'panel_role_label': panel_role_label,
-        'seccion_activa': 'control_acceso',
-    }
+    contexto_base_panel = _contexto_base_panel(request)
 
     if not visita_data:
         return render(
@@ -196,11 +434,142 @@ def porteria_visita(request, tipo_visita, visita_id):
     )
 
 
+def _es_personal_porteria(user):
+    return user.is_superuser or user.is_staff
+
+
+def _respuesta_sin_permiso():
+    return JsonResponse({
+        'success': False,
+        'error': 'No tienes permisos para acceder al control de acceso.'
+    }, status=403)
+
+
+@login_required
+@require_GET
+def evacuacion(request):
+    """
+    Pantalla del pase de lista de evacuación con todas las personas dentro.
+    """
+    if not _es_personal_porteria(request.user):
+        return render(
+            request,
+            'control_acceso_mina/evacuacion.html',
+            {
+                'error_evacuacion': 'No tienes permisos para acceder al control de acceso.',
+                'panel_role_label': 'Usuario',
+                'seccion_activa': 'control_acceso',
+            },
+            status=403,
+        )
+
+    return render(
+        request,
+        'control_acceso_mina/evacuacion.html',
+        {**_contexto_base_panel(request), 'error_evacuacion': ''},
+    )
+
+
+@login_required
+@require_GET
+def datos_evacuacion(request):
+    """
+    Personas cuyo último movimiento es ENTRADA, agrupadas por visita, con el
+    avance del pase de lista. Se resuelve desde la tabla de presencia.
+    """
+    if not _es_personal_porteria(request.user):
+        return _respuesta_sin_permiso()
+
+    response = JsonResponse({'success': True, **obtener_personas_en_mina()})
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@login_required
+@require_GET
+def evacuacion_csv(request):
+    if not _es_personal_porteria(request.user):
+        return _respuesta_sin_permiso()
+
+    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    nombre = f"evacuacion_{timezone.localtime().strftime('%Y%m%d_%H%M')}.csv"
+    response['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    # BOM para que Excel reconozca la codificación UTF-8.
+    response.write('\ufeff')
+    escribir_csv(obtener_personas_en_mina(), response)
+    return response
+
+
+@login_required
+@require_GET
+def evacuacion_pdf(request):
+    if not _es_personal_porteria(request.user):
+        return _respuesta_sin_permiso()
+
+    response = HttpResponse(generar_pdf(obtener_personas_en_mina()), content_type='application/pdf')
+    nombre = f"evacuacion_{timezone.localtime().strftime('%Y%m%d_%H%M')}.pdf"
+    response['Content-Disposition'] = f'inline; filename="{nombre}"'
+    return response
+
+
+@login_required
+@require_POST
+def verificar_evacuacion(request):
+    """
+    Marca o desmarca a una persona como verificada en el pase de lista.
+    Recibe {visita_tipo, visita_id, documento, verificado}.
+    """
+    if not _es_personal_porteria(request.user):
+        return _respuesta_sin_permiso()
+
+    try:
+        body = json.loads(request.body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        body = None
+    if not isinstance(body, dict):
+        return JsonResponse({'success': False, 'error': 'Formato de solicitud inválido.'}, status=400)
+
+    visita_tipo = sanitize_token(str(body.get('visita_tipo', '')), max_length=20)
+    visita_id = sanitize_text(str(body.get('visita_id', '')), max_length=12, allow_newlines=False)
+    documento = sanitize_document_number(body.get('documento', ''), max_length=50)
+    verificado = body.get('verificado', True) is not False
+
+    if visita_tipo not in ('interna', 'externa') or not visita_id.isdigit() or not documento:
+        return JsonResponse({'success': False, 'error': 'Datos de la persona incompletos.'}, status=400)
+
+    if not marcar_verificado(visita_tipo, int(visita_id), documento, request.user, verificado):
+        return JsonResponse({
+            'success': False,
+            'error': f'El documento {documento} no figura dentro de la mina para esa visita.'
+        }, status=404)
+
+    return JsonResponse({'success': True, 'documento': documento, 'verificado': verificado})
+
+
+@login_required
+@require_POST
+def reiniciar_evacuacion(request):
+    """Inicia un nuevo pase de lista borrando las verificaciones anteriores."""
+    if not _es_personal_porteria(request.user):
+        return _respuesta_sin_permiso()
+
+    return JsonResponse({'success': True, 'reiniciados': reiniciar_pase_lista()})
+
+
 @login_required
 @require_GET
 def datos_visita(request, tipo_visita, visita_id):
     """
     Datos de una visita puntual: asistentes habilitados, conteo actual y registros del día.
+
+    Parámetros opcionales:
+    - desde: cursor (id del último registro recibido); solo se envían los
+      registros y cambios de presencia posteriores. Los registros llegan por
+      páginas desde el más antiguo: con hay_mas el cliente vuelve a pedir
+      desde el cursor retornado hasta ponerse al día.
+    - roster: versión del listado de asistentes que ya tiene el cliente; si
+      coincide con la actual, el listado no se reenvía.
+    Responde 304 cuando el ETag enviado en If-None-Match sigue vigente.
     """
     visita_data = _obtener_visita_confirmada_hoy(tipo_visita, visita_id)
     if not visita_data:
@@ -209,38 +578,292 @@ def datos_visita(request, tipo_visita, visita_id):
             'error': 'La visita no existe o no está confirmada para hoy.',
         }, status=404)
 
-    registros_data = _obtener_registros_visita_hoy(tipo_visita, visita_id)
-    personas_dentro_visita = _contar_personas_en_visita_mina(tipo_visita, visita_id)
-    asistentes_data = _obtener_asistentes_visita_aprobados(tipo_visita, visita_id)
-    estado_actual = _obtener_estado_actual_visita(tipo_visita, visita_id)
+    desde = sanitize_text(request.GET.get('desde', ''), max_length=20, allow_newlines=False)
+    desde = int(desde) if desde.isdigit() else None
+    roster_cliente = sanitize_token(request.GET.get('roster', ''), max_length=64)
 
-    entradas = sum(1 for r in registros_data if r['tipo'] == 'ENTRADA')
-    salidas = sum(1 for r in registros_data if r['tipo'] == 'SALIDA')
+    cursor = _ultimo_registro_id(tipo_visita, visita_id)
+    roster_version = _version_roster(tipo_visita, visita_id)
 
-    return JsonResponse({
+    firma = json.dumps([visita_data, cursor, roster_version, desde], sort_keys=True, default=str)
+    etag = quote_etag(hashlib.md5(firma.encode('utf-8')).hexdigest())
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(_construir_datos_visita(
+            tipo_visita,
+            visita_id,
+            visita_data=visita_data,
+            desde=desde,
+            cursor=cursor,
+            roster_version=roster_version,
+            incluir_roster=roster_cliente != roster_version,
+        ))
+
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@login_required
+@require_GET
+def eventos_visita(request, tipo_visita, visita_id):
+    """
+    Stream SSE con los datos de una visita puntual; empuja registros nuevos,
+    cambios de ocupación y del listado de asistentes apenas ocurren.
+    """
+    if not _obtener_visita_confirmada_hoy(tipo_visita, visita_id):
+        return JsonResponse({
+            'success': False,
+            'error': 'La visita no existe o no está confirmada para hoy.',
+        }, status=404)
+
+    # Los registros de acceso incrementan la versión de la visita al
+    # confirmarse: el stream solo lee ese contador de la caché de coordinación
+    # (los streams se habilitan únicamente si esa caché no es la base de datos).
+    return _respuesta_eventos(
+        obtener_version=lambda: obtener_version(clave_visita(tipo_visita, visita_id)),
+        construir_payload=lambda: _construir_datos_visita(tipo_visita, visita_id),
+        evento='visita',
+    )
+
+
+def _construir_datos_visita(
+    tipo_visita,
+    visita_id,
+    visita_data=None,
+    desde=None,
+    cursor=None,
+    roster_version=None,
+    incluir_roster=True,
+):
+    """
+    Arma la respuesta de datos de la visita. Con `desde` la respuesta es
+    incremental: registros y cambios de presencia posteriores al cursor. Si
+    quedan registros fuera de la página, el cursor retornado es el del último
+    registro enviado y hay_mas es True.
+    """
+    visita_data = visita_data or _obtener_visita_confirmada_hoy(tipo_visita, visita_id)
+    if not visita_data:
+        return None
+
+    if cursor is None:
+        cursor = _ultimo_registro_id(tipo_visita, visita_id)
+    if roster_version is None:
+        roster_version = _version_roster(tipo_visita, visita_id)
+
+    inicio_dia, fin_dia = rango_dia_local()
+    movimientos = RegistroAccesoMina.objects.filter(
+        visita_tipo=tipo_visita,
+        visita_id=visita_id,
+        fecha_hora__gte=inicio_dia,
+        fecha_hora__lt=fin_dia,
+    ).aggregate(
+        entradas=Count('id', filter=Q(tipo='ENTRADA')),
+        salidas=Count('id', filter=Q(tipo='SALIDA')),
+    )
+
+    hay_mas = False
+    if desde is None:
+        registros = _obtener_registros_visita_hoy(tipo_visita, visita_id)
+    else:
+        registros, hay_mas = _obtener_registros_visita_desde(tipo_visita, visita_id, desde)
+        if hay_mas:
+            cursor = registros[0]['id']
+
+    datos = {
         'success': True,
+        'incremental': desde is not None,
+        'cursor': cursor,
+        'hay_mas': hay_mas,
+        'roster_version': roster_version,
         'visita': visita_data,
-        'personas_en_mina': personas_dentro_visita,
-        'entradas_hoy': entradas,
-        'salidas_hoy': salidas,
-        'registros_hoy': registros_data,
-        'asistentes_aprobados': asistentes_data,
-        'personas_dentro': estado_actual['dentro'],
-        'personas_fuera': estado_actual['fuera'],
-    })
+        'personas_en_mina': _contar_personas_en_visita_mina(tipo_visita, visita_id),
+        'entradas_hoy': movimientos['entradas'],
+        'salidas_hoy': movimientos['salidas'],
+        'registros_hoy': registros,
+    }
+
+    if incluir_roster:
+        datos['asistentes_aprobados'] = _obtener_asistentes_visita_aprobados(tipo_visita, visita_id)
+
+    if desde is None:
+        estado_actual = _obtener_estado_actual_visita(tipo_visita, visita_id)
+        datos['personas_dentro'] = estado_actual['dentro']
+        datos['personas_fuera'] = estado_actual['fuera']
+    else:
+        datos['presencia_cambios'] = _obtener_cambios_presencia(tipo_visita, visita_id, desde)
+
+    return datos
+
+
+def _ultimo_registro_id(tipo_visita, visita_id):
+    return RegistroAccesoMina.objects.filter(
+        visita_tipo=tipo_visita,
+        visita_id=visita_id,
+    ).order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def _version_roster(tipo_visita, visita_id):
+    """
+    Huella del listado de asistentes aprobados, tomada del roster en caché;
+    cambia cuando un asistente entra o sale del estado aprobado.
+    """
+    roster = obtener_roster_visita(tipo_visita, visita_id)
+    return roster['version'] if roster else ''
+
+
+def _formatear_evento_sse(evento, payload, version):
+    data = json.dumps(payload, ensure_ascii=False, default=str)
+    return f'id: {version}\nevent: {evento}\ndata: {data}\n\n'
+
+
+def _reservar_cupo_stream():
+    """
+    Reserva uno de los PORTERIA_SSE_MAXIMO_STREAMS cupos de la caché de
+    coordinación (que no se descarta al llenarse) y retorna su clave, o None
+    si están todos ocupados. El cupo vence solo al terminar la duración del
+    stream, por si el proceso muere sin liberarlo.
+    """
+    maximo = getattr(settings, 'PORTERIA_SSE_MAXIMO_STREAMS', 4)
+    duracion = getattr(settings, 'PORTERIA_SSE_DURACION_SEGUNDOS', 55)
+    for numero in range(maximo):
+        clave = f'{SSE_CUPO_PREFIX}:{numero}'
+        if cache_coordinacion().add(clave, 1, timeout=duracion + SSE_RETRY_MS // 1000 + 5):
+            return clave
+    return None
+
+
+def _stream_eventos(obtener_version, construir_payload, evento, cupo=None):
+    """
+    Generador SSE: consulta la versión en cada intervalo y solo reconstruye
+    el payload cuando cambia. Cierra la conexión al cumplir la duración
+    máxima; el navegador reconecta solo (EventSource) tras SSE_RETRY_MS.
+    Al terminar libera el cupo reservado.
+    """
+    duracion = getattr(settings, 'PORTERIA_SSE_DURACION_SEGUNDOS', 55)
+    intervalo = getattr(settings, 'PORTERIA_SSE_INTERVALO_SEGUNDOS', 1)
+    inicio = time.monotonic()
+    ultimo_envio = inicio
+    ultima_version = None
+    secuencia = 0
+
+    try:
+        yield f'retry: {SSE_RETRY_MS}\n\n'
+
+        while True:
+            version = obtener_version()
+            if version != ultima_version:
+                payload = construir_payload()
+                if payload is None:
+                    yield 'event: cerrado\ndata: {}\n\n'
+                    return
+                ultima_version = version
+                secuencia += 1
+                ultimo_envio = time.monotonic()
+                yield _formatear_evento_sse(evento, payload, secuencia)
+            elif time.monotonic() - ultimo_envio >= SSE_HEARTBEAT_SEGUNDOS:
+                ultimo_envio = time.monotonic()
+                yield ': ping\n\n'
+
+            if time.monotonic() - inicio >= duracion:
+                return
+            time.sleep(intervalo)
+    finally:
+        if cupo:
+            cache_coordinacion().delete(cupo)
+
+
+def _respuesta_sin_stream(mensaje):
+    response = JsonResponse({'success': False, 'error': mensaje}, status=503)
+    response['Retry-After'] = str(SSE_REINTENTO_SIN_CUPO_SEGUNDOS)
+    return response
+
+
+def _respuesta_eventos(obtener_version, construir_payload, evento):
+    """
+    Cada stream ocupa un worker síncrono mientras dura y lee la versión de la
+    caché de coordinación en cada intervalo. Con esa caché en la base de
+    datos cada lectura sería una consulta por stream y por segundo, así que
+    los streams solo se abren con Redis (o una caché en memoria) y, aun así,
+    se limitan con cupos. En los demás casos se responde 503: EventSource no
+    reintenta y la pantalla sigue con el polling por ETag hasta volver a
+    intentarlo.
+    """
+    if isinstance(cache_coordinacion(), DatabaseCache):
+        return _respuesta_sin_stream(
+            'Las pantallas en vivo requieren Redis; se usa la actualización periódica.'
+        )
+
+    cupo = _reservar_cupo_stream()
+    if cupo is None:
+        return _respuesta_sin_stream(
+            'No hay cupo para más pantallas en vivo; se usa la actualización periódica.'
+        )
+
+    response = StreamingHttpResponse(
+        _stream_eventos(obtener_version, construir_payload, evento, cupo=cupo),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _contexto_base_panel(request):
+    """Contexto del panel administrativo para las pantallas de portería."""
+    es_coordinador = request.user.groups.filter(name='coordinador').exists()
+    es_sst = request.user.groups.filter(name='sst').exists()
+
+    usuario_es_admin_panel = request.user.is_superuser or (
+        request.user.is_staff and not es_sst and not es_coordinador
+    )
+    usuario_solo_sst = es_sst and not request.user.is_superuser
+
+    if usuario_es_admin_panel:
+        panel_role_label = 'Administrador'
+    elif usuario_solo_sst:
+        panel_role_label = 'SST'
+    elif es_coordinador:
+        panel_role_label = 'Coordinador'
+    else:
+        panel_role_label = 'Usuario'
+
+    return {
+        'es_superusuario': usuario_es_admin_panel,
+        'solo_sst': usuario_solo_sst,
+        'solo_coordinador': es_coordinador,
+        'perfil': getattr(request.user, 'perfil', None),
+        'perfil_panel': getattr(request.user, 'perfil', None),
+        'panel_role_label': panel_role_label,
+        'seccion_activa': 'control_acceso',
+    }
 
 
 def _parse_qr_data(raw_text):
     """
-    Parsea QR con formato: SENA|visita_id|documento|nombre|tipo
+    Parsea el QR de acceso. Acepta el formato firmado
+    SENA2|tipo|visita_id|documento|valido_hasta|firma y, durante la
+    transición, el formato anterior SENA|visita_id|documento|nombre|tipo.
+    Retorna {'error': ...} si el código es falso, está vencido o ya no se
+    acepta el formato anterior.
     """
     if not raw_text or '|' not in raw_text:
         return {}
 
+    if str(raw_text).startswith(f'{PREFIJO_QR_FIRMADO}|'):
+        qr_info = verificar_datos_qr_firmado(raw_text)
+        if qr_info.get('documento'):
+            qr_info['documento'] = sanitize_document_number(qr_info['documento'], max_length=50)
+        return qr_info
+
     parts = [sanitize_text(p, max_length=120, allow_newlines=False) for p in str(raw_text).split('|')]
-    if len(parts) < 5 or parts[0] != 'SENA':
+    if len(parts) < 5 or parts[0] != PREFIJO_QR_LEGADO:
         return {}
 
+    if not qr_legado_permitido():
+        return {'error': 'El formato de código QR ya no es válido. Solicite un QR actualizado.'}
+
     visita_id = int(parts[1]) if parts[1].isdigit() else None
     tipo_token = sanitize_token(parts[4], max_length=20)
     tipo = tipo_token if tipo_token in ('interna', 'externa') else None
@@ -253,68 +876,63 @@ def _parse_qr_data(raw_text):
     }
 
 
-def _formatear_horario(hora_inicio, hora_fin):
-    inicio = hora_inicio.strftime('%H:%M') if hora_inicio else 'Por definir'
-    fin = hora_fin.strftime('%H:%M') if hora_fin else 'Por definir'
-    return f'{inicio} - {fin}'
+def _normalizar_escaneo_offline(escaneo, tipo_visita, visita_id, roster, ahora):
+    """
+    Valida un escaneo del lote offline. Retorna (datos, error); `datos` incluye
+    id_escaneo aun cuando hay error, para poder reportarlo al dispositivo.
+    """
+    if not isinstance(escaneo, dict):
+        return {}, 'Escaneo con formato inválido.'
+
+    id_escaneo = sanitize_token(str(escaneo.get('id_escaneo', '')), max_length=64)
+    datos = {'id_escaneo': id_escaneo}
+    if not id_escaneo:
+        return datos, 'El escaneo no tiene identificador del dispositivo.'
+
+    fecha_hora = parse_datetime(sanitize_text(str(escaneo.get('fecha_hora', '')), max_length=40, allow_newlines=False))
+    if not fecha_hora:
+        return datos, 'Fecha y hora del escaneo inválida.'
+    if timezone.is_naive(fecha_hora):
+        fecha_hora = timezone.make_aware(fecha_hora)
+    if fecha_hora > ahora + TOLERANCIA_RELOJ_DISPOSITIVO:
+        return datos, 'La fecha del escaneo está en el futuro.'
+    fecha_hora = min(fecha_hora, ahora)
+    if timezone.localtime(fecha_hora).date() != timezone.localdate(ahora):
+        return datos, 'El escaneo no corresponde al día de la visita.'
+
+    documento = sanitize_document_number(escaneo.get('documento', ''), max_length=50)
+    qr_data = sanitize_text(escaneo.get('qr_data', ''), max_length=500, allow_newlines=False)
+    qr_info = _parse_qr_data(qr_data or documento)
+    if qr_info.get('error'):
+        return datos, qr_info['error']
+    if qr_info.get('documento'):
+        if documento and '|' not in documento and qr_info['documento'] != documento:
+            return datos, 'El documento no coincide con el contenido del QR.'
+        documento = sanitize_document_number(qr_info['documento'], max_length=50)
+
+    if qr_info.get('tipo') and qr_info.get('visita_id'):
+        if qr_info['tipo'] != tipo_visita or qr_info['visita_id'] != visita_id:
+            return datos, 'El QR escaneado no corresponde a la visita seleccionada.'
+
+    if not documento:
+        return datos, 'El escaneo no tiene número de documento.'
 
+    persona = roster.get(documento)
+    if not persona:
+        return datos, f'Documento {documento} no autorizado para la visita seleccionada.'
 
-def _obtener_visita_confirmada_hoy(tipo_visita, visita_id):
-    hoy = timezone.localdate()
-
-    if tipo_visita == 'interna':
-        try:
-            from visitaInterna.models import VisitaInterna
-
-            visita = VisitaInterna.objects.filter(
-                id=visita_id,
-                estado__in=ESTADOS_VISITA_CONFIRMADA,
-                fecha_visita=hoy,
-            ).first()
-
-            if not visita:
-                return None
-
-            return {
-                'tipo': 'interna',
-                'tipo_label': 'Interna',
-                'visita_id': visita.id,
-                'nombre': visita.nombre_programa,
-                'responsable': visita.responsable,
-                'horario': _formatear_horario(visita.hora_inicio, visita.hora_fin),
-                'asistentes_aprobados': visita.asistentes.filter(estado='documentos_aprobados').count(),
-                'url_porteria': reverse('control_acceso_mina:porteria_visita', args=['interna', visita.id]),
-            }
-        except Exception:
-            return None
-
-    if tipo_visita == 'externa':
-        try:
-            from visitaExterna.models import VisitaExterna
-
-            visita = VisitaExterna.objects.filter(
-                id=visita_id,
-                estado__in=ESTADOS_VISITA_CONFIRMADA,
-                fecha_visita=hoy,
-            ).first()
-
-            if not visita:
-                return None
-
-            return {
-                'tipo': 'externa',
-                'tipo_label': 'Externa',
-                'visita_id': visita.id,
-                'nombre': visita.nombre,
-                'responsable': visita.nombre_responsable,
-                'horario': _formatear_horario(visita.hora_inicio, visita.hora_fin),
-                'asistentes_aprobados': visita.asistentes.filter(estado='documentos_aprobados').count(),
-                'url_porteria': reverse('control_acceso_mina:porteria_visita', args=['externa', visita.id]),
-            }
-        except Exception:
-            return None
+    datos.update({
+        'documento': documento,
+        'fecha_hora': fecha_hora,
+        'nombre_completo': persona['nombre_completo'],
+        'categoria': persona['categoria'],
+    })
+    return datos, None
 
-    return None
+
+def _obtener_visita_confirmada_hoy(tipo_visita, visita_id):
+    roster = obtener_roster_visita(tipo_visita, visita_id)
+    return roster['visita'] if roster else None
 
 
 def _buscar_asistente_en_visita(documento, tipo_visita, visita_id, qr_info=None):
@@ -324,179 +942,83 @@ def _buscar_asistente_en_visita(documento, tipo_visita, visita_id, qr_info=None)
         if qr_info['tipo'] != tipo_visita or qr_info['visita_id'] != visita_id:
             return None, 'El QR escaneado no corresponde a la visita seleccionada.'
 
-    if tipo_visita == 'interna':
-        try:
-            from visitaInterna.models import AsistenteVisitaInterna, VisitaInterna
-
-            visita = VisitaInterna.objects.filter(
-                id=visita_id,
-                estado__in=ESTADOS_VISITA_CONFIRMADA,
-                fecha_visita=timezone.localdate(),
-            ).first()
-            if visita and str(visita.documento_responsable).strip() == str(documento).strip():
-                return {
-                    'nombre_completo': visita.responsable,
-                    'categoria': 'Instructor Interno',
-                }, None
-
-            asistente = AsistenteVisitaInterna.objects.filter(
-                numero_documento=documento,
-                estado='documentos_aprobados',
-                visita_id=visita_id,
-                visita__estado__in=ESTADOS_VISITA_CONFIRMADA,
-                visita__fecha_visita=timezone.localdate(),
-            ).first()
-
-            if not asistente:
-                return None, None
-
-            return {
-                'nombre_completo': asistente.nombre_completo,
-                'categoria': 'Visitante Interno',
-            }, None
-        except Exception:
-            return None, 'No se pudo validar el asistente interno para esta visita.'
-
-    if tipo_visita == 'externa':
-        try:
-            from visitaExterna.models import AsistenteVisitaExterna, VisitaExterna
-
-            visita = VisitaExterna.objects.filter(
-                id=visita_id,
-                estado__in=ESTADOS_VISITA_CONFIRMADA,
-                fecha_visita=timezone.localdate(),
-            ).first()
-            if visita and str(visita.documento_responsable).strip() == str(documento).strip():
-                return {
-                    'nombre_completo': visita.nombre_responsable,
-                    'categoria': 'Instructor Externo',
-                }, None
-
-            asistente = AsistenteVisitaExterna.objects.filter(
-                numero_documento=documento,
-                estado='documentos_aprobados',
-                visita_id=visita_id,
-                visita__estado__in=ESTADOS_VISITA_CONFIRMADA,
-                visita__fecha_visita=timezone.localdate(),
-            ).first()
-
-            if not asistente:
-                return None, None
-
-            return {
-                'nombre_completo': asistente.nombre_completo,
-                'categoria': 'Visitante Externo',
-            }, None
-        except Exception:
-            return None, 'No se pudo validar el asistente externo para esta visita.'
-
-    return None, 'Tipo de visita no soportado.'
+    if tipo_visita not in ('interna', 'externa'):
+        return None, 'Tipo de visita no soportado.'
+
+    roster = obtener_roster_visita(tipo_visita, visita_id)
+    if not roster:
+        return None, None
+
+    return roster['personas'].get(str(documento).strip()), None
 
 
 def _obtener_asistentes_visita_aprobados(tipo_visita, visita_id):
-    asistentes = []
-
-    if tipo_visita == 'interna':
-        try:
-            from visitaInterna.models import AsistenteVisitaInterna, VisitaInterna
-
-            visita = VisitaInterna.objects.filter(id=visita_id).first()
-            if visita and visita.documento_responsable:
-                asistentes.append({
-                    'documento': visita.documento_responsable,
-                    'nombre_completo': visita.responsable,
-                })
-
-            qs = AsistenteVisitaInterna.objects.filter(
-                visita_id=visita_id,
-                estado='documentos_aprobados',
-            ).order_by('nombre_completo')
-
-            for a in qs:
-                asistentes.append({
-                    'documento': a.numero_documento,
-                    'nombre_completo': a.nombre_completo,
-                })
-        except Exception:
-            return []
-
-    if tipo_visita == 'externa':
-        try:
-            from visitaExterna.models import AsistenteVisitaExterna, VisitaExterna
-
-            visita = VisitaExterna.objects.filter(id=visita_id).first()
-            if visita and visita.documento_responsable:
-                asistentes.append({
-                    'documento': visita.documento_responsable,
-                    'nombre_completo': visita.nombre_responsable,
-                })
-
-            qs = AsistenteVisitaExterna.objects.filter(
-                visita_id=visita_id,
-                estado='documentos_aprobados',
-            ).order_by('nombre_completo')
-
-            for a in qs:
-                asistentes.append({
-                    'documento': a.numero_documento,
-                    'nombre_completo': a.nombre_completo,
-                })
-        except Exception:
-            return []
-
-    return asistentes
+    roster = obtener_roster_visita(tipo_visita, visita_id)
+    return roster['asistentes'] if roster else []
 
 
-def _obtener_registros_visita_hoy(tipo_visita, visita_id, limit=50):
-    hoy = timezone.localdate()
-    registros = RegistroAccesoMina.objects.filter(
-        fecha_hora__date=hoy,
+def _registros_visita_del_dia(tipo_visita, visita_id):
+    inicio_dia, fin_dia = rango_dia_local()
+    return RegistroAccesoMina.objects.filter(
         visita_tipo=tipo_visita,
         visita_id=visita_id,
-    ).order_by('-fecha_hora')[:limit]
+        fecha_hora__gte=inicio_dia,
+        fecha_hora__lt=fin_dia,
+    )
 
-    return [
-        {
-            'documento': r.documento,
-            'nombre_completo': r.nombre_completo,
-            'categoria': r.categoria,
-            'tipo': r.tipo,
-            'fecha_hora': timezone.localtime(r.fecha_hora).strftime('%H:%M:%S'),
-        }
-        for r in registros
-    ]
+
+def _serializar_registro(r):
+    return {
+        'id': r.id,
+        'documento': r.documento,
+        'nombre_completo': r.nombre_completo,
+        'categoria': r.categoria,
+        'tipo': r.tipo,
+        'fecha_hora': timezone.localtime(r.fecha_hora).strftime('%H:%M:%S'),
+    }
+
+
+def _obtener_registros_visita_hoy(tipo_visita, visita_id, limit=50):
+    registros = _registros_visita_del_dia(tipo_visita, visita_id).order_by('-fecha_hora', '-id')[:limit]
+    return [_serializar_registro(r) for r in registros]
+
+
+def _obtener_registros_visita_desde(tipo_visita, visita_id, desde, limit=50):
+    """
+    Página de registros posteriores al cursor, tomada desde el más antiguo
+    para no saltarse ninguno; se retorna del más reciente al más antiguo
+    junto con un indicador de si quedan registros por enviar.
+    """
+    registros = list(
+        _registros_visita_del_dia(tipo_visita, visita_id).filter(id__gt=desde).order_by('id')[:limit + 1]
+    )
+    hay_mas = len(registros) > limit
+    return [_serializar_registro(r) for r in reversed(registros[:limit])], hay_mas
 
 
 def _obtener_estado_actual_visita(tipo_visita, visita_id):
     """
-    Retorna dos listas para la visita:
+    Retorna dos listas para la visita, leídas de la tabla de presencia:
     - dentro: personas cuyo último movimiento es ENTRADA
     - fuera: personas cuyo último movimiento es SALIDA
     """
-    ultimos_ids = RegistroAccesoMina.objects.filter(
-        documento=OuterRef('documento'),
-        visita_tipo=tipo_visita,
-        visita_id=visita_id,
-    ).order_by('-fecha_hora', '-id').values('id')[:1]
-
-    ultimos_registros = RegistroAccesoMina.objects.filter(
+    presencias = PresenciaMina.objects.filter(
         visita_tipo=tipo_visita,
         visita_id=visita_id,
-        id=Subquery(ultimos_ids),
-    ).order_by('-fecha_hora')
+    ).order_by('-fecha_hora', '-id')
 
     dentro = []
     fuera = []
 
-    for r in ultimos_registros:
+    for p in presencias:
         item = {
-            'documento': r.documento,
-            'nombre_completo': r.nombre_completo,
-            'categoria': r.categoria,
-            'hora': timezone.localtime(r.fecha_hora).strftime('%H:%M:%S'),
+            'documento': p.documento,
+            'nombre_completo': p.nombre_completo,
+            'categoria': p.categoria,
+            'hora': timezone.localtime(p.fecha_hora).strftime('%H:%M:%S'),
         }
 
-        if r.tipo == 'ENTRADA':
+        if p.ultimo_tipo == 'ENTRADA':
             dentro.append(item)
         else:
             fuera.append(item)
@@ -507,98 +1029,48 @@ def _obtener_estado_actual_visita(tipo_visita, visita_id):
     }
 
 
-def _obtener_visitas_hoy_data():
-    hoy = timezone.localdate()
-    visitas = []
-    total_internas = 0
-    total_externas = 0
+def _obtener_cambios_presencia(tipo_visita, visita_id, desde):
+    """
+    Personas cuyo último movimiento es posterior al cursor, con su estado
+    actual ('dentro' o 'fuera'), de la más reciente a la más antigua.
+    """
+    presencias = PresenciaMina.objects.filter(
+        visita_tipo=tipo_visita,
+        visita_id=visita_id,
+        ultimo_registro_id__gt=desde,
+    ).order_by('-fecha_hora', '-id')
 
-    try:
-        from visitaInterna.models import VisitaInterna
-
-        internas = VisitaInterna.objects.filter(
-            estado__in=ESTADOS_VISITA_CONFIRMADA,
-            fecha_visita=hoy,
-        ).order_by('hora_inicio', 'id')
-
-        for visita in internas:
-            total_internas += 1
-            visitas.append({
-                'tipo': 'interna',
-                'tipo_label': 'Interna',
-                'visita_id': visita.id,
-                'nombre': visita.nombre_programa,
-                'responsable': visita.responsable,
-                'horario': _formatear_horario(visita.hora_inicio, visita.hora_fin),
-                'asistentes_aprobados': visita.asistentes.filter(estado='documentos_aprobados').count(),
-                'url_porteria': reverse('control_acceso_mina:porteria_visita', args=['interna', visita.id]),
-            })
-    except Exception:
-        pass
+    return [
+        {
+            'documento': p.documento,
+            'nombre_completo': p.nombre_completo,
+            'categoria': p.categoria,
+            'hora': timezone.localtime(p.fecha_hora).strftime('%H:%M:%S'),
+            'estado': 'dentro' if p.ultimo_tipo == 'ENTRADA' else 'fuera',
+        }
+        for p in presencias
+    ]
 
-    try:
-        from visitaExterna.models import VisitaExterna
-
-        externas = VisitaExterna.objects.filter(
-            estado__in=ESTADOS_VISITA_CONFIRMADA,
-            fecha_visita=hoy,
-        ).order_by('hora_inicio', 'id')
-
-        for visita in externas:
-            total_externas += 1
-            visitas.append({
-                'tipo': 'externa',
-                'tipo_label': 'Externa',
-                'visita_id': visita.id,
-                'nombre': visita.nombre,
-                'responsable': visita.nombre_responsable,
-                'horario': _formatear_horario(visita.hora_inicio, visita.hora_fin),
-                'asistentes_aprobados': visita.asistentes.filter(estado='documentos_aprobados').count(),
-                'url_porteria': reverse('control_acceso_mina:porteria_visita', args=['externa', visita.id]),
-            })
-    except Exception:
-        pass
 
-    return {
-        'visitas': visitas,
-        'totales': {
-            'internas': total_internas,
-            'externas': total_externas,
-            'total': total_internas + total_externas,
-        }
-    }
+def _obtener_visitas_hoy_data():
+    return obtener_visitas_hoy()
 
 
 def _contar_personas_en_mina():
     """
     Conteo global de personas dentro, independiente de visita.
     """
-    ultimos = RegistroAccesoMina.objects.filter(
-        documento=OuterRef('documento')
-    ).order_by('-fecha_hora').values('tipo')[:1]
-
-    return RegistroAccesoMina.objects.values('documento').annotate(
-        ultimo_tipo=Subquery(ultimos)
-    ).filter(
+    return PresenciaMina.objects.filter(
         ultimo_tipo='ENTRADA'
-    ).count()
+    ).values('documento').distinct().count()
 
 
 def _contar_personas_en_visita_mina(tipo_visita, visita_id):
     """
     Conteo de personas dentro para una visita puntual.
     """
-    ultimos = RegistroAccesoMina.objects.filter(
-        documento=OuterRef('documento'),
+    return PresenciaMina.objects.filter(
         visita_tipo=tipo_visita,
         visita_id=visita_id,
-    ).order_by('-fecha_hora').values('tipo')[:1]
-
-    return RegistroAccesoMina.objects.filter(
-        visita_tipo=tipo_visita,
-        visita_id=visita_id,
-    ).values('documento').annotate(
-        ultimo_tipo=Subquery(ultimos)
-    ).filter(
-        ultimo_tipo='ENTRADA'
+        ultimo_tipo='ENTRADA',
     ).count()
@@ -0,0 +1,32 @@
+﻿"""Rangos de fechas en la zona horaria local para filtrar campos DateTimeField.
+
+Filtrar con ``campo__date=dia`` obliga a la base de datos a convertir la zona
+horaria de cada fila y no aprovecha los índices sobre el campo. Estos helpers
+devuelven rangos semiabiertos [inicio, fin) en horas locales conscientes de
+zona para usarlos con ``campo__gte=inicio, campo__lt=fin``.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+
+def inicio_dia_local(fecha):
+    """Medianoche local (aware) del día indicado."""
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def rango_dia_local(fecha=None):
+    """Rango [inicio, fin) del día local indicado (hoy por defecto)."""
+    fecha = fecha or timezone.localdate()
+    return inicio_dia_local(fecha), inicio_dia_local(fecha + timedelta(days=1))
+
+
+def rango_fechas_local(fecha_desde=None, fecha_hasta=None):
+    """
+    Rango [inicio, fin) que cubre los días locales desde/hasta inclusive.
+    Cualquiera de los extremos puede ser None para dejar el rango abierto.
+    """
+    inicio = inicio_dia_local(fecha_desde) if fecha_desde else None
+    fin = inicio_dia_local(fecha_hasta + timedelta(days=1)) if fecha_hasta else None
+    return inicio, fin
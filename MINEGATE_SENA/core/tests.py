@@ -1,4 +1,16 @@
-﻿from django.test import TestCase
+﻿import time
+from datetime import date, timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.fechas import rango_dia_local, rango_fechas_local
+from core.versiones import cache_coordinacion, incrementar_version, obtener_version
+from core.views import _agregar_contexto_panel_principal
+from reportes.models import ResumenDiarioVisitas
 
 from core.sanitization import (
 	sanitize_document_number,
@@ -31,3 +43,81 @@ class SanitizationHelpersTests(TestCase):
 	def test_sanitize_phone_permite_caracteres_telefonicos(self):
 		raw = " +57 (310)-123-45#67 ext "
 		self.assertEqual(sanitize_phone(raw), "+57 (310)-123-4567")
+
+
+class RangoFechasLocalTests(TestCase):
+	def test_rango_dia_local_es_semiabierto_en_hora_local(self):
+		inicio, fin = rango_dia_local(date(2024, 3, 10))
+		self.assertEqual(timezone.localtime(inicio).date(), date(2024, 3, 10))
+		self.assertEqual(timezone.localtime(inicio).hour, 0)
+		self.assertEqual(timezone.localtime(fin).date(), date(2024, 3, 11))
+
+	def test_rango_fechas_local_incluye_dia_final(self):
+		inicio, fin = rango_fechas_local(date(2024, 3, 1), date(2024, 3, 31))
+		self.assertEqual(timezone.localtime(inicio).date(), date(2024, 3, 1))
+		self.assertEqual(timezone.localtime(fin).date(), date(2024, 4, 1))
+
+	def test_rango_fechas_local_admite_extremos_abiertos(self):
+		self.assertEqual(rango_fechas_local(None, None), (None, None))
+
+
+class VersionesTests(TestCase):
+	def setUp(self):
+		cache_coordinacion().clear()
+
+	def test_incrementa_desde_la_version_inicial(self):
+		inicial = obtener_version("pruebas:version")
+		self.assertEqual(incrementar_version("pruebas:version"), inicial + 1)
+		self.assertEqual(obtener_version("pruebas:version"), inicial + 1)
+
+	def test_reiniciar_la_cache_no_repite_versiones(self):
+		entregadas = {obtener_version("pruebas:version")}
+		entregadas.add(incrementar_version("pruebas:version"))
+		entregadas.add(incrementar_version("pruebas:version"))
+
+		# Un reinicio posterior arranca por encima de lo ya entregado.
+		despues = time.time() + 1
+		with mock.patch("core.versiones.time.time", return_value=despues):
+			cache_coordinacion().clear()
+			self.assertGreater(incrementar_version("pruebas:version"), max(entregadas))
+			cache_coordinacion().clear()
+			self.assertGreater(obtener_version("pruebas:version"), max(entregadas))
+
+
+	def test_descartar_entradas_de_la_cache_por_defecto_no_toca_los_contadores(self):
+		caches_bd = {
+			"default": {
+				"BACKEND": "django.core.cache.backends.db.DatabaseCache",
+				"LOCATION": settings.CACHES["default"]["LOCATION"],
+				"OPTIONS": {"MAX_ENTRIES": 5, "CULL_FREQUENCY": 2},
+			},
+			"coordinacion": settings.CACHES["coordinacion"],
+		}
+		with override_settings(CACHES=caches_bd):
+			version = incrementar_version("pruebas:version")
+			for numero in range(20):
+				cache.set(f"pruebas:resultado:{numero}", numero)
+			self.assertLessEqual(len(cache.get_many([f"pruebas:resultado:{n}" for n in range(20)])), 6)
+			self.assertEqual(obtener_version("pruebas:version"), version)
+
+
+class PanelPrincipalTendenciaTests(TestCase):
+	def test_tendencia_de_7_dias_sale_de_los_resumenes(self):
+		hoy = timezone.localdate()
+		ResumenDiarioVisitas.objects.bulk_create([
+			ResumenDiarioVisitas(fecha=hoy, tipo="interna", estado="pendiente", total=3),
+			ResumenDiarioVisitas(fecha=hoy, tipo="externa", estado="aprobada_final", total=1),
+			ResumenDiarioVisitas(fecha=hoy - timedelta(days=2), tipo="externa", estado="pendiente", total=2),
+			ResumenDiarioVisitas(fecha=hoy - timedelta(days=9), tipo="interna", estado="pendiente", total=5),
+		])
+
+		context = {}
+		_agregar_contexto_panel_principal(context)
+
+		tendencia = context["dashboard"]["tendencia_7_dias"]
+		self.assertEqual([item["fecha"] for item in tendencia], [hoy - timedelta(days=d) for d in range(6, -1, -1)])
+		self.assertEqual(tendencia[-1]["internas"], 3)
+		self.assertEqual(tendencia[-1]["externas"], 1)
+		self.assertEqual(tendencia[-1]["pct"], 100.0)
+		self.assertEqual(tendencia[-3]["total"], 2)
+		self.assertEqual(sum(item["total"] for item in tendencia), 6)
@@ -0,0 +1,52 @@
+﻿"""Contadores de versión en la caché compartida.
+
+Varios módulos guardan en caché resultados derivados (roster de portería,
+filas de reportes, notificaciones de paneles) bajo una clave que incluye un
+contador de versión. Cada cambio relevante incrementa el contador y así los
+resultados anteriores dejan de usarse.
+
+El contador arranca en la hora actual en milisegundos y no en cero: si la
+caché se reinicia el nuevo valor es mayor que cualquiera entregado antes
+(salvo que se hayan hecho más incrementos que milisegundos transcurridos), así
+que no vuelve a coincidir con una versión ya usada para una clave de caché, un
+ETag o un archivo guardado.
+
+Los contadores viven en el alias de caché "coordinacion" (ver CACHES en
+settings), que no se descarta al llenarse la caché de resultados.
+"""
+
+import time
+
+from django.core.cache import caches
+
+
+CACHE_COORDINACION = "coordinacion"
+
+
+def cache_coordinacion():
+    """Caché compartida para contadores y cupos que no deben descartarse."""
+    return caches[CACHE_COORDINACION]
+
+
+def _version_inicial():
+    return int(time.time() * 1000)
+
+
+def obtener_version(clave):
+    """Versión actual del contador ``clave``; lo inicializa si no existe."""
+    cache = cache_coordinacion()
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, _version_inicial(), timeout=None)
+        version = cache.get(clave)
+    return version
+
+
+def incrementar_version(clave):
+    """Incrementa el contador ``clave`` y devuelve la nueva versión."""
+    cache = cache_coordinacion()
+    try:
+        return cache.incr(clave)
+    except ValueError:
+        cache.add(clave, _version_inicial(), timeout=None)
+        return cache.incr(clave)
@@ -21,6 +21,7 @@ from django.urls import reverse
 from django.utils import timezone
 from PIL import Image, ImageOps, UnidentifiedImageError
 from usuarios.models import PerfilUsuario
+from .fechas import inicio_dia_local, rango_dia_local, rango_fechas_local
 from calendario.models import Availability, ReservaHorario
 from .forms import (
     ContenidoPaginaInformativaForm,
@@ -36,7 +37,9 @@ from .models import (
 from visitaInterna.models import VisitaInterna, AsistenteVisitaInterna
 from visitaExterna.models import VisitaExterna, AsistenteVisitaExterna
 from control_acceso_mina.models import RegistroAccesoMina
-from reportes.views import _obtener_filas_reporte
+from gestion_visitas.models import VisitaUnificada
+from reportes.resumenes import obtener_tendencias
+from reportes.views import _obtener_pagina_reporte
 
 
 SECCIONES_PANEL_SUPERUSUARIO = {
@@ -638,7 +641,7 @@ def _agregar_contexto_calendario(context):
 
 
 def _agregar_contexto_panel_principal(context):
-    hoy = date.today()
+    hoy = timezone.localdate()
     inicio_mes_actual = hoy.replace(day=1)
     fin_mes_anterior = inicio_mes_actual - timedelta(days=1)
     inicio_mes_anterior = fin_mes_anterior.replace(day=1)
@@ -678,25 +681,28 @@ def _agregar_contexto_panel_principal(context):
             + AsistenteVisitaExterna.objects.count()
         )
 
+        inicio_hoy, fin_hoy = rango_dia_local(hoy)
         accesos_hoy_entradas = RegistroAccesoMina.objects.filter(
-            fecha_hora__date=hoy, tipo="ENTRADA"
+            fecha_hora__gte=inicio_hoy, fecha_hora__lt=fin_hoy, tipo="ENTRADA"
         ).count()
         accesos_hoy_salidas = RegistroAccesoMina.objects.filter(
-            fecha_hora__date=hoy, tipo="SALIDA"
+            fecha_hora__gte=inicio_hoy, fecha_hora__lt=fin_hoy, tipo="SALIDA"
         ).count()
 
+        inicio_actual = inicio_dia_local(inicio_mes_actual)
         visitas_mes_actual = (
-            visitas_int_qs.filter(fecha_solicitud__date__gte=inicio_mes_actual).count()
-            + visitas_ext_qs.filter(fecha_solicitud__date__gte=inicio_mes_actual).count()
+            visitas_int_qs.filter(fecha_solicitud__gte=inicio_actual).count()
+            + visitas_ext_qs.filter(fecha_solicitud__gte=inicio_actual).count()
         )
+        inicio_anterior, fin_anterior = rango_fechas_local(inicio_mes_anterior, fin_mes_anterior)
         visitas_mes_anterior = (
             visitas_int_qs.filter(
-                fecha_solicitud__date__gte=inicio_mes_anterior,
-                fecha_solicitud__date__lte=fin_mes_anterior,
+                fecha_solicitud__gte=inicio_anterior,
+                fecha_solicitud__lt=fin_anterior,
             ).count()
             + visitas_ext_qs.filter(
-                fecha_solicitud__date__gte=inicio_mes_anterior,
-                fecha_solicitud__date__lte=fin_mes_anterior,
+                fecha_solicitud__gte=inicio_anterior,
+                fecha_solicitud__lt=fin_anterior,
             ).count()
         )
 
@@ -705,12 +711,17 @@ def _agregar_contexto_panel_principal(context):
             visitas_mes_anterior,
         )
 
+        # Las tendencias salen de las tablas de resumen (reportes.resumenes).
+        tendencias = obtener_tendencias(hoy - timedelta(days=6), hoy)
+        visitas_por_dia = {fila["periodo"]: fila for fila in tendencias["visitas"]}
+
         tendencia_7_dias = []
         max_tendencia = 1
         for offset in range(6, -1, -1):
             dia = hoy - timedelta(days=offset)
-            internas_dia = visitas_int_qs.filter(fecha_solicitud__date=dia).count()
-            externas_dia = visitas_ext_qs.filter(fecha_solicitud__date=dia).count()
+            fila_dia = visitas_por_dia.get(dia.isoformat(), {})
+            internas_dia = fila_dia.get("interna", 0)
+            externas_dia = fila_dia.get("externa", 0)
             total_dia = internas_dia + externas_dia
 
             tendencia_7_dias.append(
@@ -727,37 +738,20 @@ def _agregar_contexto_panel_principal(context):
         for item in tendencia_7_dias:
             item["pct"] = round((item["total"] / max_tendencia) * 100, 1)
 
-        visitas_recientes = []
-        for visita in visitas_int_qs.order_by("-fecha_solicitud")[:6]:
-            visitas_recientes.append(
-                {
-                    "id": visita.id,
-                    "tipo": "Interna",
-                    "responsable": visita.responsable,
-                    "entidad": visita.nombre_programa,
-                    "estado": visita.estado,
-                    "estado_label": visita.estado.replace("_", " ").capitalize(),
-                    "fecha_solicitud": visita.fecha_solicitud,
-                }
-            )
-
-        for visita in visitas_ext_qs.order_by("-fecha_solicitud")[:6]:
-            visitas_recientes.append(
-                {
-                    "id": visita.id,
-                    "tipo": "Externa",
-                    "responsable": visita.nombre_responsable,
-                    "entidad": visita.nombre,
-                    "estado": visita.estado,
-                    "estado_label": visita.estado.replace("_", " ").capitalize(),
-                    "fecha_solicitud": visita.fecha_solicitud,
-                }
-            )
-
-        visitas_recientes.sort(
-            key=lambda item: item.get("fecha_solicitud") or timezone.now() - timedelta(days=36500),
-            reverse=True,
-        )
+        visitas_recientes = [
+            {
+                "id": visita["visita_id"],
+                "tipo": "Interna" if visita["tipo"] == "interna" else "Externa",
+                "responsable": visita["responsable"],
+                "entidad": visita["nombre"],
+                "estado": visita["estado"],
+                "estado_label": visita["estado"].replace("_", " ").capitalize(),
+                "fecha_solicitud": visita["fecha_solicitud"],
+            }
+            for visita in VisitaUnificada.objects.order_by("-fecha_solicitud", "-visita_id").values(
+                "tipo", "visita_id", "responsable", "nombre", "estado", "fecha_solicitud"
+            )[:8]
+        ]
 
         context.update(
             {
@@ -776,7 +770,7 @@ def _agregar_contexto_panel_principal(context):
                     "visitas_mes_anterior": visitas_mes_anterior,
                     "variacion_mes_pct": variacion_mes_pct,
                     "tendencia_7_dias": tendencia_7_dias,
-                    "visitas_recientes": visitas_recientes[:8],
+                    "visitas_recientes": visitas_recientes,
                 }
             }
         )
@@ -907,13 +901,14 @@ def _render_panel_administrativo(
         _agregar_contexto_pagina_informativa(request, context)
 
     if seccion_activa == "reportes":
-        filas, filtros = _obtener_filas_reporte(request)
+        pagina, filtros, query_string = _obtener_pagina_reporte(request)
         context.update(
             {
-                "filas_reportes": filas[:100],
-                "total_filas_reportes": len(filas),
+                "filas_reportes": pagina["filas"],
+                "total_filas_reportes": pagina["total"],
+                "pagina_reportes": pagina,
                 "filtros_reportes": filtros,
-                "query_string_reportes": request.GET.urlencode(),
+                "query_string_reportes": query_string,
                 "estados_reportes": VisitaInterna.ESTADO_CHOICES,
             }
         )
@@ -0,0 +1,156 @@
+﻿"""
+Estado de revisión de los documentos de un asistente.
+
+Un asistente tiene varias versiones por documento requerido; cuenta la más
+reciente. Su estado agregado (pendiente, aprobado o rechazado) se calcula
+con esas últimas versiones y la autorización de padres, y se guarda en el
+asistente desde las acciones que suben o revisan documentos
+(sincronizar_estado_asistente). Los listados de solo lectura lo calculan en
+memoria con calcular_estado_revision_asistente sobre documentos precargados
+con prefetch_documentos_subidos.
+"""
+
+from django.db.models import Prefetch
+
+from .models import DocumentoSubidoAsistente
+
+
+def prefetch_documentos_subidos():
+    """Prefetch de documentos subidos en el orden que espera el agrupamiento."""
+    return Prefetch(
+        "documentos_subidos",
+        queryset=DocumentoSubidoAsistente.objects.select_related(
+            "documento_requerido"
+        ).order_by("documento_requerido_id", "-fecha_subida", "-id"),
+    )
+
+
+def documentos_subidos_actuales(asistente, docs=None):
+    """Retorna la última versión por documento y metadatos de reenvío.
+
+    ``docs`` permite pasar los documentos ya cargados con
+    ``prefetch_documentos_subidos`` para no consultar por cada asistente.
+    """
+    if docs is None:
+        docs = asistente.documentos_subidos.select_related(
+            "documento_requerido"
+        ).order_by("documento_requerido_id", "-fecha_subida", "-id")
+    latest_por_documento = {}
+    conteo_por_documento = {}
+    historial_por_documento = {}
+    for ds in docs:
+        conteo_por_documento[ds.documento_requerido_id] = (
+            conteo_por_documento.get(ds.documento_requerido_id, 0) + 1
+        )
+        historial_por_documento.setdefault(ds.documento_requerido_id, []).append(ds)
+        if ds.documento_requerido_id not in latest_por_documento:
+            latest_por_documento[ds.documento_requerido_id] = ds
+
+    documentos_actuales = []
+    for doc_id, ds in latest_por_documento.items():
+        versiones_envio = conteo_por_documento.get(doc_id, 1)
+        documentos_actuales.append(
+            {
+                "ds": ds,
+                "versiones_envio": versiones_envio,
+                "es_reenvio": versiones_envio > 1,
+                "historial_versiones": historial_por_documento.get(doc_id, [ds]),
+            }
+        )
+    return documentos_actuales
+
+
+def normalizar_categoria_documento(categoria):
+    return (
+        str(categoria or "")
+        .strip()
+        .lower()
+        .replace("á", "a")
+        .replace("é", "e")
+        .replace("í", "i")
+        .replace("ó", "o")
+        .replace("ú", "u")
+    )
+
+
+def es_categoria_archivo_final(categoria):
+    categoria_normalizada = normalizar_categoria_documento(categoria)
+    return categoria_normalizada in {
+        "ats",
+        "formato induccion y reinduccion",
+        "charla de seguridad y calestenia",
+        "charla de seguridad y calistenia",
+    }
+
+
+def calcular_estado_revision_asistente(asistente, documentos_actuales=None):
+    """Calcula estado agregado del asistente en función de sus últimos documentos."""
+    if documentos_actuales is None:
+        documentos_actuales = documentos_subidos_actuales(asistente)
+    documentos_personales = [
+        doc_actual
+        for doc_actual in documentos_actuales
+        if not es_categoria_archivo_final(
+            doc_actual["ds"].documento_requerido.categoria
+        )
+    ]
+    tiene_docs = bool(documentos_personales)
+    tiene_rechazos = any(
+        doc_actual["ds"].estado == "rechazado" for doc_actual in documentos_personales
+    )
+    todos_aprobados = all(
+        doc_actual["ds"].estado == "aprobado" for doc_actual in documentos_personales
+    )
+
+    tiene_autorizacion_padres = bool(
+        getattr(asistente, "formato_autorizacion_padres", None)
+    )
+    if tiene_autorizacion_padres:
+        estado_autorizacion = getattr(
+            asistente, "estado_autorizacion_padres", "pendiente"
+        )
+        if estado_autorizacion == "rechazado":
+            tiene_rechazos = True
+        elif estado_autorizacion != "aprobado":
+            todos_aprobados = False
+    # Sin documentos personales basta la autorización de padres aprobada.
+    todos_aprobados = todos_aprobados and (tiene_docs or tiene_autorizacion_padres)
+
+    if tiene_rechazos:
+        estado = "documentos_rechazados"
+    elif todos_aprobados:
+        estado = "documentos_aprobados"
+    else:
+        estado = "pendiente_documentos"
+
+    return {
+        "estado": estado,
+        "tiene_rechazos": tiene_rechazos,
+        "todos_aprobados": todos_aprobados,
+    }
+
+
+def sincronizar_estado_asistente(asistente, observacion_rechazo=""):
+    """Sincroniza el estado agregado del asistente con el estado real de sus documentos."""
+    revision = calcular_estado_revision_asistente(asistente)
+    update_fields = []
+
+    if asistente.estado != revision["estado"]:
+        asistente.estado = revision["estado"]
+        update_fields.append("estado")
+
+    if revision["estado"] == "documentos_rechazados":
+        nueva_observacion = (observacion_rechazo or "").strip() or (
+            asistente.observaciones_revision or ""
+        )
+        if nueva_observacion and asistente.observaciones_revision != nueva_observacion:
+            asistente.observaciones_revision = nueva_observacion
+            update_fields.append("observaciones_revision")
+    elif asistente.observaciones_revision:
+        asistente.observaciones_revision = ""
+        update_fields.append("observaciones_revision")
+
+    if update_fields:
+        asistente.save(update_fields=update_fields)
+
+    return revision
@@ -13,6 +13,7 @@ from django.utils import timezone
 from visitaInterna.models import VisitaInterna, AsistenteVisitaInterna
 from visitaExterna.models import VisitaExterna, AsistenteVisitaExterna
 from .models import Documento, DocumentoSubidoAsistente
+from .revision import es_categoria_archivo_final, sincronizar_estado_asistente
 from core.sanitization import (
     sanitize_document_number,
     sanitize_phone,
@@ -45,82 +46,6 @@ def devolver_visita_a_agendador(visita):
         visita.save(update_fields=["estado"])
 
 
-def _documentos_actuales_asistente(asistente):
-    """Retorna la última versión por documento para un asistente."""
-    docs = asistente.documentos_subidos.order_by(
-        "documento_requerido_id", "-fecha_subida", "-id"
-    )
-    latest_por_documento = {}
-    for ds in docs:
-        if ds.documento_requerido_id not in latest_por_documento:
-            latest_por_documento[ds.documento_requerido_id] = ds
-    return list(latest_por_documento.values())
-
-
-def _normalizar_categoria_documento(categoria):
-    return (
-        str(categoria or "")
-        .strip()
-        .lower()
-        .replace("á", "a")
-        .replace("é", "e")
-        .replace("í", "i")
-        .replace("ó", "o")
-        .replace("ú", "u")
-    )
-
-
-def _es_categoria_archivo_final(categoria):
-    categoria_normalizada = _normalizar_categoria_documento(categoria)
-    return categoria_normalizada in {
-        "ats",
-        "formato induccion y reinduccion",
-        "charla de seguridad y calestenia",
-        "charla de seguridad y calistenia",
-    }
-
-
-def _sincronizar_estado_asistente(asistente):
-    """Sincroniza estado agregado del asistente según sus documentos actuales."""
-    docs_actuales = _documentos_actuales_asistente(asistente)
-    docs_personales = [
-        ds
-        for ds in docs_actuales
-        if not _es_categoria_archivo_final(ds.documento_requerido.categoria)
-    ]
-
-    tiene_rechazos = any(ds.estado == "rechazado" for ds in docs_personales)
-    todos_aprobados = bool(docs_personales) and all(
-        ds.estado == "aprobado" for ds in docs_personales
-    )
-
-    if asistente.formato_autorizacion_padres:
-        if asistente.estado_autorizacion_padres == "rechazado":
-            tiene_rechazos = True
-        elif asistente.estado_autorizacion_padres != "aprobado":
-            todos_aprobados = False
-
-    nuevo_estado = "pendiente_documentos"
-    if tiene_rechazos:
-        nuevo_estado = "documentos_rechazados"
-    elif todos_aprobados:
-        nuevo_estado = "documentos_aprobados"
-
-    update_fields = []
-    if asistente.estado != nuevo_estado:
-        asistente.estado = nuevo_estado
-        update_fields.append("estado")
-
-    if nuevo_estado != "documentos_rechazados" and asistente.observaciones_revision:
-        asistente.observaciones_revision = ""
-        update_fields.append("observaciones_revision")
-
-    if update_fields:
-        asistente.save(update_fields=update_fields)
-
-    return nuevo_estado
-
-
 def _enviar_correo_documento_rechazado(request, doc, asistente, observaciones):
     """Notifica al responsable que un documento fue rechazado y requiere correccion."""
     try:
@@ -879,7 +804,7 @@ def revisar_documento_asistente_api(request, documento_subido_id):
 
     if estado == "rechazado":
         if asistente:
-            if not _es_categoria_archivo_final(doc.documento_requerido.categoria):
+            if not es_categoria_archivo_final(doc.documento_requerido.categoria):
                 asistente.observaciones_revision = (
                     f"Documento '{doc.documento_requerido.titulo}' rechazado: {observaciones}"
                     if observaciones
@@ -889,7 +814,7 @@ def revisar_documento_asistente_api(request, documento_subido_id):
             _enviar_correo_documento_rechazado(request, doc, asistente, observaciones)
 
     if asistente:
-        nuevo_estado_asistente = _sincronizar_estado_asistente(asistente)
+        nuevo_estado_asistente = sincronizar_estado_asistente(asistente)["estado"]
     else:
         nuevo_estado_asistente = None
 
@@ -0,0 +1,71 @@
+# Generated by Django 4.2.27 on 2026-10-18 12:15
+
+from django.db import migrations, models
+
+
+# Las migraciones que cambien estas columnas en visita_interna o visita_externa
+# deben eliminar la vista antes y volver a crearla después.
+CREAR_VISTA = """
+CREATE VIEW visita_unificada AS
+SELECT 'interna-' || id AS clave,
+       'interna' AS tipo,
+       id,
+       nombre_programa AS nombre,
+       responsable,
+       correo_responsable AS correo,
+       fecha_solicitud,
+       fecha_visita,
+       estado,
+       cantidad_aprendices AS cantidad
+FROM visita_interna
+UNION ALL
+SELECT 'externa-' || id AS clave,
+       'externa' AS tipo,
+       id,
+       nombre,
+       nombre_responsable AS responsable,
+       correo_responsable AS correo,
+       fecha_solicitud,
+       fecha_visita,
+       estado,
+       cantidad_visitantes AS cantidad
+FROM visita_externa
+"""
+
+ELIMINAR_VISTA = "DROP VIEW IF EXISTS visita_unificada"
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('visitaInterna', '0022_fecha_solicitud_idx'),
+        ('visitaExterna', '0020_fecha_solicitud_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitaUnificada',
+            fields=[
+                ('clave', models.CharField(max_length=30, primary_key=True, serialize=False, verbose_name='Clave')),
+                ('tipo', models.CharField(choices=[('interna', 'Interna'), ('externa', 'Externa')], max_length=10, verbose_name='Tipo de visita')),
+                ('visita_id', models.IntegerField(db_column='id', verbose_name='ID de visita')),
+                ('nombre', models.CharField(max_length=200, verbose_name='Programa o institución')),
+                ('responsable', models.CharField(max_length=200, verbose_name='Responsable')),
+                ('correo', models.EmailField(max_length=254, verbose_name='Correo del responsable')),
+                ('fecha_solicitud', models.DateTimeField(verbose_name='Fecha de solicitud')),
+                ('fecha_visita', models.DateField(null=True, verbose_name='Fecha de visita')),
+                ('estado', models.CharField(max_length=30, verbose_name='Estado')),
+                ('cantidad', models.PositiveIntegerField(verbose_name='Cantidad de personas')),
+            ],
+            options={
+                'verbose_name': 'Visita (interna o externa)',
+                'verbose_name_plural': 'Visitas (internas y externas)',
+                'db_table': 'visita_unificada',
+                'ordering': ['-fecha_solicitud', '-visita_id'],
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(CREAR_VISTA, ELIMINAR_VISTA),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 4.2.27 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+# La vista se vuelve a crear con las columnas de contacto del responsable y el
+# horario, que usan los reportes y el listado de visitas del día en portería.
+CREAR_VISTA = """
+CREATE VIEW visita_unificada AS
+SELECT 'interna-' || id AS clave,
+       'interna' AS tipo,
+       id,
+       nombre_programa AS nombre,
+       responsable,
+       correo_responsable AS correo,
+       fecha_solicitud,
+       fecha_visita,
+       estado,
+       cantidad_aprendices AS cantidad,
+       documento_responsable,
+       telefono_responsable,
+       hora_inicio,
+       hora_fin
+FROM visita_interna
+UNION ALL
+SELECT 'externa-' || id AS clave,
+       'externa' AS tipo,
+       id,
+       nombre,
+       nombre_responsable AS responsable,
+       correo_responsable AS correo,
+       fecha_solicitud,
+       fecha_visita,
+       estado,
+       cantidad_visitantes AS cantidad,
+       documento_responsable,
+       telefono_responsable,
+       hora_inicio,
+       hora_fin
+FROM visita_externa
+"""
+
+CREAR_VISTA_ANTERIOR = """
+CREATE VIEW visita_unificada AS
+SELECT 'interna-' || id AS clave,
+       'interna' AS tipo,
+       id,
+       nombre_programa AS nombre,
+       responsable,
+       correo_responsable AS correo,
+       fecha_solicitud,
+       fecha_visita,
+       estado,
+       cantidad_aprendices AS cantidad
+FROM visita_interna
+UNION ALL
+SELECT 'externa-' || id AS clave,
+       'externa' AS tipo,
+       id,
+       nombre,
+       nombre_responsable AS responsable,
+       correo_responsable AS correo,
+       fecha_solicitud,
+       fecha_visita,
+       estado,
+       cantidad_visitantes AS cantidad
+FROM visita_externa
+"""
+
+ELIMINAR_VISTA = "DROP VIEW IF EXISTS visita_unificada"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_visitas', '0001_visita_unificada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visitaunificada',
+            name='documento_responsable',
+            field=models.CharField(default='', max_length=50, verbose_name='Documento del responsable'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='visitaunificada',
+            name='telefono_responsable',
+            field=models.CharField(default='', max_length=20, verbose_name='Teléfono del responsable'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='visitaunificada',
+            name='hora_inicio',
+            field=models.TimeField(null=True, verbose_name='Hora de inicio'),
+        ),
+        migrations.AddField(
+            model_name='visitaunificada',
+            name='hora_fin',
+            field=models.TimeField(null=True, verbose_name='Hora de fin'),
+        ),
+        migrations.RunSQL(
+            [ELIMINAR_VISTA, CREAR_VISTA],
+            [ELIMINAR_VISTA, CREAR_VISTA_ANTERIOR],
+        ),
+    ]
@@ -1,2 +1,66 @@
-﻿from django.db import models
+﻿from django.db import NotSupportedError, models
 
+
+MENSAJE_SOLO_LECTURA = "VisitaUnificada es de solo lectura."
+
+
+class VisitaUnificadaQuerySet(models.QuerySet):
+    """Impide las escrituras masivas, que no pasan por save() ni delete()."""
+
+    def update(self, **kwargs):
+        raise NotSupportedError(MENSAJE_SOLO_LECTURA)
+
+    def delete(self):
+        raise NotSupportedError(MENSAJE_SOLO_LECTURA)
+
+    def bulk_create(self, *args, **kwargs):
+        raise NotSupportedError(MENSAJE_SOLO_LECTURA)
+
+    def bulk_update(self, *args, **kwargs):
+        raise NotSupportedError(MENSAJE_SOLO_LECTURA)
+
+
+class VisitaUnificada(models.Model):
+    """
+    Vista de base de datos (UNION ALL de visita_interna y visita_externa) con
+    las columnas comunes de ambos tipos de visita. Permite filtrar, ordenar y
+    paginar listados combinados en una sola consulta. Es de solo lectura: las
+    escrituras se hacen sobre VisitaInterna y VisitaExterna.
+    """
+    TIPO_CHOICES = [
+        ('interna', 'Interna'),
+        ('externa', 'Externa'),
+    ]
+
+    clave = models.CharField(max_length=30, primary_key=True, verbose_name="Clave")
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES, verbose_name="Tipo de visita")
+    visita_id = models.IntegerField(db_column='id', verbose_name="ID de visita")
+    nombre = models.CharField(max_length=200, verbose_name="Programa o institución")
+    responsable = models.CharField(max_length=200, verbose_name="Responsable")
+    correo = models.EmailField(verbose_name="Correo del responsable")
+    fecha_solicitud = models.DateTimeField(verbose_name="Fecha de solicitud")
+    fecha_visita = models.DateField(null=True, verbose_name="Fecha de visita")
+    estado = models.CharField(max_length=30, verbose_name="Estado")
+    cantidad = models.PositiveIntegerField(verbose_name="Cantidad de personas")
+    documento_responsable = models.CharField(max_length=50, verbose_name="Documento del responsable")
+    telefono_responsable = models.CharField(max_length=20, verbose_name="Teléfono del responsable")
+    hora_inicio = models.TimeField(null=True, verbose_name="Hora de inicio")
+    hora_fin = models.TimeField(null=True, verbose_name="Hora de fin")
+
+    objects = VisitaUnificadaQuerySet.as_manager()
+
+    class Meta:
+        managed = False
+        db_table = 'visita_unificada'
+        verbose_name = "Visita (interna o externa)"
+        verbose_name_plural = "Visitas (internas y externas)"
+        ordering = ['-fecha_solicitud', '-visita_id']
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.visita_id} - {self.nombre}"
+
+    def save(self, *args, **kwargs):
+        raise NotSupportedError(MENSAJE_SOLO_LECTURA)
+
+    def delete(self, *args, **kwargs):
+        raise NotSupportedError(MENSAJE_SOLO_LECTURA)
@@ -0,0 +1,21 @@
+﻿"""
+Versión de las notificaciones de visitas de los paneles.
+
+Un contador en caché que se incrementa cada vez que se guarda o elimina una
+visita o un asistente (ver gestion_visitas.signals). El endpoint de
+notificaciones lo usa como ETag: mientras no cambie responde 304 sin
+consultar la base de datos. El contador se maneja con core.versiones.
+"""
+
+from core.versiones import incrementar_version, obtener_version
+
+
+CLAVE_VERSION_NOTIFICACIONES = "gestion_visitas:version_notificaciones"
+
+
+def obtener_version_notificaciones():
+    return obtener_version(CLAVE_VERSION_NOTIFICACIONES)
+
+
+def incrementar_version_notificaciones():
+    return incrementar_version(CLAVE_VERSION_NOTIFICACIONES)
@@ -56,11 +56,17 @@ class GeneradorQRPDF:
     
     def generar_datos_qr(self):
         """
-        Genera los datos para el código QR.
-        Formato: SENA|visita_id|documento|nombre|tipo
+        Genera los datos firmados para el código QR.
+        Formato: SENA2|tipo|visita_id|documento|valido_hasta|firma
         """
-        datos = f"SENA|{self.visita.id}|{self.asistente.numero_documento}|{self.asistente.nombre_completo}|{self.tipo_visita}"
-        return datos
+        from control_acceso_mina.qr import generar_datos_qr_firmado
+
+        return generar_datos_qr_firmado(
+            tipo_visita=self.tipo_visita,
+            visita_id=self.visita.id,
+            documento=self.asistente.numero_documento,
+            fecha_visita=getattr(self.visita, 'fecha_visita', None),
+        )
     
     def crear_qr_imagen(self):
         """
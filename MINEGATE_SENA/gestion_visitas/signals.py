@@ -3,7 +3,8 @@ Signals para manejar eventos automáticos de las visitas.
 Dispara la generación y envío de QR cuando un asistente es aprobado.
 """
 
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.contrib.auth.models import User
 from django.db.models import Q
 from django.dispatch import receiver
@@ -18,6 +19,7 @@ from visitaInterna.models import AsistenteVisitaInterna
 from visitaExterna.models import AsistenteVisitaExterna
 from visitaInterna.models import VisitaInterna
 from visitaExterna.models import VisitaExterna
+from gestion_visitas.notificaciones import incrementar_version_notificaciones
 from gestion_visitas.services import GeneradorQRPDF
 import logging
 
@@ -274,3 +276,16 @@ def generar_qr_asistente_externo(sender, instance, created, update_fields, **kwa
         
         except Exception as e:
             logger.error(f"Error en signal generar_qr_asistente_externo: {str(e)}")
+
+
+@receiver(post_save, sender=VisitaInterna)
+@receiver(post_delete, sender=VisitaInterna)
+@receiver(post_save, sender=VisitaExterna)
+@receiver(post_delete, sender=VisitaExterna)
+@receiver(post_save, sender=AsistenteVisitaInterna)
+@receiver(post_delete, sender=AsistenteVisitaInterna)
+@receiver(post_save, sender=AsistenteVisitaExterna)
+@receiver(post_delete, sender=AsistenteVisitaExterna)
+def notificaciones_modificadas(sender, instance, **kwargs):
+    """Invalida la versión de las notificaciones de los paneles."""
+    transaction.on_commit(incrementar_version_notificaciones)
@@ -197,6 +197,139 @@ function actualizarTarjetaEstadoActiva(estado) {
   }
 }
 
+// Paginación por cursor del listado: cargarVisitas() pide la primera página y
+// cargarMasVisitas() las siguientes cuando la última fila entra en pantalla.
+const listadoVisitas = {
+  params: null,
+  cursor: null,
+  cargando: false,
+  solicitud: 0,
+  observador: null,
+};
+
+function actualizarEstadisticasVisitas(stats, total) {
+  const totalEl = document.getElementById('statTotalVisitas');
+  document.getElementById('statPendientes').textContent = stats.pendientes;
+  document.getElementById('statAprobadas').textContent = stats.aprobadas_total;
+  if (totalEl) {
+    totalEl.textContent = stats.total ?? total;
+  }
+
+  const docsPend = stats.docs_pendientes_revision || 0;
+  const visitasEnRev = stats.en_revision || 0;
+
+  document.getElementById('statEnRevision').textContent = docsPend;
+  document.getElementById('statEnRevisionArchivos').textContent = visitasEnRev > 0 ? `${visitasEnRev} visita(s)` : '';
+
+  const docsEnviados = stats.documentos_enviados || 0;
+  const enRevision = stats.en_revision || 0;
+  const badgeRev = document.getElementById('badgeEnRevision');
+  const alertaDocs = document.getElementById('alertaDocsPendientes');
+  if (enRevision > 0) {
+    badgeRev.textContent = enRevision;
+    badgeRev.style.display = 'block';
+  } else {
+    badgeRev.style.display = 'none';
+  }
+
+  if (docsPend > 0 || docsEnviados > 0) {
+    alertaDocs.style.display = 'flex';
+    let textoAlerta = '';
+    if (docsPend > 0 && docsEnviados > 0) {
+      textoAlerta = `Hay ${docsPend} documento(s) de asistentes pendientes de aprobación y ${docsEnviados} visita(s) con documentos enviados.`;
+    } else if (docsPend > 0) {
+      textoAlerta = `Hay ${docsPend} documento(s) de asistentes pendientes de aprobación.`;
+    } else {
+      textoAlerta = `Hay ${docsEnviados} visita(s) con documentos enviados que requieren tu revisión.`;
+    }
+    document.getElementById('alertaDocsTexto').textContent = textoAlerta;
+  } else {
+    alertaDocs.style.display = 'none';
+  }
+
+  const sidebarBadge = document.getElementById('sidebarBadgeDocs');
+  const totalNotif = docsPend + docsEnviados;
+  if (totalNotif > 0) {
+    sidebarBadge.textContent = totalNotif;
+    sidebarBadge.style.display = 'block';
+  } else {
+    sidebarBadge.style.display = 'none';
+  }
+}
+
+function construirFilasVisitas(visitas) {
+  let html = '';
+  visitas.forEach(v => {
+    const estadoBadge = getEstadoBadge(v.estado);
+    const tipoFila = tipoVisitaActual === 'todas' ? (v.tipo === 'interna' ? 'internas' : 'externas') : tipoVisitaActual;
+    html += `<tr id="visita-${tipoFila}-${v.id}" class="docs-fila gv-fila visit-row" data-id="${v.id}" data-tipo="${tipoFila}">
+        <td class="gv-celda-id">#${v.id}</td>
+        <td>
+          <span class="gv-tipo-badge ${v.tipo === 'interna' ? 'interna' : 'externa'}">
+            ${v.tipo === 'interna' ? 'Interna' : 'Externa'}
+          </span>
+        </td>
+        <td>
+          <div class="gv-responsable">${v.responsable}</div>
+          <div class="docs-celda-texto">${v.correo}</div>
+        </td>
+        <td class="docs-celda-texto">${v.institucion}</td>
+        <td class="docs-celda-texto">${v.fecha_visita}</td>
+        <td class="gv-celda-cantidad">${v.cantidad}</td>
+        <td>${estadoBadge}</td>
+        <td class="docs-celda-acciones gv-celda-acciones">
+          ${getAccionesVisita(v)}
+        </td>
+      </tr>`;
+  });
+  return html;
+}
+
+function actualizarFilaCargarMas(tbody) {
+  const anterior = document.getElementById('filaCargarMasVisitas');
+  if (anterior) anterior.remove();
+  if (listadoVisitas.observador) listadoVisitas.observador.disconnect();
+  if (!listadoVisitas.cursor) return;
+
+  tbody.insertAdjacentHTML('beforeend', `<tr id="filaCargarMasVisitas">
+      <td colspan="8" class="docs-cargando">
+        <button type="button" class="gv-refresh-btn" onclick="cargarMasVisitas()">
+          <i class="ri-arrow-down-line"></i>
+          Cargar más visitas
+        </button>
+      </td>
+    </tr>`);
+
+  if ('IntersectionObserver' in window) {
+    listadoVisitas.observador = new IntersectionObserver((entradas) => {
+      if (entradas.some(entrada => entrada.isIntersecting)) cargarMasVisitas();
+    }, { rootMargin: '200px' });
+    listadoVisitas.observador.observe(document.getElementById('filaCargarMasVisitas'));
+  }
+}
+
+function pedirPaginaVisitas(cursor) {
+  const params = new URLSearchParams(listadoVisitas.params);
+  if (cursor) params.set('cursor', cursor);
+  const solicitud = ++listadoVisitas.solicitud;
+  listadoVisitas.cargando = true;
+
+  return fetch(`/gestion/visitas/?${params.toString()}`)
+    .then(response => {
+      if (!response.ok) throw new Error(`HTTP ${response.status}`);
+      return response.json().then(data => ({ data, total: Number(response.headers.get('X-Total-Count')) }));
+    })
+    .then(resultado => {
+      // Una recarga posterior (cambio de filtro o pestaña) deja obsoleta esta respuesta.
+      if (solicitud !== listadoVisitas.solicitud) return null;
+      listadoVisitas.cursor = resultado.data.cursor_siguiente;
+      return resultado;
+    })
+    .finally(() => {
+      if (solicitud === listadoVisitas.solicitud) listadoVisitas.cargando = false;
+    });
+}
+
 function cargarVisitas() {
   const estadoEl = document.getElementById('filtroEstadoVisita');
   const buscarEl = document.getElementById('buscarVisita');
@@ -223,57 +356,14 @@ function cargarVisitas() {
   });
   if (fechaDesde) params.set('fecha_desde', fechaDesde);
   if (fechaHasta) params.set('fecha_hasta', fechaHasta);
+  listadoVisitas.params = params.toString();
+  listadoVisitas.cursor = null;
 
-  return fetch(`/gestion/visitas/?${params.toString()}`)
-    .then(response => response.json())
-    .then(data => {
-      const totalEl = document.getElementById('statTotalVisitas');
-      document.getElementById('statPendientes').textContent = data.stats.pendientes;
-      document.getElementById('statAprobadas').textContent = data.stats.aprobadas_total;
-      if (totalEl) {
-        totalEl.textContent = data.stats.total ?? data.visitas.length;
-      }
-
-      const docsPend = data.stats.docs_pendientes_revision || 0;
-      const visitasEnRev = data.stats.en_revision || 0;
-
-      document.getElementById('statEnRevision').textContent = docsPend;
-      document.getElementById('statEnRevisionArchivos').textContent = visitasEnRev > 0 ? `${visitasEnRev} visita(s)` : '';
-
-      const docsEnviados = data.stats.documentos_enviados || 0;
-      const enRevision = data.stats.en_revision || 0;
-      const badgeRev = document.getElementById('badgeEnRevision');
-      const alertaDocs = document.getElementById('alertaDocsPendientes');
-      if (enRevision > 0) {
-        badgeRev.textContent = enRevision;
-        badgeRev.style.display = 'block';
-      } else {
-        badgeRev.style.display = 'none';
-      }
-
-      if (docsPend > 0 || docsEnviados > 0) {
-        alertaDocs.style.display = 'flex';
-        let textoAlerta = '';
-        if (docsPend > 0 && docsEnviados > 0) {
-          textoAlerta = `Hay ${docsPend} documento(s) de asistentes pendientes de aprobación y ${docsEnviados} visita(s) con documentos enviados.`;
-        } else if (docsPend > 0) {
-          textoAlerta = `Hay ${docsPend} documento(s) de asistentes pendientes de aprobación.`;
-        } else {
-          textoAlerta = `Hay ${docsEnviados} visita(s) con documentos enviados que requieren tu revisión.`;
-        }
-        document.getElementById('alertaDocsTexto').textContent = textoAlerta;
-      } else {
-        alertaDocs.style.display = 'none';
-      }
-
-      const sidebarBadge = document.getElementById('sidebarBadgeDocs');
-      const totalNotif = docsPend + docsEnviados;
-      if (totalNotif > 0) {
-        sidebarBadge.textContent = totalNotif;
-        sidebarBadge.style.display = 'block';
-      } else {
-        sidebarBadge.style.display = 'none';
-      }
+  return pedirPaginaVisitas(null)
+    .then(resultado => {
+      if (!resultado) return;
+      const { data, total } = resultado;
+      actualizarEstadisticasVisitas(data.stats, total);
 
       if (data.visitas.length === 0) {
         tbody.innerHTML = `<tr><td colspan="8" class="docs-vacio">
@@ -283,31 +373,8 @@ function cargarVisitas() {
         return;
       }
 
-      let html = '';
-      data.visitas.forEach(v => {
-        const estadoBadge = getEstadoBadge(v.estado);
-        const tipoFila = tipoVisitaActual === 'todas' ? (v.tipo === 'interna' ? 'internas' : 'externas') : tipoVisitaActual;
-        html += `<tr id="visita-${tipoFila}-${v.id}" class="docs-fila gv-fila visit-row" data-id="${v.id}" data-tipo="${tipoFila}">
-            <td class="gv-celda-id">#${v.id}</td>
-            <td>
-              <span class="gv-tipo-badge ${v.tipo === 'interna' ? 'interna' : 'externa'}">
-                ${v.tipo === 'interna' ? 'Interna' : 'Externa'}
-              </span>
-            </td>
-            <td>
-              <div class="gv-responsable">${v.responsable}</div>
-              <div class="docs-celda-texto">${v.correo}</div>
-            </td>
-            <td class="docs-celda-texto">${v.institucion}</td>
-            <td class="docs-celda-texto">${v.fecha_visita}</td>
-            <td class="gv-celda-cantidad">${v.cantidad}</td>
-            <td>${estadoBadge}</td>
-            <td class="docs-celda-acciones gv-celda-acciones">
-              ${getAccionesVisita(v)}
-            </td>
-          </tr>`;
-      });
-      tbody.innerHTML = html;
+      tbody.innerHTML = construirFilasVisitas(data.visitas);
+      actualizarFilaCargarMas(tbody);
     })
     .catch(() => {
       tbody.innerHTML = `<tr><td colspan="8" class="docs-error">
@@ -317,6 +384,23 @@ function cargarVisitas() {
     });
 }
 
+function cargarMasVisitas() {
+  const tbody = document.getElementById('cuerpoTablaVisitas');
+  if (!tbody || !listadoVisitas.cursor || listadoVisitas.cargando) return Promise.resolve();
+
+  return pedirPaginaVisitas(listadoVisitas.cursor)
+    .then(resultado => {
+      if (!resultado) return;
+      const fila = document.getElementById('filaCargarMasVisitas');
+      if (fila) fila.remove();
+      tbody.insertAdjacentHTML('beforeend', construirFilasVisitas(resultado.data.visitas));
+      actualizarFilaCargarMas(tbody);
+    })
+    .catch(() => {
+      mAlert('Error al cargar más visitas', 'error');
+    });
+}
+
 function limpiarFiltroFechas() {
   const desdeEl = document.getElementById('filtroFechaDesde');
   const hastaEl = document.getElementById('filtroFechaHasta');
@@ -1954,6 +2038,10 @@ document.addEventListener('DOMContentLoaded', () => {
     if (!el) {
       el = document.querySelector(`.visit-row[data-id="${idParam}"][data-tipo="${tipoParam}"]`);
     }
+    if (!el && typeof cargarMasVisitas === 'function') {
+      // La visita puede estar en una página que aún no se ha cargado.
+      cargarMasVisitas();
+    }
     if (el) {
       el.classList.add('row-selected');
       el.scrollIntoView({behavior: 'smooth', block: 'center'});
@@ -1,14 +1,20 @@
 ﻿from datetime import timedelta
 
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import NotSupportedError, connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
 from calendario.models import ReservaHorario
+from documentos.models import Documento, DocumentoSubidoAsistente
+from gestion_visitas.models import VisitaUnificada
 from visitaExterna.models import HistorialReprogramacion as HistorialReprogramacionExterna
-from visitaExterna.models import VisitaExterna
+from visitaExterna.models import AsistenteVisitaExterna, VisitaExterna
 from visitaInterna.models import HistorialReprogramacion as HistorialReprogramacionInterna
-from visitaInterna.models import VisitaInterna
+from visitaInterna.models import AsistenteVisitaInterna, VisitaInterna
 
 
 class CompletarReprogramacionTests(TestCase):
@@ -122,3 +128,407 @@ class CompletarReprogramacionTests(TestCase):
 		self.assertTrue(historial.completada)
 		self.assertIsNotNone(historial.fecha_reprogramacion)
 		self.assertTrue(ReservaHorario.objects.filter(visita_externa=visita).exists())
+
+
+def _sembrar_visitas(estados_internas, cantidad_externas):
+	ahora = timezone.now()
+	# bulk_create evita los signals de notificación por correo y QR.
+	internas = VisitaInterna.objects.bulk_create([
+		VisitaInterna(
+			estado=estado,
+			nombre_programa=f"Programa {i}",
+			numero_ficha=i,
+			responsable=f"Instructor {i}",
+			tipo_documento_responsable="CC",
+			documento_responsable=str(10000 + i),
+			correo_responsable="interno@example.com",
+			telefono_responsable="3000000000",
+			cantidad_aprendices=20 + i,
+			fecha_solicitud=ahora - timedelta(hours=2 * i),
+			fecha_visita=timezone.localdate(),
+		)
+		for i, estado in enumerate(estados_internas)
+	])
+	externas = VisitaExterna.objects.bulk_create([
+		VisitaExterna(
+			estado="pendiente",
+			nombre=f"Colegio {i}",
+			nombre_responsable=f"Docente {i}",
+			tipo_documento_responsable="CC",
+			documento_responsable=str(50000 + i),
+			correo_responsable="externo@example.com",
+			telefono_responsable="3100000000",
+			cantidad_visitantes=10 + i,
+			fecha_solicitud=ahora - timedelta(hours=2 * i + 1),
+		)
+		for i in range(cantidad_externas)
+	])
+	if internas and internas[0].pk is None:
+		internas = list(VisitaInterna.objects.order_by("id"))
+		externas = list(VisitaExterna.objects.order_by("id"))
+	return internas, externas
+
+
+class VisitaUnificadaTests(TestCase):
+	def setUp(self):
+		self.internas, self.externas = _sembrar_visitas(["pendiente", "aprobada_final", "pendiente"], 2)
+
+	def test_vista_combina_ambos_tipos_con_columnas_comunes(self):
+		externa = VisitaUnificada.objects.get(tipo="externa", visita_id=self.externas[1].id)
+		self.assertEqual(externa.clave, f"externa-{self.externas[1].id}")
+		self.assertEqual(externa.nombre, "Colegio 1")
+		self.assertEqual(externa.responsable, "Docente 1")
+		self.assertEqual(externa.correo, "externo@example.com")
+		self.assertEqual(externa.cantidad, 11)
+		self.assertIsNone(externa.fecha_visita)
+
+		interna = VisitaUnificada.objects.get(clave=f"interna-{self.internas[0].id}")
+		self.assertEqual(interna.nombre, "Programa 0")
+		self.assertEqual(interna.fecha_visita, timezone.localdate())
+		self.assertEqual(VisitaUnificada.objects.count(), 5)
+
+	def test_filtra_ordena_y_pagina_en_una_consulta(self):
+		with self.assertNumQueries(1):
+			pagina = list(
+				VisitaUnificada.objects.filter(estado="pendiente")
+				.order_by("-fecha_solicitud", "-visita_id")
+				.values_list("tipo", "nombre")[1:4]
+			)
+		self.assertEqual(pagina, [
+			("externa", "Colegio 0"),
+			("externa", "Colegio 1"),
+			("interna", "Programa 2"),
+		])
+
+	def test_es_de_solo_lectura(self):
+		visita = VisitaUnificada.objects.first()
+		with self.assertRaises(NotSupportedError):
+			visita.save()
+		with self.assertRaises(NotSupportedError):
+			visita.delete()
+
+	def test_escrituras_masivas_se_rechazan_sin_tocar_la_base(self):
+		with self.assertNumQueries(0):
+			with self.assertRaises(NotSupportedError):
+				VisitaUnificada.objects.filter(tipo="externa").update(estado="cancelada")
+			with self.assertRaises(NotSupportedError):
+				VisitaUnificada.objects.filter(tipo="externa").delete()
+			with self.assertRaises(NotSupportedError):
+				VisitaUnificada.objects.bulk_create([VisitaUnificada(clave="externa-0")])
+		self.assertEqual(VisitaUnificada.objects.filter(estado="cancelada").count(), 0)
+
+
+class ApiListarVisitasTests(TestCase):
+	def setUp(self):
+		self.admin = User.objects.create_user(username="admin", password="1234", is_staff=True)
+		self.client.force_login(self.admin)
+
+	def _sembrar(self, cantidad):
+		internas, externas = _sembrar_visitas(["documentos_enviados"] * cantidad, cantidad)
+		estados = ["documentos_aprobados", "documentos_rechazados", "pendiente_documentos"]
+		AsistenteVisitaInterna.objects.bulk_create([
+			AsistenteVisitaInterna(
+				visita=visita, nombre_completo=f"Aprendiz {j}", tipo_documento="TI",
+				numero_documento=f"{visita.pk}-{j}", estado=estado,
+			)
+			for visita in internas[1:]
+			for j, estado in enumerate(["documentos_aprobados"] if visita is internas[1] else estados)
+		])
+		AsistenteVisitaExterna.objects.bulk_create([
+			AsistenteVisitaExterna(
+				visita=visita, nombre_completo=f"Visitante {j}", tipo_documento="CC",
+				numero_documento=f"{visita.pk}-{j}", estado="documentos_aprobados",
+			)
+			for visita in externas
+			for j in range(2)
+		])
+		return internas, externas
+
+	def _listar(self, **params):
+		with CaptureQueriesContext(connection) as consultas:
+			respuesta = self.client.get(reverse("gestion_visitas:api_listar_visitas"), params)
+		self.assertEqual(respuesta.status_code, 200)
+		return respuesta.json(), len(consultas)
+
+	def test_indicadores_de_asistentes_por_visita(self):
+		internas, externas = self._sembrar(3)
+		datos, _ = self._listar(tipo="todas")
+		visitas = {(v["tipo"], v["id"]): v for v in datos["visitas"]}
+
+		sin_asistentes = visitas[("interna", internas[0].id)]
+		self.assertFalse(sin_asistentes["tiene_rechazos"])
+		self.assertFalse(sin_asistentes["puede_confirmar"])
+		aprobada = visitas[("interna", internas[1].id)]
+		self.assertFalse(aprobada["tiene_rechazos"])
+		self.assertTrue(aprobada["puede_confirmar"])
+		con_rechazos = visitas[("interna", internas[2].id)]
+		self.assertTrue(con_rechazos["tiene_rechazos"])
+		self.assertFalse(con_rechazos["puede_confirmar"])
+		self.assertTrue(visitas[("externa", externas[0].id)]["puede_confirmar"])
+
+		primeras = [(v["tipo"], v["id"]) for v in datos["visitas"][:2]]
+		self.assertEqual(primeras, [("interna", internas[0].id), ("externa", externas[0].id)])
+		self.assertNotIn("_orden", datos["visitas"][0])
+
+	def test_estadisticas_por_estado(self):
+		self._sembrar(3)
+		datos, _ = self._listar(tipo="todas")
+		stats = datos["stats"]
+		self.assertEqual(stats["total"], 6)
+		self.assertEqual(stats["pendientes"], 3)
+		self.assertEqual(stats["documentos_enviados"], 3)
+		self.assertEqual(stats["aprobadas_total"], 3)
+		# Los asistentes de visitas pendientes no cuentan en los documentos.
+		self.assertEqual(stats["docs_total"], 4)
+		self.assertEqual(stats["docs_aprobados"], 2)
+		self.assertEqual(stats["docs_rechazados"], 1)
+		self.assertEqual(stats["docs_pendientes_revision"], 1)
+
+		datos, _ = self._listar(tipo="externas", buscar="Colegio 1")
+		self.assertEqual([v["institucion"] for v in datos["visitas"]], ["Colegio 1"])
+		self.assertEqual(datos["stats"]["pendientes"], 3)
+		self.assertNotIn("total", datos["stats"])
+
+	def test_cantidad_de_consultas_no_depende_de_las_visitas(self):
+		self._sembrar(2)
+		_, pocas = self._listar(tipo="todas")
+		_, pocas_internas = self._listar(tipo="internas")
+		self._sembrar(6)
+		datos, muchas = self._listar(tipo="todas")
+		_, muchas_internas = self._listar(tipo="internas")
+		self.assertEqual(len(datos["visitas"]), 16)
+		self.assertEqual(pocas, muchas)
+		self.assertEqual(pocas_internas, muchas_internas)
+
+	def test_paginacion_por_cursor_recorre_todas_las_visitas(self):
+		internas, externas = self._sembrar(4)
+		vistas = []
+		datos, _ = self._listar(tipo="todas", limite=3)
+		self.assertIn("stats", datos)
+		self.assertEqual(datos["total"], 8)
+		while True:
+			vistas.extend((v["tipo"], v["id"]) for v in datos["visitas"])
+			if not datos["cursor_siguiente"]:
+				break
+			datos, _ = self._listar(tipo="todas", limite=3, cursor=datos["cursor_siguiente"])
+			self.assertNotIn("stats", datos)
+
+		esperadas = []
+		for interna, externa in zip(internas, externas):
+			esperadas.extend([("interna", interna.id), ("externa", externa.id)])
+		self.assertEqual(vistas, esperadas)
+
+	def test_filtros_se_mantienen_entre_paginas(self):
+		self._sembrar(5)
+		datos, _ = self._listar(tipo="internas", buscar="Programa", limite=2, fecha_desde=timezone.localdate().isoformat())
+		self.assertEqual(datos["total"], 5)
+		datos, _ = self._listar(tipo="internas", buscar="Programa", limite=2, cursor=datos["cursor_siguiente"])
+		self.assertEqual([v["id"] for v in datos["visitas"]], list(
+			VisitaInterna.objects.order_by("-fecha_solicitud", "-id").values_list("id", flat=True)[2:4]
+		))
+
+	def test_total_en_encabezado_y_proyeccion_de_campos(self):
+		self._sembrar(3)
+		respuesta = self.client.get(
+			reverse("gestion_visitas:api_listar_visitas"),
+			{"tipo": "externas", "fields": "estado,desconocido", "limite": 2},
+		)
+		self.assertEqual(respuesta["X-Total-Count"], "3")
+		datos = respuesta.json()
+		self.assertEqual(len(datos["visitas"]), 2)
+		self.assertEqual(set(datos["visitas"][0]), {"id", "tipo", "estado"})
+
+		# Sin campos de asistentes no se consultan las tablas de cada tipo.
+		with CaptureQueriesContext(connection) as con_detalle:
+			self.client.get(reverse("gestion_visitas:api_listar_visitas"), {"tipo": "externas", "cursor": datos["cursor_siguiente"]})
+		with CaptureQueriesContext(connection) as sin_detalle:
+			self.client.get(reverse("gestion_visitas:api_listar_visitas"), {"tipo": "externas", "cursor": datos["cursor_siguiente"], "fields": "estado"})
+		self.assertEqual(len(con_detalle) - len(sin_detalle), 1)
+
+	def test_cursor_invalido(self):
+		respuesta = self.client.get(reverse("gestion_visitas:api_listar_visitas"), {"cursor": "x.y.z"})
+		self.assertEqual(respuesta.status_code, 400)
+
+
+class NotificacionesTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.admin = User.objects.create_user(username="admin", password="1234", is_staff=True)
+		self.client.force_login(self.admin)
+		internas, externas = _sembrar_visitas(["pendiente", "enviada_coordinacion", "documentos_enviados", "confirmada"], 2)
+		AsistenteVisitaInterna.objects.bulk_create([
+			AsistenteVisitaInterna(
+				visita=internas[2], nombre_completo="Aprendiz", tipo_documento="TI",
+				numero_documento="1", estado="pendiente_documentos",
+			),
+			AsistenteVisitaInterna(
+				visita=internas[0], nombre_completo="Aprendiz", tipo_documento="TI",
+				numero_documento="2", estado="pendiente_documentos",
+			),
+		])
+
+	def _pedir(self, etag=None):
+		cabeceras = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+		with CaptureQueriesContext(connection) as consultas:
+			respuesta = self.client.get(reverse("gestion_visitas:api_notificaciones"), **cabeceras)
+		consultas_visitas = [q for q in consultas if "visita_unificada" in q["sql"]]
+		return respuesta, consultas_visitas
+
+	def test_contadores_del_administrador(self):
+		respuesta, _ = self._pedir()
+		self.assertEqual(respuesta.status_code, 200)
+		datos = respuesta.json()
+		self.assertEqual(datos["contadores"]["por_estado"], {
+			"pendiente": 3, "documentos_enviados": 1, "en_revision_documentos": 0,
+		})
+		self.assertEqual(datos["contadores"]["por_tipo"], {"interna": 2, "externa": 2})
+		# El asistente de la visita pendiente aún no entrega documentos.
+		self.assertEqual(datos["contadores"]["docs_pendientes_revision"], 1)
+		self.assertEqual(len(datos["visitas"]), 4)
+		self.assertEqual(datos["visitas"][0]["tipo"], "interna")
+
+	def test_responde_304_sin_consultar_mientras_no_haya_cambios(self):
+		respuesta, _ = self._pedir()
+		etag = respuesta["ETag"]
+
+		respuesta, consultas = self._pedir(etag)
+		self.assertEqual(respuesta.status_code, 304)
+		self.assertEqual(consultas, [])
+
+		with self.captureOnCommitCallbacks(execute=True):
+			VisitaExterna.objects.filter(estado="pendiente").first().delete()
+		respuesta, _ = self._pedir(etag)
+		self.assertEqual(respuesta.status_code, 200)
+		self.assertNotEqual(respuesta["ETag"], etag)
+		self.assertGreater(respuesta.json()["version"], int(etag.strip('"').split("-")[1]))
+		self.assertEqual(respuesta.json()["contadores"]["por_estado"]["pendiente"], 2)
+
+	def test_coordinador_recibe_visitas_enviadas_a_coordinacion(self):
+		coordinador = User.objects.create_user(username="coord", password="1234")
+		coordinador.groups.add(Group.objects.create(name="coordinador"))
+		self.client.force_login(coordinador)
+
+		respuesta, _ = self._pedir()
+		datos = respuesta.json()
+		self.assertEqual(datos["contadores"]["total"], 1)
+		self.assertNotIn("docs_pendientes_revision", datos["contadores"])
+		self.assertEqual([v["estado"] for v in datos["visitas"]], ["enviada_coordinacion"])
+		self.assertTrue(respuesta["ETag"].startswith('"coordinador-'))
+
+	def test_usuario_sin_permisos(self):
+		self.client.force_login(User.objects.create_user(username="otro", password="1234"))
+		respuesta, _ = self._pedir()
+		self.assertEqual(respuesta.status_code, 403)
+
+
+class ApiDocumentosRevisionTests(TestCase):
+	def setUp(self):
+		self.admin = User.objects.create_user(username="admin", password="1234", is_staff=True)
+		self.client.force_login(self.admin)
+		self.salud = Documento.objects.create(
+			titulo="Salud", archivo="documentos/salud.pdf",
+			categoria="Formato Auto Reporte Condiciones de Salud", subido_por=self.admin,
+		)
+		self.epp = Documento.objects.create(
+			titulo="EPP", archivo="documentos/epp.pdf",
+			categoria="EPP Necesarios", subido_por=self.admin,
+		)
+		internas, _ = _sembrar_visitas(["documentos_enviados"], 0)
+		self.visita = internas[0]
+
+	def _sembrar_asistentes(self, cantidad):
+		inicio = AsistenteVisitaInterna.objects.count()
+		AsistenteVisitaInterna.objects.bulk_create([
+			AsistenteVisitaInterna(
+				visita=self.visita, nombre_completo=f"Aprendiz {i}", tipo_documento="TI",
+				numero_documento=str(i), estado="pendiente_documentos",
+			)
+			for i in range(inicio, inicio + cantidad)
+		])
+		asistentes = list(AsistenteVisitaInterna.objects.order_by("id")[inicio:])
+		documentos = []
+		for asistente in asistentes:
+			documentos.extend([
+				DocumentoSubidoAsistente(
+					documento_requerido=self.salud, asistente_interna=asistente,
+					archivo="asistentes/salud_v1.pdf", estado="rechazado",
+				),
+				DocumentoSubidoAsistente(
+					documento_requerido=self.salud, asistente_interna=asistente,
+					archivo="asistentes/salud_v2.pdf", estado="aprobado",
+				),
+				DocumentoSubidoAsistente(
+					documento_requerido=self.epp, asistente_interna=asistente,
+					archivo="asistentes/epp.pdf", estado="aprobado",
+				),
+			])
+		DocumentoSubidoAsistente.objects.bulk_create(documentos)
+		return asistentes
+
+	def _pedir(self):
+		with CaptureQueriesContext(connection) as consultas:
+			respuesta = self.client.get(
+				reverse("gestion_visitas:api_documentos_revision"), {"tipo": "internas"}
+			)
+		self.assertEqual(respuesta.status_code, 200)
+		return respuesta.json()["documentos"], consultas
+
+	def test_calcula_estado_con_la_ultima_version_de_cada_documento(self):
+		asistente = self._sembrar_asistentes(1)[0]
+
+		filas, _ = self._pedir()
+
+		self.assertEqual(len(filas), 1)
+		fila = filas[0]
+		self.assertEqual(fila["asistente_id"], asistente.id)
+		self.assertEqual(fila["estado"], "documentos_aprobados")
+		self.assertTrue(fila["todos_aprobados"])
+		salud = next(d for d in fila["documentos_subidos"] if d["titulo"] == "Salud")
+		self.assertEqual(salud["estado"], "aprobado")
+		self.assertEqual(salud["versiones_envio"], 2)
+		self.assertTrue(salud["es_reenvio"])
+
+	def test_no_escribe_y_consulta_lo_mismo_sin_importar_los_asistentes(self):
+		asistentes = self._sembrar_asistentes(2)
+		_, consultas_pocos = self._pedir()
+
+		self._sembrar_asistentes(6)
+		filas, consultas_muchos = self._pedir()
+
+		self.assertEqual(len(filas), 8)
+		self.assertEqual(len(consultas_muchos), len(consultas_pocos))
+		escrituras = [
+			q["sql"] for q in consultas_muchos
+			if "asistente" in q["sql"] and q["sql"].lstrip().upper().startswith(("UPDATE", "INSERT"))
+		]
+		self.assertEqual(escrituras, [])
+		# El estado guardado no se toca en la lectura; lo sincronizan las revisiones.
+		asistentes[0].refresh_from_db()
+		self.assertEqual(asistentes[0].estado, "pendiente_documentos")
+
+	def test_solo_autorizacion_de_padres_guarda_el_mismo_estado_que_muestra_el_listado(self):
+		AsistenteVisitaInterna.objects.bulk_create([
+			AsistenteVisitaInterna(
+				visita=self.visita, nombre_completo="Menor", tipo_documento="TI",
+				numero_documento="99", estado="pendiente_documentos",
+				formato_autorizacion_padres="autorizaciones/menor.pdf",
+				estado_autorizacion_padres="pendiente",
+			),
+		])
+		asistente = AsistenteVisitaInterna.objects.get(numero_documento="99")
+
+		respuesta = self.client.post(reverse(
+			"gestion_visitas:api_revisar_autorizacion_padres",
+			args=["interna", asistente.id, "aprobar"],
+		))
+		self.assertEqual(respuesta.json()["nuevo_estado"], "documentos_aprobados")
+		asistente.refresh_from_db()
+		self.assertEqual(asistente.estado, "documentos_aprobados")
+
+		respuesta = self.client.get(
+			reverse("gestion_visitas:api_documentos_revision"),
+			{"tipo": "internas", "estado_asistente": "documentos_aprobados"},
+		)
+		filas = respuesta.json()["documentos"]
+		self.assertEqual([fila["asistente_id"] for fila in filas], [asistente.id])
+		self.assertEqual(filas[0]["estado"], asistente.estado)
@@ -6,6 +6,7 @@ app_name = "gestion_visitas"
 
 urlpatterns = [
     path("visitas/", views.api_listar_visitas, name="api_listar_visitas"),
+    path("notificaciones/", views.api_notificaciones, name="api_notificaciones"),
     path(
         "visitas/<str:tipo>/<int:visita_id>/",
         views.api_detalle_visita,
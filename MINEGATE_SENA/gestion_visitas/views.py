@@ -5,13 +5,17 @@ Gestión administrativa de visitas - APIs para el panel administrativo
 
 import threading
 from types import SimpleNamespace
-from datetime import date
+from datetime import date, datetime, timedelta, timezone as dt_timezone
 
 from django.shortcuts import get_object_or_404
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
+from django.db.models import Count, Exists, OuterRef, Q
 from django.db import close_old_connections
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_GET
 
 from visitaInterna.models import (
     VisitaInterna,
@@ -24,6 +28,12 @@ from visitaExterna.models import (
     HistorialAccionVisitaExterna,
 )
 from documentos.models import DocumentoSubidoAsistente
+from documentos.revision import (
+    calcular_estado_revision_asistente,
+    documentos_subidos_actuales,
+    prefetch_documentos_subidos,
+    sincronizar_estado_asistente,
+)
 from calendario.models import ReservaHorario
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
@@ -31,6 +41,8 @@ from django.utils.html import strip_tags
 from django.utils import timezone
 from django.conf import settings
 from django.urls import reverse
+from gestion_visitas.models import VisitaUnificada
+from gestion_visitas.notificaciones import obtener_version_notificaciones
 from gestion_visitas.services import GeneradorQRPDF
 from core.sanitization import sanitize_text, sanitize_token
 
@@ -250,59 +262,6 @@ def devolver_visita_a_agendador(visita):
         visita.save(update_fields=["estado"])
 
 
-def _documentos_subidos_actuales(asistente):
-    """Retorna la última versión por documento y metadatos de reenvío."""
-    docs = asistente.documentos_subidos.select_related("documento_requerido").order_by(
-        "documento_requerido_id", "-fecha_subida", "-id"
-    )
-    latest_por_documento = {}
-    conteo_por_documento = {}
-    historial_por_documento = {}
-    for ds in docs:
-        conteo_por_documento[ds.documento_requerido_id] = (
-            conteo_por_documento.get(ds.documento_requerido_id, 0) + 1
-        )
-        historial_por_documento.setdefault(ds.documento_requerido_id, []).append(ds)
-        if ds.documento_requerido_id not in latest_por_documento:
-            latest_por_documento[ds.documento_requerido_id] = ds
-
-    documentos_actuales = []
-    for doc_id, ds in latest_por_documento.items():
-        versiones_envio = conteo_por_documento.get(doc_id, 1)
-        documentos_actuales.append(
-            {
-                "ds": ds,
-                "versiones_envio": versiones_envio,
-                "es_reenvio": versiones_envio > 1,
-                "historial_versiones": historial_por_documento.get(doc_id, [ds]),
-            }
-        )
-    return documentos_actuales
-
-
-def _normalizar_categoria_documento(categoria):
-    return (
-        str(categoria or "")
-        .strip()
-        .lower()
-        .replace("á", "a")
-        .replace("é", "e")
-        .replace("í", "i")
-        .replace("ó", "o")
-        .replace("ú", "u")
-    )
-
-
-def _es_categoria_archivo_final(categoria):
-    categoria_normalizada = _normalizar_categoria_documento(categoria)
-    return categoria_normalizada in {
-        "ats",
-        "formato induccion y reinduccion",
-        "charla de seguridad y calestenia",
-        "charla de seguridad y calistenia",
-    }
-
-
 def _serializar_documento_subido(
     ds,
     versiones_envio=1,
@@ -345,79 +304,9 @@ def _serializar_documento_subido(
     }
 
 
-def _calcular_estado_revision_asistente(asistente):
-    """Calcula estado agregado del asistente en función de sus últimos documentos."""
-    documentos_actuales = _documentos_subidos_actuales(asistente)
-    documentos_personales = [
-        doc_actual
-        for doc_actual in documentos_actuales
-        if not _es_categoria_archivo_final(
-            doc_actual["ds"].documento_requerido.categoria
-        )
-    ]
-    tiene_docs = bool(documentos_personales)
-    tiene_rechazos = any(
-        doc_actual["ds"].estado == "rechazado" for doc_actual in documentos_personales
-    )
-    todos_aprobados = tiene_docs and all(
-        doc_actual["ds"].estado == "aprobado" for doc_actual in documentos_personales
-    )
-
-    tiene_autorizacion_padres = bool(
-        getattr(asistente, "formato_autorizacion_padres", None)
-    )
-    if tiene_autorizacion_padres:
-        estado_autorizacion = getattr(
-            asistente, "estado_autorizacion_padres", "pendiente"
-        )
-        if estado_autorizacion == "rechazado":
-            tiene_rechazos = True
-        elif estado_autorizacion != "aprobado":
-            todos_aprobados = False
-
-    if tiene_rechazos:
-        estado = "documentos_rechazados"
-    elif todos_aprobados and (tiene_docs or tiene_autorizacion_padres):
-        estado = "documentos_aprobados"
-    else:
-        estado = "pendiente_documentos"
-
-    return {
-        "estado": estado,
-        "tiene_rechazos": tiene_rechazos,
-        "todos_aprobados": todos_aprobados,
-    }
-
-
-def _sincronizar_estado_asistente(asistente, observacion_rechazo=""):
-    """Sincroniza el estado agregado del asistente con el estado real de sus documentos."""
-    revision = _calcular_estado_revision_asistente(asistente)
-    update_fields = []
-
-    if asistente.estado != revision["estado"]:
-        asistente.estado = revision["estado"]
-        update_fields.append("estado")
-
-    if revision["estado"] == "documentos_rechazados":
-        nueva_observacion = (observacion_rechazo or "").strip() or (
-            asistente.observaciones_revision or ""
-        )
-        if nueva_observacion and asistente.observaciones_revision != nueva_observacion:
-            asistente.observaciones_revision = nueva_observacion
-            update_fields.append("observaciones_revision")
-    elif asistente.observaciones_revision:
-        asistente.observaciones_revision = ""
-        update_fields.append("observaciones_revision")
-
-    if update_fields:
-        asistente.save(update_fields=update_fields)
-
-    return revision
-
-
 def _marcar_documentos_actuales(asistente, estado, observaciones=""):
     """Marca la última versión de cada documento subido por el asistente."""
-    for doc_actual in _documentos_subidos_actuales(asistente):
+    for doc_actual in documentos_subidos_actuales(asistente):
         ds = doc_actual["ds"]
         ds.estado = estado
         ds.observaciones_revision = observaciones if estado == "rechazado" else ""
@@ -463,9 +352,199 @@ def tiene_aprobacion_previa_coordinacion(visita, tipo):
     ).exists()
 
 
+ESTADOS_SIN_DOCUMENTOS = ["aprobada_inicial", "pendiente", "enviada_coordinacion"]
+
+# Tamaño de página del listado del panel (parámetro limite) y su máximo.
+PAGINA_VISITAS = 50
+PAGINA_VISITAS_MAXIMA = 200
+
+# Campos que acepta el parámetro fields del listado. id y tipo van siempre.
+CAMPOS_LISTADO_VISITAS = (
+    "id",
+    "tipo",
+    "tipo_display",
+    "responsable",
+    "institucion",
+    "correo",
+    "telefono",
+    "fecha_visita",
+    "cantidad",
+    "estado",
+    "tiene_rechazos",
+    "puede_confirmar",
+    "fecha_solicitud",
+)
+# Campos que no están en la vista visita_unificada y se leen de cada tabla.
+_CAMPOS_DETALLE_VISITA = {"telefono", "tiene_rechazos", "puede_confirmar"}
+
+# Campos propios de cada tipo de visita para el listado del panel.
+_LISTADO_VISITAS = {
+    "interna": {
+        "modelo": VisitaInterna,
+        "modelo_asistente": AsistenteVisitaInterna,
+        "tipo_display": "Interna (SENA)",
+        "codigo": "i",
+    },
+    "externa": {
+        "modelo": VisitaExterna,
+        "modelo_asistente": AsistenteVisitaExterna,
+        "tipo_display": "Externa (Institución)",
+        "codigo": "e",
+    },
+}
+_TIPO_POR_CODIGO = {config["codigo"]: tipo for tipo, config in _LISTADO_VISITAS.items()}
+_EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _filtrar_visitas_listado(tipos, estado, buscar, fecha_desde, fecha_hasta, fecha_hoy):
+    visitas = VisitaUnificada.objects.filter(tipo__in=tipos)
+
+    if estado == "hoy":
+        visitas = visitas.filter(fecha_visita=fecha_hoy)
+    elif estado == "aprobadas":
+        visitas = visitas.filter(estado__in=ESTADOS_APROBADAS)
+    elif estado in ["en_revision_documentos", "pendiente_revision"]:
+        visitas = visitas.filter(
+            estado__in=["documentos_enviados", "en_revision_documentos"]
+        )
+    elif estado == "pendiente":
+        visitas = visitas.filter(estado__in=["pendiente", "enviada_coordinacion"])
+    elif estado != "todos":
+        visitas = visitas.filter(estado=estado)
+
+    if buscar:
+        visitas = visitas.filter(
+            Q(responsable__icontains=buscar)
+            | Q(nombre__icontains=buscar)
+            | Q(correo__icontains=buscar)
+        )
+
+    if fecha_desde:
+        visitas = visitas.filter(fecha_visita__gte=fecha_desde)
+    if fecha_hasta:
+        visitas = visitas.filter(fecha_visita__lte=fecha_hasta)
+    return visitas
+
+
+def _codificar_cursor_visitas(visita):
+    microsegundos = (visita["fecha_solicitud"] - _EPOCA) // timedelta(microseconds=1)
+    return f"{microsegundos}.{_LISTADO_VISITAS[visita['tipo']]['codigo']}.{visita['visita_id']}"
+
+
+def _filtro_cursor_visitas(cursor):
+    """
+    Condición para las visitas que siguen al cursor en el orden del listado
+    (fecha de solicitud, tipo e id descendentes). None si el cursor no es válido.
+    """
+    try:
+        microsegundos, codigo, visita_id = str(cursor).split(".")
+        fecha = _EPOCA + timedelta(microseconds=int(microsegundos))
+        tipo = _TIPO_POR_CODIGO[codigo]
+        visita_id = int(visita_id)
+    except (KeyError, ValueError, OverflowError):
+        return None
+    return (
+        Q(fecha_solicitud__lt=fecha)
+        | Q(fecha_solicitud=fecha, tipo__lt=tipo)
+        | Q(fecha_solicitud=fecha, tipo=tipo, visita_id__lt=visita_id)
+    )
+
+
+def _detalle_visitas_tipo(tipo, ids):
+    """
+    Teléfono e indicadores de asistentes de las visitas de la página: una
+    consulta por tipo con subconsultas Exists sobre los asistentes.
+    """
+    config = _LISTADO_VISITAS[tipo]
+    asistentes = config["modelo_asistente"].objects.filter(visita=OuterRef("pk"))
+    filas = config["modelo"].objects.filter(id__in=ids).annotate(
+        tiene_rechazos=Exists(asistentes.filter(estado="documentos_rechazados")),
+        tiene_asistentes=Exists(asistentes),
+        tiene_sin_aprobar=Exists(asistentes.exclude(estado="documentos_aprobados")),
+    ).values(
+        "id", "telefono_responsable", "tiene_rechazos", "tiene_asistentes", "tiene_sin_aprobar"
+    )
+    return {
+        v["id"]: {
+            "telefono": v["telefono_responsable"],
+            "tiene_rechazos": v["tiene_rechazos"],
+            "puede_confirmar": v["tiene_asistentes"] and not v["tiene_sin_aprobar"],
+        }
+        for v in filas.order_by()
+    }
+
+
+def _fila_visita_listado(v, detalle):
+    fecha_solicitud = v["fecha_solicitud"]
+    return {
+        "id": v["visita_id"],
+        "tipo": v["tipo"],
+        "tipo_display": _LISTADO_VISITAS[v["tipo"]]["tipo_display"],
+        "responsable": v["responsable"],
+        "institucion": v["nombre"] or "N/A",
+        "correo": v["correo"],
+        "telefono": detalle.get("telefono"),
+        "fecha_visita": (
+            v["fecha_visita"].strftime("%d/%m/%Y")
+            if v["fecha_visita"]
+            else (
+                fecha_solicitud.strftime("%d/%m/%Y")
+                if fecha_solicitud
+                else "N/A"
+            )
+        ),
+        "cantidad": v["cantidad"],
+        "estado": v["estado"],
+        "tiene_rechazos": detalle.get("tiene_rechazos", False),
+        "puede_confirmar": detalle.get("puede_confirmar", False),
+        "fecha_solicitud": (
+            fecha_solicitud.strftime("%d/%m/%Y %H:%M")
+            if fecha_solicitud
+            else "N/A"
+        ),
+    }
+
+
+def _estadisticas_visitas(tipo):
+    """
+    Totales por estado de las visitas y de los documentos de sus asistentes:
+    una consulta con agregación condicional por tabla.
+    """
+    config = _LISTADO_VISITAS[tipo]
+    stats = config["modelo"].objects.aggregate(
+        pendientes=Count("id", filter=Q(estado__in=["pendiente", "enviada_coordinacion"])),
+        aprobadas_inicial=Count("id", filter=Q(estado="aprobada_inicial")),
+        aprobadas_total=Count("id", filter=Q(estado__in=ESTADOS_APROBADAS)),
+        documentos_enviados=Count("id", filter=Q(estado="documentos_enviados")),
+        en_revision=Count("id", filter=Q(estado="en_revision_documentos")),
+        confirmadas=Count("id", filter=Q(estado="confirmada")),
+        rechazadas=Count("id", filter=Q(estado="rechazada")),
+    )
+    stats.update(
+        config["modelo_asistente"].objects.exclude(
+            visita__estado__in=ESTADOS_SIN_DOCUMENTOS
+        ).aggregate(
+            docs_pendientes_revision=Count("id", filter=Q(estado="pendiente_documentos")),
+            docs_aprobados=Count("id", filter=Q(estado="documentos_aprobados")),
+            docs_rechazados=Count("id", filter=Q(estado="documentos_rechazados")),
+            docs_total=Count("id"),
+        )
+    )
+    return stats
+
+
 @login_required(login_url="usuarios:login")
 def api_listar_visitas(request):
-    """API para listar visitas internas y externas"""
+    """
+    API para listar visitas internas y externas, paginada por cursor sobre la
+    vista visita_unificada (orden por fecha de solicitud descendente).
+
+    Parámetros además de los filtros: cursor (el cursor_siguiente de la
+    página anterior), limite (tamaño de página) y fields (campos separados
+    por coma). La cantidad total de visitas filtradas va en el encabezado
+    X-Total-Count; las estadísticas solo se calculan en la primera página.
+    La cantidad de consultas es fija y no depende del número de visitas.
+    """
     if not es_administrador_panel(request.user):
         return JsonResponse({"success": False, "error": "No autorizado"}, status=403)
 
@@ -478,6 +557,7 @@ def api_listar_visitas(request):
     fecha_hasta_raw = sanitize_text(
         request.GET.get("fecha_hasta", ""), max_length=10, allow_newlines=False
     )
+    cursor = sanitize_text(request.GET.get("cursor", ""), max_length=60, allow_newlines=False)
     fecha_hoy = timezone.localdate()
 
     def _parse_fecha_iso(valor):
@@ -495,389 +575,167 @@ def api_listar_visitas(request):
     if fecha_desde and fecha_hasta and fecha_desde > fecha_hasta:
         fecha_desde, fecha_hasta = fecha_hasta, fecha_desde
 
-    def _aplicar_rango_fechas(queryset):
-        if fecha_desde:
-            queryset = queryset.filter(fecha_visita__gte=fecha_desde)
-        if fecha_hasta:
-            queryset = queryset.filter(fecha_visita__lte=fecha_hasta)
-        return queryset
-
-    visitas_data = []
+    try:
+        limite = int(request.GET.get("limite", PAGINA_VISITAS))
+    except ValueError:
+        limite = PAGINA_VISITAS
+    limite = min(max(limite, 1), PAGINA_VISITAS_MAXIMA)
+
+    campos = [
+        campo
+        for campo in request.GET.get("fields", "").split(",")
+        if campo in CAMPOS_LISTADO_VISITAS
+    ]
+    campos = set(campos) | {"id", "tipo"} if campos else set(CAMPOS_LISTADO_VISITAS)
 
     if tipo == "todas":
-        visitas_internas = VisitaInterna.objects.all().order_by("-fecha_solicitud", "-id")
-        visitas_externas = VisitaExterna.objects.all().order_by("-fecha_solicitud", "-id")
-
-        if estado == "hoy":
-            visitas_internas = visitas_internas.filter(fecha_visita=fecha_hoy)
-            visitas_externas = visitas_externas.filter(fecha_visita=fecha_hoy)
-        elif estado == "aprobadas":
-            visitas_internas = visitas_internas.filter(estado__in=ESTADOS_APROBADAS)
-            visitas_externas = visitas_externas.filter(estado__in=ESTADOS_APROBADAS)
-        elif estado in ["en_revision_documentos", "pendiente_revision"]:
-            estados_revision = ["documentos_enviados", "en_revision_documentos"]
-            visitas_internas = visitas_internas.filter(estado__in=estados_revision)
-            visitas_externas = visitas_externas.filter(estado__in=estados_revision)
-        elif estado == "pendiente":
-            visitas_internas = visitas_internas.filter(
-                estado__in=["pendiente", "enviada_coordinacion"]
-            )
-            visitas_externas = visitas_externas.filter(
-                estado__in=["pendiente", "enviada_coordinacion"]
-            )
-        elif estado != "todos":
-            visitas_internas = visitas_internas.filter(estado=estado)
-            visitas_externas = visitas_externas.filter(estado=estado)
-
-        if buscar:
-            visitas_internas = visitas_internas.filter(
-                Q(responsable__icontains=buscar)
-                | Q(nombre_programa__icontains=buscar)
-                | Q(correo_responsable__icontains=buscar)
-            )
-            visitas_externas = visitas_externas.filter(
-                Q(nombre_responsable__icontains=buscar)
-                | Q(nombre__icontains=buscar)
-                | Q(correo_responsable__icontains=buscar)
-            )
-
-        visitas_internas = _aplicar_rango_fechas(visitas_internas)
-        visitas_externas = _aplicar_rango_fechas(visitas_externas)
-
-        for v in visitas_internas:
-            visitas_data.append(
-                {
-                    "id": v.id,
-                    "tipo": "interna",
-                    "tipo_display": "Interna (SENA)",
-                    "responsable": v.responsable,
-                    "institucion": v.nombre_programa or "N/A",
-                    "correo": v.correo_responsable,
-                    "telefono": v.telefono_responsable,
-                    "fecha_visita": (
-                        v.fecha_visita.strftime("%d/%m/%Y")
-                        if v.fecha_visita
-                        else (
-                            v.fecha_solicitud.strftime("%d/%m/%Y")
-                            if v.fecha_solicitud
-                            else "N/A"
-                        )
-                    ),
-                    "cantidad": v.cantidad_aprendices,
-                    "estado": v.estado,
-                    "tiene_rechazos": v.asistentes.filter(
-                        estado="documentos_rechazados"
-                    ).exists(),
-                    "puede_confirmar": (
-                        v.asistentes.exists()
-                        and not v.asistentes.exclude(
-                            estado="documentos_aprobados"
-                        ).exists()
-                    ),
-                    "fecha_solicitud": (
-                        v.fecha_solicitud.strftime("%d/%m/%Y %H:%M")
-                        if v.fecha_solicitud
-                        else "N/A"
-                    ),
-                    "_orden": v.fecha_solicitud.isoformat() if v.fecha_solicitud else "",
-                }
-            )
-
-        for v in visitas_externas:
-            visitas_data.append(
-                {
-                    "id": v.id,
-                    "tipo": "externa",
-                    "tipo_display": "Externa (Institución)",
-                    "responsable": v.nombre_responsable,
-                    "institucion": v.nombre or "N/A",
-                    "correo": v.correo_responsable,
-                    "telefono": v.telefono_responsable,
-                    "fecha_visita": (
-                        v.fecha_visita.strftime("%d/%m/%Y")
-                        if v.fecha_visita
-                        else (
-                            v.fecha_solicitud.strftime("%d/%m/%Y")
-                            if v.fecha_solicitud
-                            else "N/A"
-                        )
-                    ),
-                    "cantidad": v.cantidad_visitantes,
-                    "estado": v.estado,
-                    "tiene_rechazos": v.asistentes.filter(
-                        estado="documentos_rechazados"
-                    ).exists(),
-                    "puede_confirmar": (
-                        v.asistentes.exists()
-                        and not v.asistentes.exclude(
-                            estado="documentos_aprobados"
-                        ).exists()
-                    ),
-                    "fecha_solicitud": (
-                        v.fecha_solicitud.strftime("%d/%m/%Y %H:%M")
-                        if v.fecha_solicitud
-                        else "N/A"
-                    ),
-                    "_orden": v.fecha_solicitud.isoformat() if v.fecha_solicitud else "",
-                }
-            )
+        tipos = ["interna", "externa"]
+    elif tipo == "internas":
+        tipos = ["interna"]
+    else:
+        tipos = ["externa"]
 
-        visitas_data.sort(key=lambda item: item.get("_orden", ""), reverse=True)
-        for item in visitas_data:
-            item.pop("_orden", None)
+    visitas = _filtrar_visitas_listado(
+        tipos, estado, buscar, fecha_desde, fecha_hasta, fecha_hoy
+    )
+    total = visitas.count()
+
+    if cursor:
+        filtro_cursor = _filtro_cursor_visitas(cursor)
+        if filtro_cursor is None:
+            return JsonResponse({"success": False, "error": "Cursor inválido"}, status=400)
+        visitas = visitas.filter(filtro_cursor)
+
+    pagina = list(
+        visitas.order_by("-fecha_solicitud", "-tipo", "-visita_id").values(
+            "tipo",
+            "visita_id",
+            "nombre",
+            "responsable",
+            "correo",
+            "fecha_solicitud",
+            "fecha_visita",
+            "estado",
+            "cantidad",
+        )[: limite + 1]
+    )
+    cursor_siguiente = None
+    if len(pagina) > limite:
+        pagina = pagina[:limite]
+        cursor_siguiente = _codificar_cursor_visitas(pagina[-1])
+
+    detalles = {}
+    if campos & _CAMPOS_DETALLE_VISITA:
+        for tipo_visita in tipos:
+            ids = [v["visita_id"] for v in pagina if v["tipo"] == tipo_visita]
+            if ids:
+                for visita_id, detalle in _detalle_visitas_tipo(tipo_visita, ids).items():
+                    detalles[(tipo_visita, visita_id)] = detalle
 
-        docs_int = AsistenteVisitaInterna.objects.exclude(
-            visita__estado__in=["aprobada_inicial", "pendiente", "enviada_coordinacion"]
-        )
-        docs_ext = AsistenteVisitaExterna.objects.exclude(
-            visita__estado__in=["aprobada_inicial", "pendiente", "enviada_coordinacion"]
+    visitas_data = []
+    for v in pagina:
+        fila = _fila_visita_listado(v, detalles.get((v["tipo"], v["visita_id"]), {}))
+        visitas_data.append({campo: valor for campo, valor in fila.items() if campo in campos})
+
+    respuesta = {
+        "visitas": visitas_data,
+        "total": total,
+        "cursor_siguiente": cursor_siguiente,
+    }
+    if not cursor:
+        stats = {}
+        for tipo_visita in tipos:
+            for clave, valor in _estadisticas_visitas(tipo_visita).items():
+                stats[clave] = stats.get(clave, 0) + valor
+        if tipo == "todas":
+            stats["total"] = total
+        respuesta["stats"] = stats
+
+    response = JsonResponse(respuesta)
+    response["X-Total-Count"] = str(total)
+    return response
+
+
+# Estados de visita que generan notificaciones en cada panel.
+ESTADOS_NOTIFICACION = {
+    "administrador": ["pendiente", "documentos_enviados", "en_revision_documentos"],
+    "coordinador": ["enviada_coordinacion"],
+}
+NOTIFICACIONES_MAXIMAS = 50
+
+
+def _construir_notificaciones(rol):
+    """
+    Contadores de visitas pendientes por estado y tipo, más las visitas más
+    recientes en esos estados para el desplegable de notificaciones.
+    """
+    pendientes = VisitaUnificada.objects.filter(estado__in=ESTADOS_NOTIFICACION[rol])
+
+    por_estado = {estado: 0 for estado in ESTADOS_NOTIFICACION[rol]}
+    por_tipo = {tipo: 0 for tipo in _LISTADO_VISITAS}
+    for fila in pendientes.order_by().values("tipo", "estado").annotate(total=Count("clave")):
+        por_estado[fila["estado"]] += fila["total"]
+        por_tipo[fila["tipo"]] += fila["total"]
+    contadores = {
+        "por_estado": por_estado,
+        "por_tipo": por_tipo,
+        "total": sum(por_tipo.values()),
+    }
+    if rol == "administrador":
+        contadores["docs_pendientes_revision"] = sum(
+            config["modelo_asistente"].objects.filter(estado="pendiente_documentos").exclude(
+                visita__estado__in=ESTADOS_SIN_DOCUMENTOS
+            ).count()
+            for config in _LISTADO_VISITAS.values()
         )
 
-        stats = {
-            "pendientes": (
-                VisitaInterna.objects.filter(
-                    estado__in=["pendiente", "enviada_coordinacion"]
-                ).count()
-                + VisitaExterna.objects.filter(
-                    estado__in=["pendiente", "enviada_coordinacion"]
-                ).count()
-            ),
-            "aprobadas_inicial": (
-                VisitaInterna.objects.filter(estado="aprobada_inicial").count()
-                + VisitaExterna.objects.filter(estado="aprobada_inicial").count()
-            ),
-            "aprobadas_total": (
-                VisitaInterna.objects.filter(estado__in=ESTADOS_APROBADAS).count()
-                + VisitaExterna.objects.filter(estado__in=ESTADOS_APROBADAS).count()
-            ),
-            "documentos_enviados": (
-                VisitaInterna.objects.filter(estado="documentos_enviados").count()
-                + VisitaExterna.objects.filter(estado="documentos_enviados").count()
-            ),
-            "en_revision": (
-                VisitaInterna.objects.filter(estado="en_revision_documentos").count()
-                + VisitaExterna.objects.filter(estado="en_revision_documentos").count()
-            ),
-            "confirmadas": (
-                VisitaInterna.objects.filter(estado="confirmada").count()
-                + VisitaExterna.objects.filter(estado="confirmada").count()
-            ),
-            "rechazadas": (
-                VisitaInterna.objects.filter(estado="rechazada").count()
-                + VisitaExterna.objects.filter(estado="rechazada").count()
-            ),
-            "docs_pendientes_revision": (
-                docs_int.filter(estado="pendiente_documentos").count()
-                + docs_ext.filter(estado="pendiente_documentos").count()
-            ),
-            "docs_aprobados": (
-                docs_int.filter(estado="documentos_aprobados").count()
-                + docs_ext.filter(estado="documentos_aprobados").count()
-            ),
-            "docs_rechazados": (
-                docs_int.filter(estado="documentos_rechazados").count()
-                + docs_ext.filter(estado="documentos_rechazados").count()
-            ),
-            "docs_total": docs_int.count() + docs_ext.count(),
-            "total": len(visitas_data),
+    visitas = [
+        {
+            "id": v["visita_id"],
+            "tipo": v["tipo"],
+            "responsable": v["responsable"],
+            "institucion": v["nombre"] or "N/A",
+            "estado": v["estado"],
+            "fecha_visita": v["fecha_visita"].strftime("%d/%m/%Y") if v["fecha_visita"] else "",
         }
+        for v in pendientes.order_by("-fecha_solicitud", "-tipo", "-visita_id").values(
+            "tipo", "visita_id", "responsable", "nombre", "estado", "fecha_visita"
+        )[:NOTIFICACIONES_MAXIMAS]
+    ]
+    return {"contadores": contadores, "visitas": visitas}
 
-        return JsonResponse(
-            {
-                "visitas": visitas_data,
-                "stats": stats,
-            }
-        )
-
-    if tipo == "internas":
-        visitas = VisitaInterna.objects.all().order_by("-fecha_solicitud", "-id")
-
-        if estado == "hoy":
-            visitas = visitas.filter(fecha_visita=fecha_hoy)
-        elif estado == "aprobadas":
-            visitas = visitas.filter(estado__in=ESTADOS_APROBADAS)
-        elif estado in ["en_revision_documentos", "pendiente_revision"]:
-            visitas = visitas.filter(
-                estado__in=["documentos_enviados", "en_revision_documentos"]
-            )
-        elif estado == "pendiente":
-            visitas = visitas.filter(estado__in=["pendiente", "enviada_coordinacion"])
-        elif estado != "todos":
-            visitas = visitas.filter(estado=estado)
-
-        if buscar:
-            visitas = visitas.filter(
-                Q(responsable__icontains=buscar)
-                | Q(nombre_programa__icontains=buscar)
-                | Q(correo_responsable__icontains=buscar)
-            )
-
-        visitas = _aplicar_rango_fechas(visitas)
 
-        for v in visitas:
-            visitas_data.append(
-                {
-                    "id": v.id,
-                    "tipo": "interna",
-                    "tipo_display": "Interna (SENA)",
-                    "responsable": v.responsable,
-                    "institucion": v.nombre_programa or "N/A",
-                    "correo": v.correo_responsable,
-                    "telefono": v.telefono_responsable,
-                    "fecha_visita": (
-                        v.fecha_visita.strftime("%d/%m/%Y")
-                        if v.fecha_visita
-                        else (
-                            v.fecha_solicitud.strftime("%d/%m/%Y")
-                            if v.fecha_solicitud
-                            else "N/A"
-                        )
-                    ),
-                    "cantidad": v.cantidad_aprendices,
-                    "estado": v.estado,
-                    "tiene_rechazos": v.asistentes.filter(
-                        estado="documentos_rechazados"
-                    ).exists(),
-                    "puede_confirmar": (
-                        v.asistentes.exists()
-                        and not v.asistentes.exclude(
-                            estado="documentos_aprobados"
-                        ).exists()
-                    ),
-                    "fecha_solicitud": (
-                        v.fecha_solicitud.strftime("%d/%m/%Y %H:%M")
-                        if v.fecha_solicitud
-                        else "N/A"
-                    ),
-                }
-            )
-
-        docs_int = AsistenteVisitaInterna.objects.exclude(
-            visita__estado__in=["aprobada_inicial", "pendiente", "enviada_coordinacion"]
-        )
-        stats = {
-            "pendientes": VisitaInterna.objects.filter(
-                estado__in=["pendiente", "enviada_coordinacion"]
-            ).count(),
-            "aprobadas_inicial": VisitaInterna.objects.filter(
-                estado="aprobada_inicial"
-            ).count(),
-            "aprobadas_total": VisitaInterna.objects.filter(
-                estado__in=ESTADOS_APROBADAS
-            ).count(),
-            "documentos_enviados": VisitaInterna.objects.filter(
-                estado="documentos_enviados"
-            ).count(),
-            "en_revision": VisitaInterna.objects.filter(
-                estado="en_revision_documentos"
-            ).count(),
-            "confirmadas": VisitaInterna.objects.filter(estado="confirmada").count(),
-            "rechazadas": VisitaInterna.objects.filter(estado="rechazada").count(),
-            "docs_pendientes_revision": docs_int.filter(
-                estado="pendiente_documentos"
-            ).count(),
-            "docs_aprobados": docs_int.filter(estado="documentos_aprobados").count(),
-            "docs_rechazados": docs_int.filter(estado="documentos_rechazados").count(),
-            "docs_total": docs_int.count(),
-        }
+@login_required(login_url="usuarios:login")
+@require_GET
+def api_notificaciones(request):
+    """
+    Contadores de notificaciones del panel administrativo y del panel de
+    coordinación, según el rol del usuario. El ETag es la versión de las
+    notificaciones: si el cliente la envía en If-None-Match y nada cambió, se
+    responde 304 sin consultar las visitas.
+    """
+    if es_coordinador(request.user):
+        rol = "coordinador"
+    elif es_administrador_panel(request.user):
+        rol = "administrador"
     else:
-        visitas = VisitaExterna.objects.all().order_by("-fecha_solicitud", "-id")
-
-        if estado == "hoy":
-            visitas = visitas.filter(fecha_visita=fecha_hoy)
-        elif estado == "aprobadas":
-            visitas = visitas.filter(estado__in=ESTADOS_APROBADAS)
-        elif estado in ["en_revision_documentos", "pendiente_revision"]:
-            visitas = visitas.filter(
-                estado__in=["documentos_enviados", "en_revision_documentos"]
-            )
-        elif estado == "pendiente":
-            visitas = visitas.filter(estado__in=["pendiente", "enviada_coordinacion"])
-        elif estado != "todos":
-            visitas = visitas.filter(estado=estado)
-
-        if buscar:
-            visitas = visitas.filter(
-                Q(nombre_responsable__icontains=buscar)
-                | Q(nombre__icontains=buscar)
-                | Q(correo_responsable__icontains=buscar)
-            )
-
-        visitas = _aplicar_rango_fechas(visitas)
+        return JsonResponse({"success": False, "error": "No autorizado"}, status=403)
 
-        for v in visitas:
-            visitas_data.append(
-                {
-                    "id": v.id,
-                    "tipo": "externa",
-                    "tipo_display": "Externa (Institución)",
-                    "responsable": v.nombre_responsable,
-                    "institucion": v.nombre or "N/A",
-                    "correo": v.correo_responsable,
-                    "telefono": v.telefono_responsable,
-                    "fecha_visita": (
-                        v.fecha_visita.strftime("%d/%m/%Y")
-                        if v.fecha_visita
-                        else (
-                            v.fecha_solicitud.strftime("%d/%m/%Y")
-                            if v.fecha_solicitud
-                            else "N/A"
-                        )
-                    ),
-                    "cantidad": v.cantidad_visitantes,
-                    "estado": v.estado,
-                    "tiene_rechazos": v.asistentes.filter(
-                        estado="documentos_rechazados"
-                    ).exists(),
-                    "puede_confirmar": (
-                        v.asistentes.exists()
-                        and not v.asistentes.exclude(
-                            estado="documentos_aprobados"
-                        ).exists()
-                    ),
-                    "fecha_solicitud": (
-                        v.fecha_solicitud.strftime("%d/%m/%Y %H:%M")
-                        if v.fecha_solicitud
-                        else "N/A"
-                    ),
-                }
-            )
+    version = obtener_version_notificaciones()
+    etag = quote_etag(f"{rol}-{version}")
 
-        docs_ext = AsistenteVisitaExterna.objects.exclude(
-            visita__estado__in=["aprobada_inicial", "pendiente", "enviada_coordinacion"]
-        )
-        stats = {
-            "pendientes": VisitaExterna.objects.filter(
-                estado__in=["pendiente", "enviada_coordinacion"]
-            ).count(),
-            "aprobadas_inicial": VisitaExterna.objects.filter(
-                estado="aprobada_inicial"
-            ).count(),
-            "aprobadas_total": VisitaExterna.objects.filter(
-                estado__in=ESTADOS_APROBADAS
-            ).count(),
-            "documentos_enviados": VisitaExterna.objects.filter(
-                estado="documentos_enviados"
-            ).count(),
-            "en_revision": VisitaExterna.objects.filter(
-                estado="en_revision_documentos"
-            ).count(),
-            "confirmadas": VisitaExterna.objects.filter(estado="confirmada").count(),
-            "rechazadas": VisitaExterna.objects.filter(estado="rechazada").count(),
-            "docs_pendientes_revision": docs_ext.filter(
-                estado="pendiente_documentos"
-            ).count(),
-            "docs_aprobados": docs_ext.filter(estado="documentos_aprobados").count(),
-            "docs_rechazados": docs_ext.filter(estado="documentos_rechazados").count(),
-            "docs_total": docs_ext.count(),
-        }
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        clave = f"gestion_visitas:notificaciones:{rol}:{version}"
+        datos = cache.get(clave)
+        if datos is None:
+            datos = _construir_notificaciones(rol)
+            cache.set(clave, datos, timeout=300)
+        response = JsonResponse({"version": version, **datos})
 
-    return JsonResponse(
-        {
-            "visitas": visitas_data,
-            "stats": stats,
-        }
-    )
+    response["ETag"] = etag
+    response["Cache-Control"] = "no-cache"
+    return response
 
 
 @login_required(login_url="usuarios:login")
@@ -894,9 +752,11 @@ def api_detalle_visita(request, tipo, visita_id):
             "pendiente",
             "enviada_coordinacion",
         ]:
-            for a in visita.asistentes.all():
-                documentos_actuales = _documentos_subidos_actuales(a)
-                revision = _sincronizar_estado_asistente(a)
+            for a in visita.asistentes.prefetch_related(prefetch_documentos_subidos()):
+                documentos_actuales = documentos_subidos_actuales(
+                    a, a.documentos_subidos.all()
+                )
+                revision = calcular_estado_revision_asistente(a, documentos_actuales)
                 asistentes.append(
                     {
                         "id": a.id,
@@ -1036,9 +896,11 @@ def api_detalle_visita(request, tipo, visita_id):
             "pendiente",
             "enviada_coordinacion",
         ]:
-            for a in visita.asistentes.all():
-                documentos_actuales = _documentos_subidos_actuales(a)
-                revision = _sincronizar_estado_asistente(a)
+            for a in visita.asistentes.prefetch_related(prefetch_documentos_subidos()):
+                documentos_actuales = documentos_subidos_actuales(
+                    a, a.documentos_subidos.all()
+                )
+                revision = calcular_estado_revision_asistente(a, documentos_actuales)
                 asistentes.append(
                     {
                         "id": a.id,
@@ -1523,7 +1385,7 @@ def api_revisar_autorizacion_padres(request, tipo, asistente_id, accion):
                 "observaciones_autorizacion_padres",
             ]
         )
-        revision = _sincronizar_estado_asistente(asistente)
+        revision = sincronizar_estado_asistente(asistente)
         return JsonResponse(
             {
                 "success": True,
@@ -1547,7 +1409,7 @@ def api_revisar_autorizacion_padres(request, tipo, asistente_id, accion):
                 "observaciones_autorizacion_padres",
             ]
         )
-        revision = _sincronizar_estado_asistente(
+        revision = sincronizar_estado_asistente(
             asistente,
             observacion_rechazo=f"Autorización de padres rechazada: {observaciones}",
         )
@@ -1593,7 +1455,7 @@ def api_revisar_documento_asistente(request, tipo, asistente_id, accion):
     )
 
     if accion == "aprobar":
-        documentos_actuales = _documentos_subidos_actuales(asistente)
+        documentos_actuales = documentos_subidos_actuales(asistente)
 
         if not documentos_actuales and not asistente.formato_autorizacion_padres:
             return JsonResponse(
@@ -1637,7 +1499,7 @@ def api_revisar_documento_asistente(request, tipo, asistente_id, accion):
         asistente.estado = "documentos_aprobados"
         asistente.observaciones_revision = ""
         asistente.save(update_fields=["estado", "observaciones_revision"])
-        revision = _sincronizar_estado_asistente(asistente)
+        revision = sincronizar_estado_asistente(asistente)
         return JsonResponse(
             {
                 "success": True,
@@ -1655,7 +1517,7 @@ def api_revisar_documento_asistente(request, tipo, asistente_id, accion):
                 }
             )
 
-        documentos_actuales = _documentos_subidos_actuales(asistente)
+        documentos_actuales = documentos_subidos_actuales(asistente)
         if not documentos_actuales and not asistente.formato_autorizacion_padres:
             return JsonResponse(
                 {
@@ -1679,7 +1541,7 @@ def api_revisar_documento_asistente(request, tipo, asistente_id, accion):
                 ]
             )
 
-        revision = _sincronizar_estado_asistente(
+        revision = sincronizar_estado_asistente(
             asistente,
             observacion_rechazo=observaciones,
         )
@@ -1761,244 +1623,125 @@ def api_visitas_aprobadas(request):
     return JsonResponse({"visitas": visitas_data})
 
 
+def _url_campo_asistente(tipo, asistente, campo):
+    archivo = getattr(asistente, campo)
+    if not archivo:
+        return None, None
+    url = reverse(
+        "documentos:ver_campo_asistente_inline",
+        kwargs={"tipo": tipo, "asistente_id": asistente.id, "campo": campo},
+    )
+    return url, archivo.name.split("/")[-1]
+
+
+def _fila_documentos_revision(tipo, a, documentos_actuales, revision):
+    visita = a.visita
+    if tipo == "interna":
+        responsable = visita.responsable
+        programa = visita.nombre_programa
+    else:
+        responsable = visita.nombre_responsable
+        programa = visita.nombre
+
+    documento_identidad, documento_identidad_nombre = _url_campo_asistente(
+        tipo, a, "documento_identidad"
+    )
+    documento_adicional, documento_adicional_nombre = _url_campo_asistente(
+        tipo, a, "documento_adicional"
+    )
+    formato_padres, formato_padres_nombre = _url_campo_asistente(
+        tipo, a, "formato_autorizacion_padres"
+    )
+
+    return {
+        "asistente_id": a.id,
+        "visita_id": visita.id,
+        "visita_tipo": tipo,
+        "visita_responsable": responsable,
+        "visita_programa": programa or "N/A",
+        "visita_estado": visita.estado,
+        "visita_estado_display": visita.get_estado_display(),
+        "visita_fecha": (
+            visita.fecha_solicitud.strftime("%d/%m/%Y")
+            if visita.fecha_solicitud
+            else "N/A"
+        ),
+        "nombre_completo": a.nombre_completo,
+        "tipo_documento": a.tipo_documento,
+        "numero_documento": a.numero_documento,
+        "estado": revision["estado"],
+        "documento_identidad": documento_identidad,
+        "documento_identidad_nombre": documento_identidad_nombre,
+        "documento_adicional": documento_adicional,
+        "documento_adicional_nombre": documento_adicional_nombre,
+        "formato_autorizacion_padres": formato_padres,
+        "formato_autorizacion_padres_nombre": formato_padres_nombre,
+        "estado_autorizacion_padres": (
+            a.estado_autorizacion_padres if a.formato_autorizacion_padres else None
+        ),
+        "observaciones_autorizacion_padres": (
+            a.observaciones_autorizacion_padres
+            if a.formato_autorizacion_padres
+            else None
+        ),
+        "observaciones_revision": (
+            a.observaciones_revision
+            if revision["estado"] == "documentos_rechazados"
+            else ""
+        ),
+        "tiene_rechazos": revision["tiene_rechazos"],
+        "todos_aprobados": revision["todos_aprobados"],
+        "documentos_subidos": [
+            _serializar_documento_subido(
+                doc_actual["ds"],
+                versiones_envio=doc_actual["versiones_envio"],
+                es_reenvio=doc_actual["es_reenvio"],
+                historial_versiones=doc_actual["historial_versiones"],
+            )
+            for doc_actual in documentos_actuales
+        ],
+    }
+
+
 @login_required(login_url="usuarios:login")
 def api_documentos_revision(request):
-    """API que devuelve todos los asistentes con sus documentos, filtrando por tipo y estado_asistente"""
+    """API que devuelve todos los asistentes con sus documentos, filtrando por tipo y estado_asistente.
+
+    Es de solo lectura: los documentos de todos los asistentes se cargan en
+    una sola consulta y el estado agregado se calcula en memoria. El estado
+    guardado del asistente lo sincronizan las acciones que suben o revisan
+    documentos.
+    """
     if not es_administrador_panel(request.user):
         return JsonResponse({"success": False, "error": "No autorizado"}, status=403)
 
     tipo = sanitize_token(request.GET.get("tipo", "internas"), max_length=20) or "internas"
     estado_asistente = sanitize_token(request.GET.get("estado_asistente", ""), max_length=40)
 
-    documentos_data = []
-
     if tipo == "internas":
-        qs = AsistenteVisitaInterna.objects.select_related("visita").all()
-        if estado_asistente:
-            if estado_asistente == "revision_activa":
-                qs = qs.filter(
-                    estado__in=["pendiente_documentos", "documentos_rechazados"]
-                )
-            else:
-                qs = qs.filter(estado=estado_asistente)
-        for a in qs:
-            documentos_actuales = _documentos_subidos_actuales(a)
-            revision = _sincronizar_estado_asistente(a)
-            documentos_data.append(
-                {
-                    "asistente_id": a.id,
-                    "visita_id": a.visita.id,
-                    "visita_tipo": "interna",
-                    "visita_responsable": a.visita.responsable,
-                    "visita_programa": a.visita.nombre_programa or "N/A",
-                    "visita_estado": a.visita.estado,
-                    "visita_estado_display": a.visita.get_estado_display(),
-                    "visita_fecha": (
-                        a.visita.fecha_solicitud.strftime("%d/%m/%Y")
-                        if a.visita.fecha_solicitud
-                        else "N/A"
-                    ),
-                    "nombre_completo": a.nombre_completo,
-                    "tipo_documento": a.tipo_documento,
-                    "numero_documento": a.numero_documento,
-                    "estado": revision["estado"],
-                    "documento_identidad": (
-                        reverse(
-                            "documentos:ver_campo_asistente_inline",
-                            kwargs={
-                                "tipo": "interna",
-                                "asistente_id": a.id,
-                                "campo": "documento_identidad",
-                            },
-                        )
-                        if a.documento_identidad
-                        else None
-                    ),
-                    "documento_identidad_nombre": (
-                        a.documento_identidad.name.split("/")[-1]
-                        if a.documento_identidad
-                        else None
-                    ),
-                    "documento_adicional": (
-                        reverse(
-                            "documentos:ver_campo_asistente_inline",
-                            kwargs={
-                                "tipo": "interna",
-                                "asistente_id": a.id,
-                                "campo": "documento_adicional",
-                            },
-                        )
-                        if a.documento_adicional
-                        else None
-                    ),
-                    "documento_adicional_nombre": (
-                        a.documento_adicional.name.split("/")[-1]
-                        if a.documento_adicional
-                        else None
-                    ),
-                    "estado_autorizacion_padres": (
-                        a.estado_autorizacion_padres
-                        if a.formato_autorizacion_padres
-                        else None
-                    ),
-                    "observaciones_autorizacion_padres": (
-                        a.observaciones_autorizacion_padres
-                        if a.formato_autorizacion_padres
-                        else None
-                    ),
-                    "observaciones_revision": (
-                        a.observaciones_revision
-                        if revision["estado"] == "documentos_rechazados"
-                        else ""
-                    ),
-                    "tiene_rechazos": revision["tiene_rechazos"],
-                    "todos_aprobados": revision["todos_aprobados"],
-                    "documentos_subidos": [
-                        _serializar_documento_subido(
-                            doc_actual["ds"],
-                            versiones_envio=doc_actual["versiones_envio"],
-                            es_reenvio=doc_actual["es_reenvio"],
-                            historial_versiones=doc_actual["historial_versiones"],
-                        )
-                        for doc_actual in documentos_actuales
-                    ],
-                }
-            )
+        tipo_visita, modelo = "interna", AsistenteVisitaInterna
     else:
-        qs = AsistenteVisitaExterna.objects.select_related("visita").all()
-        if estado_asistente:
-            if estado_asistente == "revision_activa":
-                qs = qs.filter(
-                    estado__in=["pendiente_documentos", "documentos_rechazados"]
-                )
-            else:
-                qs = qs.filter(estado=estado_asistente)
-        for a in qs:
-            documentos_actuales = _documentos_subidos_actuales(a)
-            revision = _sincronizar_estado_asistente(a)
-            documentos_data.append(
-                {
-                    "asistente_id": a.id,
-                    "visita_id": a.visita.id,
-                    "visita_tipo": "externa",
-                    "visita_responsable": a.visita.nombre_responsable,
-                    "visita_programa": a.visita.nombre or "N/A",
-                    "visita_estado": a.visita.estado,
-                    "visita_estado_display": a.visita.get_estado_display(),
-                    "visita_fecha": (
-                        a.visita.fecha_solicitud.strftime("%d/%m/%Y")
-                        if a.visita.fecha_solicitud
-                        else "N/A"
-                    ),
-                    "nombre_completo": a.nombre_completo,
-                    "tipo_documento": a.tipo_documento,
-                    "numero_documento": a.numero_documento,
-                    "estado": revision["estado"],
-                    "documento_identidad": (
-                        reverse(
-                            "documentos:ver_campo_asistente_inline",
-                            kwargs={
-                                "tipo": "externa",
-                                "asistente_id": a.id,
-                                "campo": "documento_identidad",
-                            },
-                        )
-                        if a.documento_identidad
-                        else None
-                    ),
-                    "documento_identidad_nombre": (
-                        a.documento_identidad.name.split("/")[-1]
-                        if a.documento_identidad
-                        else None
-                    ),
-                    "documento_adicional": (
-                        reverse(
-                            "documentos:ver_campo_asistente_inline",
-                            kwargs={
-                                "tipo": "externa",
-                                "asistente_id": a.id,
-                                "campo": "documento_adicional",
-                            },
-                        )
-                        if a.documento_adicional
-                        else None
-                    ),
-                    "documento_adicional_nombre": (
-                        a.documento_adicional.name.split("/")[-1]
-                        if a.documento_adicional
-                        else None
-                    ),
-                        "formato_autorizacion_padres": (
-                            reverse(
-                                "documentos:ver_campo_asistente_inline",
-                                kwargs={
-                                    "tipo": "externa",
-                                    "asistente_id": a.id,
-                                    "campo": "formato_autorizacion_padres",
-                                },
-                            )
-                            if a.formato_autorizacion_padres
-                            else None
-                        ),
-                        "formato_autorizacion_padres_nombre": (
-                            a.formato_autorizacion_padres.name.split("/")[-1]
-                            if a.formato_autorizacion_padres
-                            else None
-                        ),
-                        "estado_autorizacion_padres": (
-                            a.estado_autorizacion_padres
-                            if a.formato_autorizacion_padres
-                            else None
-                        ),
-                        "observaciones_autorizacion_padres": (
-                            a.observaciones_autorizacion_padres
-                            if a.formato_autorizacion_padres
-                            else None
-                        ),
-                    "formato_autorizacion_padres": (
-                        reverse(
-                            "documentos:ver_campo_asistente_inline",
-                            kwargs={
-                                "tipo": "externa",
-                                "asistente_id": a.id,
-                                "campo": "formato_autorizacion_padres",
-                            },
-                        )
-                        if a.formato_autorizacion_padres
-                        else None
-                    ),
-                    "formato_autorizacion_padres_nombre": (
-                        a.formato_autorizacion_padres.name.split("/")[-1]
-                        if a.formato_autorizacion_padres
-                        else None
-                    ),
-                    "estado_autorizacion_padres": (
-                        a.estado_autorizacion_padres
-                        if a.formato_autorizacion_padres
-                        else None
-                    ),
-                    "observaciones_autorizacion_padres": (
-                        a.observaciones_autorizacion_padres
-                        if a.formato_autorizacion_padres
-                        else None
-                    ),
-                    "observaciones_revision": (
-                        a.observaciones_revision
-                        if revision["estado"] == "documentos_rechazados"
-                        else ""
-                    ),
-                    "tiene_rechazos": revision["tiene_rechazos"],
-                    "todos_aprobados": revision["todos_aprobados"],
-                    "documentos_subidos": [
-                        _serializar_documento_subido(
-                            doc_actual["ds"],
-                            versiones_envio=doc_actual["versiones_envio"],
-                            es_reenvio=doc_actual["es_reenvio"],
-                            historial_versiones=doc_actual["historial_versiones"],
-                        )
-                        for doc_actual in documentos_actuales
-                    ],
-                }
+        tipo_visita, modelo = "externa", AsistenteVisitaExterna
+
+    qs = modelo.objects.select_related("visita").prefetch_related(
+        prefetch_documentos_subidos()
+    )
+    if estado_asistente:
+        if estado_asistente == "revision_activa":
+            qs = qs.filter(
+                estado__in=["pendiente_documentos", "documentos_rechazados"]
             )
+        else:
+            qs = qs.filter(estado=estado_asistente)
+
+    documentos_data = []
+    for a in qs:
+        documentos_actuales = documentos_subidos_actuales(
+            a, a.documentos_subidos.all()
+        )
+        revision = calcular_estado_revision_asistente(a, documentos_actuales)
+        documentos_data.append(
+            _fila_documentos_revision(tipo_visita, a, documentos_actuales, revision)
+        )
 
     return JsonResponse({"documentos": documentos_data})
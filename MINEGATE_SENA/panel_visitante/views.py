@@ -25,6 +25,7 @@ from documentos.models import (
     DocumentoSubidoAsistente,
     DocumentoSubidoAprendiz,
 )
+from documentos.revision import sincronizar_estado_asistente
 from .forms import (
     RegistroVisitanteForm,
     PasswordResetRequestForm,
@@ -521,71 +522,6 @@ def _agrupar_documentos_por_categoria(documentos):
     return documentos_por_categoria
 
 
-def _documentos_actuales_asistente(asistente, tipo):
-    filtros = (
-        {"asistente_interna": asistente}
-        if tipo == "interna"
-        else {"asistente_externa": asistente}
-    )
-
-    docs = (
-        DocumentoSubidoAsistente.objects.filter(**filtros)
-        .select_related("documento_requerido")
-        .order_by("documento_requerido_id", "-fecha_subida", "-id")
-    )
-
-    latest_por_documento = {}
-    for ds in docs:
-        if ds.documento_requerido_id not in latest_por_documento:
-            latest_por_documento[ds.documento_requerido_id] = ds
-
-    return list(latest_por_documento.values())
-
-
-def _sincronizar_estado_asistente_por_docs(asistente, tipo):
-    docs_actuales = _documentos_actuales_asistente(asistente, tipo)
-    docs_personales = [
-        ds
-        for ds in docs_actuales
-        if not _es_categoria_archivo_final(ds.documento_requerido.categoria)
-    ]
-
-    tiene_rechazos = any(ds.estado == "rechazado" for ds in docs_personales)
-    todos_aprobados = bool(docs_personales) and all(
-        ds.estado == "aprobado" for ds in docs_personales
-    )
-
-    if getattr(asistente, "formato_autorizacion_padres", None):
-        estado_autorizacion = getattr(
-            asistente, "estado_autorizacion_padres", "pendiente"
-        )
-        if estado_autorizacion == "rechazado":
-            tiene_rechazos = True
-        elif estado_autorizacion != "aprobado":
-            todos_aprobados = False
-
-    if tiene_rechazos:
-        nuevo_estado = "documentos_rechazados"
-    elif todos_aprobados:
-        nuevo_estado = "documentos_aprobados"
-    else:
-        nuevo_estado = "pendiente_documentos"
-
-    update_fields = []
-    if asistente.estado != nuevo_estado:
-        asistente.estado = nuevo_estado
-        update_fields.append("estado")
-
-    if nuevo_estado != "documentos_rechazados" and asistente.observaciones_revision:
-        asistente.observaciones_revision = ""
-        update_fields.append("observaciones_revision")
-
-    if update_fields:
-        asistente.save(update_fields=update_fields)
-
-    return nuevo_estado
-
-
 def _resumen_pendientes_correccion(visita, tipo):
     asistentes_rechazados = visita.asistentes.filter(
         estado="documentos_rechazados"
@@ -1232,6 +1168,8 @@ def registrar_asistentes(request, tipo, visita_id):
                             defaults={"archivo": aprendiz.documento_adicional},
                         )
 
+                    sincronizar_estado_asistente(asistente)
+
             asistente.tiene_doc_salud = asistente.documentos_subidos.filter(
                 documento_requerido__categoria="Formato Auto Reporte Condiciones de Salud"
             ).exists()
@@ -1423,7 +1361,7 @@ def registrar_asistentes(request, tipo, visita_id):
                         archivos_subidos.append(doc.titulo)
 
             if archivos_subidos:
-                _sincronizar_estado_asistente_por_docs(primer_asistente, tipo)
+                sincronizar_estado_asistente(primer_asistente)
 
                 if visita.estado in ["documentos_enviados", "en_revision_documentos"]:
                     visita.estado = "aprobada_inicial"
@@ -2437,6 +2375,7 @@ def actualizar_documento_asistente(request, tipo, asistente_id):
     for campo, valor in actualizaciones_asistente.items():
         setattr(asistente, campo, valor)
     asistente.save(update_fields=list(actualizaciones_asistente.keys()))
+    sincronizar_estado_asistente(asistente)
 
     if visita.estado in ["documentos_enviados", "en_revision_documentos"]:
         visita.estado = "aprobada_inicial"
@@ -2727,6 +2666,9 @@ def actualizar_info_asistente(request, tipo, asistente_id):
                         observaciones_revision="",
                     )
 
+                if archivo_salud or archivo_autorizacion:
+                    sincronizar_estado_asistente(asistente)
+
                 if aprendiz_a_actualizar and campos_aprendiz_update:
                     if archivo_salud:
                         aprendiz_a_actualizar.documento_adicional = archivo_salud
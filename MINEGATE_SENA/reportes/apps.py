@@ -4,3 +4,7 @@
 class ReportesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reportes'
+
+    def ready(self):
+        """Registra los signals cuando la app está lista"""
+        import reportes.signals  # noqa
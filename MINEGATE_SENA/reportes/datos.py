@@ -0,0 +1,422 @@
+﻿"""
+Capa de datos de los reportes de visitas.
+
+Las visitas internas y externas se leen juntas de la vista VisitaUnificada,
+que filtra, ordena y pagina ambos tipos en una sola consulta. Las filas se
+construyen con proyecciones values() y las etiquetas de los campos con
+choices se resuelven en memoria, sin instanciar modelos. Los asistentes de
+cada tipo de visita se leen en una sola consulta y se agrupan por visita, de
+modo que la cantidad de consultas no depende de cuántas visitas tenga el
+reporte:
+
+- obtener_filas: una consulta de visitas más una de asistentes y una de
+  horarios de acceso por tipo.
+- iterar_filas: una consulta de visitas más, por cada bloque de chunk_size
+  visitas, una de asistentes y una de horarios por tipo presente en el bloque.
+- paginar_filas: un conteo, una página y un conteo de asistentes por tipo.
+
+paginar_filas_en_cache reutiliza cada página mientras no cambien los datos
+(ver reportes.versiones). Las filas completas no se guardan en caché: su
+tamaño no tiene límite y la versión cambia con cada registro de acceso, así
+que cada reporte escribiría otro bloque grande en la caché compartida.
+"""
+
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Min, Q
+from django.utils import timezone
+
+from control_acceso_mina.models import RegistroAccesoMina
+from core.fechas import rango_fechas_local
+from gestion_visitas.models import VisitaUnificada
+from visitaExterna.models import AsistenteVisitaExterna, VisitaExterna
+from visitaInterna.models import AsistenteVisitaInterna, VisitaInterna
+
+from .versiones import obtener_version_datos
+
+
+CHUNK_SIZE = 500
+
+_CAMPOS_VISITA = (
+	"tipo",
+	"visita_id",
+	"nombre",
+	"responsable",
+	"documento_responsable",
+	"correo",
+	"telefono_responsable",
+	"cantidad",
+	"fecha_solicitud",
+	"fecha_visita",
+	"estado",
+)
+
+_CAMPOS_ASISTENTE = (
+	"visita_id",
+	"nombre_completo",
+	"tipo_documento",
+	"numero_documento",
+	"correo",
+	"telefono",
+	"estado",
+)
+
+# Modelo de visita y modelo de asistente de cada tipo.
+_TIPOS = {
+	"interna": {
+		"etiqueta": "Interna",
+		"modelo": VisitaInterna,
+		"asistente": AsistenteVisitaInterna,
+	},
+	"externa": {
+		"etiqueta": "Externa",
+		"modelo": VisitaExterna,
+		"asistente": AsistenteVisitaExterna,
+	},
+}
+
+
+def _etiquetas(modelo, campo):
+	return dict(modelo._meta.get_field(campo).flatchoices)
+
+
+def filtrar_visitas(filtros):
+	"""
+	Querysets de visitas internas y externas según los filtros (None si el
+	tipo se excluye). Sirven para agregar sobre relaciones de cada tipo (por
+	ejemplo, sus asistentes); los listados usan filtrar_visitas_unificadas.
+	"""
+	visitas_internas = VisitaInterna.objects.all()
+	visitas_externas = VisitaExterna.objects.all()
+
+	if filtros["estado"]:
+		visitas_internas = visitas_internas.filter(estado=filtros["estado"])
+		visitas_externas = visitas_externas.filter(estado=filtros["estado"])
+
+	inicio, fin = rango_fechas_local(filtros["fecha_desde"], filtros["fecha_hasta"])
+	if inicio:
+		visitas_internas = visitas_internas.filter(fecha_solicitud__gte=inicio)
+		visitas_externas = visitas_externas.filter(fecha_solicitud__gte=inicio)
+
+	if fin:
+		visitas_internas = visitas_internas.filter(fecha_solicitud__lt=fin)
+		visitas_externas = visitas_externas.filter(fecha_solicitud__lt=fin)
+
+	return (
+		visitas_internas if filtros["tipo"] in {"todas", "interna"} else None,
+		visitas_externas if filtros["tipo"] in {"todas", "externa"} else None,
+	)
+
+
+def filtrar_visitas_unificadas(filtros):
+	"""Visitas internas y externas de la vista VisitaUnificada según los filtros."""
+	visitas = VisitaUnificada.objects.all()
+	if filtros["tipo"] != "todas":
+		visitas = visitas.filter(tipo=filtros["tipo"])
+
+	if filtros["estado"]:
+		visitas = visitas.filter(estado=filtros["estado"])
+
+	inicio, fin = rango_fechas_local(filtros["fecha_desde"], filtros["fecha_hasta"])
+	if inicio:
+		visitas = visitas.filter(fecha_solicitud__gte=inicio)
+	if fin:
+		visitas = visitas.filter(fecha_solicitud__lt=fin)
+	return visitas
+
+
+def contar_visitas(filtros):
+	"""Cantidad de visitas que cubren los filtros. Una consulta."""
+	return filtrar_visitas_unificadas(filtros).count()
+
+
+def filtros_serializables(filtros):
+	"""Filtros del reporte normalizados, con las fechas en formato ISO."""
+	return {
+		"tipo": filtros["tipo"],
+		"estado": filtros["estado"],
+		"fecha_desde": filtros["fecha_desde"].isoformat() if filtros["fecha_desde"] else None,
+		"fecha_hasta": filtros["fecha_hasta"].isoformat() if filtros["fecha_hasta"] else None,
+	}
+
+
+def _proyectar_visitas(queryset):
+	# "interna" > "externa": con tipo descendente las internas quedan antes
+	# cuando coincide la fecha, igual que en el cursor (_RANGO_TIPO).
+	return queryset.order_by("-fecha_solicitud", "-tipo", "-visita_id").values(*_CAMPOS_VISITA)
+
+
+def _ids_visitas(tipo_visita, visitas):
+	"""
+	Lista de ids tal cual, o el queryset de VisitaUnificada como subconsulta
+	de los ids del tipo indicado.
+	"""
+	if isinstance(visitas, (list, tuple, set)):
+		return visitas
+	return visitas.filter(tipo=tipo_visita).order_by().values("visita_id")
+
+
+def horarios_acceso(tipo_visita, visitas):
+	"""
+	Primera ENTRADA y última SALIDA de cada persona en las visitas indicadas
+	(lista de ids o queryset de VisitaUnificada), calculadas en la base de datos con
+	Min/Max condicionales. Retorna {(visita_id, documento): (entrada, salida)}
+	con las horas en la zona local. Una consulta.
+	"""
+	registros = (
+		RegistroAccesoMina.objects.filter(visita_tipo=tipo_visita, visita_id__in=_ids_visitas(tipo_visita, visitas))
+		.exclude(documento="")
+		.order_by()
+		.values("visita_id", "documento")
+		.annotate(
+			hora_entrada=Min("fecha_hora", filter=Q(tipo="ENTRADA")),
+			hora_salida=Max("fecha_hora", filter=Q(tipo="SALIDA")),
+		)
+	)
+	return {
+		(registro["visita_id"], registro["documento"].strip()): (
+			timezone.localtime(registro["hora_entrada"]) if registro["hora_entrada"] else None,
+			timezone.localtime(registro["hora_salida"]) if registro["hora_salida"] else None,
+		)
+		for registro in registros
+	}
+
+
+def asistentes_por_visita(tipo_visita, visitas, horarios=None):
+	"""
+	Asistentes de las visitas indicadas (lista de ids o queryset de
+	VisitaUnificada, que se usa como subconsulta), agrupados por id de visita.
+	Una consulta.
+	Si se pasan los horarios (ver horarios_acceso), cada asistente incluye
+	hora_entrada y hora_salida.
+	"""
+	modelo = _TIPOS[tipo_visita]["asistente"]
+	tipos_documento = _etiquetas(modelo, "tipo_documento")
+	estados = _etiquetas(modelo, "estado")
+
+	agrupados = {}
+	for asistente in modelo.objects.filter(visita_id__in=_ids_visitas(tipo_visita, visitas)).values(*_CAMPOS_ASISTENTE):
+		fila = {
+			"nombre": asistente["nombre_completo"],
+			"tipo_documento": tipos_documento.get(asistente["tipo_documento"], asistente["tipo_documento"]),
+			"numero_documento": asistente["numero_documento"],
+			"correo": asistente["correo"],
+			"telefono": asistente["telefono"],
+			"estado": estados.get(asistente["estado"], asistente["estado"]),
+		}
+		if horarios is not None:
+			clave = (asistente["visita_id"], str(asistente["numero_documento"]).strip())
+			fila["hora_entrada"], fila["hora_salida"] = horarios.get(clave, (None, None))
+		agrupados.setdefault(asistente["visita_id"], []).append(fila)
+	return agrupados
+
+
+def _construir_filas(visitas, asistentes):
+	"""
+	Filas del reporte a partir de la proyección de VisitaUnificada. asistentes
+	es {tipo_visita: {visita_id: [...]}} (ver asistentes_por_visita).
+	"""
+	estados = {tipo_visita: _etiquetas(config["modelo"], "estado") for tipo_visita, config in _TIPOS.items()}
+	for visita in visitas:
+		tipo_visita = visita["tipo"]
+		yield {
+			"tipo": _TIPOS[tipo_visita]["etiqueta"],
+			"id": visita["visita_id"],
+			"nombre": visita["nombre"],
+			"responsable": visita["responsable"],
+			"documento": visita["documento_responsable"],
+			"correo": visita["correo"],
+			"telefono": visita["telefono_responsable"],
+			"cantidad": visita["cantidad"],
+			"fecha_solicitud": visita["fecha_solicitud"],
+			"fecha_visita": visita["fecha_visita"],
+			"estado": estados[tipo_visita].get(visita["estado"], visita["estado"]),
+			"asistentes": asistentes.get(tipo_visita, {}).get(visita["visita_id"], []),
+		}
+
+
+def _asistentes_con_horarios(tipo_visita, visitas):
+	return asistentes_por_visita(tipo_visita, visitas, horarios_acceso(tipo_visita, visitas))
+
+
+def obtener_filas(filtros):
+	"""Filas del reporte ordenadas por fecha de solicitud descendente."""
+	queryset = filtrar_visitas_unificadas(filtros)
+	visitas = list(_proyectar_visitas(queryset))
+	tipos = {visita["tipo"] for visita in visitas}
+	asistentes = {
+		tipo_visita: _asistentes_con_horarios(tipo_visita, queryset)
+		for tipo_visita in _TIPOS
+		if tipo_visita in tipos
+	}
+	return list(_construir_filas(visitas, asistentes))
+
+
+def iterar_filas(filtros, chunk_size=CHUNK_SIZE):
+	"""
+	Recorre las filas del reporte por bloques de chunk_size visitas, ordenadas
+	por fecha de solicitud descendente e intercalando internas y externas. La
+	memoria usada depende del tamaño del bloque, no del rango de fechas.
+	"""
+	visitas = _proyectar_visitas(filtrar_visitas_unificadas(filtros)).iterator(chunk_size=chunk_size)
+	while True:
+		bloque = list(islice(visitas, chunk_size))
+		if not bloque:
+			return
+		asistentes = {}
+		for tipo_visita in _TIPOS:
+			ids = [visita["visita_id"] for visita in bloque if visita["tipo"] == tipo_visita]
+			if ids:
+				asistentes[tipo_visita] = _asistentes_con_horarios(tipo_visita, ids)
+		yield from _construir_filas(bloque, asistentes)
+
+
+# --- Paginación por cursor ---------------------------------------------------
+#
+# El listado se ordena por (fecha_solicitud, tipo, id) descendente, con las
+# internas antes que las externas cuando coincide la fecha. El cursor codifica
+# esa clave para la primera o la última fila de la página, de modo que cada
+# página se obtiene con un filtro por índice y un LIMIT, sin recorrer las
+# páginas anteriores.
+
+PAGINA_REPORTE = 100
+
+_RANGO_TIPO = {"interna": 1, "externa": 0}
+_TIPO_RANGO = {rango: tipo for tipo, rango in _RANGO_TIPO.items()}
+_CODIGO_TIPO = {"interna": "i", "externa": "e"}
+_TIPO_CODIGO = {codigo: tipo for tipo, codigo in _CODIGO_TIPO.items()}
+_EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def codificar_cursor(fila):
+	microsegundos = (fila["fecha_solicitud"] - _EPOCA) // timedelta(microseconds=1)
+	return f"{microsegundos}.{_CODIGO_TIPO[fila['tipo'].lower()]}.{fila['id']}"
+
+
+def decodificar_cursor(cursor):
+	"""Retorna (fecha_solicitud, rango_tipo, id) o None si el cursor no es válido."""
+	try:
+		microsegundos, codigo, visita_id = str(cursor).split(".")
+		return (
+			_EPOCA + timedelta(microseconds=int(microsegundos)),
+			_RANGO_TIPO[_TIPO_CODIGO[codigo]],
+			int(visita_id),
+		)
+	except (KeyError, ValueError, OverflowError):
+		return None
+
+
+def _filtro_cursor(cursor, despues):
+	"""
+	Condición para las visitas que quedan después (despues=True) o antes del
+	cursor en el orden descendente del listado.
+	"""
+	fecha, rango, visita_id = cursor
+	tipo_visita = _TIPO_RANGO[rango]
+	if despues:
+		return (
+			Q(fecha_solicitud__lt=fecha)
+			| Q(fecha_solicitud=fecha, tipo__lt=tipo_visita)
+			| Q(fecha_solicitud=fecha, tipo=tipo_visita, visita_id__lt=visita_id)
+		)
+	return (
+		Q(fecha_solicitud__gt=fecha)
+		| Q(fecha_solicitud=fecha, tipo__gt=tipo_visita)
+		| Q(fecha_solicitud=fecha, tipo=tipo_visita, visita_id__gt=visita_id)
+	)
+
+
+def contar_asistentes(tipo_visita, ids):
+	"""Cantidad de asistentes por id de visita. Una consulta."""
+	modelo = _TIPOS[tipo_visita]["asistente"]
+	return dict(
+		modelo.objects.filter(visita_id__in=ids)
+		.order_by()
+		.values("visita_id")
+		.annotate(total=Count("id"))
+		.values_list("visita_id", "total")
+	)
+
+
+def paginar_filas(filtros, cursor=None, anterior=False, tamano=PAGINA_REPORTE):
+	"""
+	Página del listado de reportes a partir de un cursor. Las filas no traen
+	asistentes, solo su cantidad ("total_asistentes"); el detalle se pide por
+	visita con asistentes_por_visita.
+
+	Retorna un diccionario con filas, total, cursor_siguiente y
+	cursor_anterior (None cuando no hay más páginas en esa dirección).
+	"""
+	clave_cursor = decodificar_cursor(cursor) if cursor else None
+	if clave_cursor is None:
+		anterior = False
+
+	queryset = filtrar_visitas_unificadas(filtros)
+	total = queryset.count()
+
+	visitas = _proyectar_visitas(queryset)
+	if clave_cursor:
+		visitas = visitas.filter(_filtro_cursor(clave_cursor, despues=not anterior))
+	if anterior:
+		visitas = visitas.reverse()
+	visitas = list(visitas[:tamano + 1])
+
+	hay_mas = len(visitas) > tamano
+	visitas = visitas[:tamano]
+	if anterior:
+		visitas.reverse()
+	filas = list(_construir_filas(visitas, {}))
+
+	for tipo_visita in _TIPOS:
+		ids = [fila["id"] for fila in filas if fila["tipo"].lower() == tipo_visita]
+		conteos = contar_asistentes(tipo_visita, ids) if ids else {}
+		for fila in filas:
+			if fila["tipo"].lower() == tipo_visita:
+				fila["total_asistentes"] = conteos.get(fila["id"], 0)
+
+	hay_siguiente = anterior or hay_mas
+	hay_anterior = hay_mas if anterior else clave_cursor is not None
+	return {
+		"filas": filas,
+		"total": total,
+		"cursor_siguiente": codificar_cursor(filas[-1]) if filas and hay_siguiente else None,
+		"cursor_anterior": codificar_cursor(filas[0]) if filas and hay_anterior else None,
+	}
+
+
+# --- Caché por filtros ---------------------------------------------------------
+#
+# Solo se guardan resultados acotados (páginas de PAGINA_REPORTE filas), bajo
+# una clave con los filtros normalizados y la versión de los datos
+# (reportes.versiones). Cualquier cambio en visitas, asistentes o registros de
+# acceso incrementa la versión, así que un resultado en caché nunca queda
+# desactualizado: simplemente deja de usarse.
+
+
+def _en_cache(nombre, filtros, calcular, *extra):
+	contenido = json.dumps([filtros_serializables(filtros), *extra], sort_keys=True)
+	resumen = hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+	clave = f"reportes:{nombre}:{obtener_version_datos()}:{resumen}"
+
+	resultado = cache.get(clave)
+	if resultado is None:
+		resultado = calcular()
+		cache.set(clave, resultado, timeout=getattr(settings, "REPORTES_CACHE_SEGUNDOS", 600))
+	return resultado
+
+
+def paginar_filas_en_cache(filtros, cursor=None, anterior=False, tamano=PAGINA_REPORTE):
+	"""paginar_filas con caché por filtros, cursor y versión de los datos."""
+	return _en_cache(
+		"pagina",
+		filtros,
+		lambda: paginar_filas(filtros, cursor=cursor, anterior=anterior, tamano=tamano),
+		cursor,
+		anterior,
+		tamano,
+	)
@@ -0,0 +1,214 @@
+﻿"""
+Escritura de reportes en formato .xlsx con libros de openpyxl en modo
+write-only: cada hoja se vuelca a un archivo temporal a medida que se agregan
+filas, de modo que la memoria no crece con la cantidad de visitas.
+"""
+
+import tempfile
+from datetime import datetime
+
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+
+CONTENT_TYPE_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+FORMATO_FECHA = "DD/MM/YYYY"
+FORMATO_FECHA_HORA = "DD/MM/YYYY HH:MM"
+FORMATO_HORA = "HH:MM"
+
+_FUENTE_TITULO = Font(bold=True, size=14, color="FFFFFF")
+_FUENTE_ENCABEZADO = Font(bold=True, color="FFFFFF")
+_FUENTE_ETIQUETA = Font(bold=True)
+_RELLENO_SENA = PatternFill("solid", fgColor="39A900")
+_RELLENO_SUAVE = PatternFill("solid", fgColor="E5F3DD")
+
+COLUMNAS_VISITAS = [
+	("ID", 8),
+	("Nombre/Programa", 40),
+	("Responsable", 30),
+	("Documento", 16),
+	("Correo", 32),
+	("Teléfono", 16),
+	("Cantidad", 10),
+	("Fecha Solicitud", 18),
+	("Fecha Visita", 14),
+	("Estado", 24),
+]
+
+COLUMNAS_ASISTENTES = [
+	("Tipo Visita", 12),
+	("ID Visita", 10),
+	("Visita", 40),
+	("Nombre", 32),
+	("Tipo Doc", 22),
+	("Número Doc", 16),
+	("Correo", 32),
+	("Teléfono", 16),
+	("Estado", 28),
+	("Hora Entrada", 18),
+	("Hora Salida", 18),
+]
+
+COLUMNAS_ASISTENTES_VISITA = [
+	("Nombre", 32),
+	("Tipo Doc", 22),
+	("Número Doc", 16),
+	("Correo", 32),
+	("Teléfono", 16),
+	("Hora Entrada", 18),
+	("Hora Salida", 18),
+]
+
+
+def _fecha_excel(valor):
+	"""Excel no admite zonas horarias: las fechas se escriben en hora local."""
+	if isinstance(valor, datetime) and timezone.is_aware(valor):
+		return timezone.localtime(valor).replace(tzinfo=None)
+	return valor
+
+
+def _celda(hoja, valor, formato=None, fuente=None, relleno=None):
+	celda = WriteOnlyCell(hoja, value=_fecha_excel(valor))
+	if formato and valor is not None:
+		celda.number_format = formato
+	if fuente:
+		celda.font = fuente
+	if relleno:
+		celda.fill = relleno
+	return celda
+
+
+def _crear_hoja(libro, titulo, columnas):
+	"""Crea una hoja con anchos de columna, encabezado fijo y filtro automático."""
+	hoja = libro.create_sheet(title=titulo)
+	for indice, (_, ancho) in enumerate(columnas, start=1):
+		hoja.column_dimensions[get_column_letter(indice)].width = ancho
+	hoja.freeze_panes = "A2"
+	hoja.auto_filter.ref = f"A1:{get_column_letter(len(columnas))}1"
+	hoja.append([
+		_celda(hoja, nombre, fuente=_FUENTE_ENCABEZADO, relleno=_RELLENO_SENA)
+		for nombre, _ in columnas
+	])
+	return hoja
+
+
+def _guardar(libro):
+	"""Guarda el libro en un archivo temporal y lo devuelve posicionado al inicio."""
+	archivo = tempfile.TemporaryFile()
+	libro.save(archivo)
+	archivo.seek(0)
+	return archivo
+
+
+def escribir_reporte_visitas(filas):
+	"""
+	Escribe el reporte general: una hoja por tipo de visita y una hoja con
+	todos los asistentes. Recibe un iterable de filas (ver
+	reportes.datos) y lo recorre una sola vez.
+	"""
+	libro = Workbook(write_only=True)
+	hojas = {
+		"Interna": _crear_hoja(libro, "Visitas internas", COLUMNAS_VISITAS),
+		"Externa": _crear_hoja(libro, "Visitas externas", COLUMNAS_VISITAS),
+	}
+	hoja_asistentes = _crear_hoja(libro, "Asistentes", COLUMNAS_ASISTENTES)
+
+	for fila in filas:
+		hoja = hojas[fila["tipo"]]
+		hoja.append([
+			fila["id"],
+			fila["nombre"],
+			fila["responsable"],
+			fila["documento"],
+			fila["correo"],
+			fila["telefono"],
+			fila["cantidad"],
+			_celda(hoja, fila["fecha_solicitud"], FORMATO_FECHA_HORA),
+			_celda(hoja, fila["fecha_visita"], FORMATO_FECHA),
+			fila["estado"],
+		])
+		for asistente in fila["asistentes"]:
+			hoja_asistentes.append([
+				fila["tipo"],
+				fila["id"],
+				fila["nombre"],
+				asistente["nombre"],
+				asistente["tipo_documento"],
+				asistente["numero_documento"],
+				asistente["correo"],
+				asistente["telefono"],
+				asistente["estado"],
+				_celda(hoja_asistentes, asistente.get("hora_entrada"), FORMATO_FECHA_HORA),
+				_celda(hoja_asistentes, asistente.get("hora_salida"), FORMATO_FECHA_HORA),
+			])
+
+	return _guardar(libro)
+
+
+def escribir_reporte_visita(datos_visita, asistentes):
+	"""
+	Escribe el reporte de una visita: una hoja con los datos de la visita y
+	del responsable, y otra con los asistentes y sus horas de entrada y salida.
+	"""
+	libro = Workbook(write_only=True)
+
+	hoja = libro.create_sheet(title="Visita")
+	hoja.column_dimensions["A"].width = 28
+	hoja.column_dimensions["B"].width = 50
+	hoja.append([
+		_celda(hoja, f"REPORTE DE VISITA {datos_visita['tipo'].upper()}", fuente=_FUENTE_TITULO, relleno=_RELLENO_SENA),
+		_celda(hoja, None, relleno=_RELLENO_SENA),
+	])
+	hoja.append(["Generado", _celda(hoja, timezone.now(), FORMATO_FECHA_HORA)])
+	hoja.append([])
+
+	def seccion(titulo):
+		hoja.append([
+			_celda(hoja, titulo, fuente=_FUENTE_ENCABEZADO, relleno=_RELLENO_SENA),
+			_celda(hoja, None, relleno=_RELLENO_SENA),
+		])
+
+	def dato(etiqueta, valor, formato=None):
+		hoja.append([
+			_celda(hoja, etiqueta, fuente=_FUENTE_ETIQUETA, relleno=_RELLENO_SUAVE),
+			_celda(hoja, valor, formato),
+		])
+
+	seccion("DATOS DE LA VISITA")
+	dato("Código de Visita", datos_visita["id"])
+	dato("Tipo de Visita", datos_visita["tipo"])
+	dato("Nombre/Programa", datos_visita["nombre"])
+	dato("Estado", datos_visita["estado"])
+	dato("Fecha de Solicitud", datos_visita["fecha_solicitud"], FORMATO_FECHA_HORA)
+	dato("Fecha de Visita", datos_visita["fecha_visita"] or "No asignada", FORMATO_FECHA)
+	dato("Hora de Inicio", datos_visita["hora_inicio"] or "-", FORMATO_HORA)
+	dato("Hora de Fin", datos_visita["hora_fin"] or "-", FORMATO_HORA)
+	dato("Cantidad de Visitantes", datos_visita["cantidad"])
+	if datos_visita["observaciones"]:
+		dato("Observaciones", datos_visita["observaciones"])
+	hoja.append([])
+
+	seccion("DATOS DEL RESPONSABLE")
+	dato("Nombre", datos_visita["responsable"])
+	dato("Tipo de Documento", datos_visita["tipo_documento"])
+	dato("Número de Documento", datos_visita["documento"])
+	dato("Correo Electrónico", datos_visita["correo"])
+	dato("Teléfono", datos_visita["telefono"])
+
+	hoja_asistentes = _crear_hoja(libro, "Asistentes", COLUMNAS_ASISTENTES_VISITA)
+	for asistente in asistentes:
+		hoja_asistentes.append([
+			asistente["nombre"],
+			asistente["tipo_documento"],
+			asistente["numero_documento"],
+			asistente["correo"],
+			asistente["telefono"],
+			_celda(hoja_asistentes, asistente["hora_entrada"], FORMATO_FECHA_HORA),
+			_celda(hoja_asistentes, asistente["hora_salida"], FORMATO_FECHA_HORA),
+		])
+
+	return _guardar(libro)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from reportes.resumenes import reconstruir_resumenes
+
+
+class Command(BaseCommand):
+	help = (
+		"Reconstruye las tablas de resumen de visitas por día y de accesos "
+		"a la mina por hora a partir de las tablas originales."
+	)
+
+	def handle(self, *args, **options):
+		creados = reconstruir_resumenes()
+		self.stdout.write(
+			self.style.SUCCESS(
+				f"Resúmenes reconstruidos: {creados['visitas']} filas de visitas, "
+				f"{creados['accesos']} filas de accesos."
+			)
+		)
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.27 on 2026-10-18 12:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0001_trabajoreporte'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiarioVisitas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha de solicitud')),
+                ('tipo', models.CharField(choices=[('interna', 'Interna'), ('externa', 'Externa')], max_length=10, verbose_name='Tipo de visita')),
+                ('estado', models.CharField(max_length=30, verbose_name='Estado')),
+                ('total', models.IntegerField(default=0, verbose_name='Total')),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario de Visitas',
+                'verbose_name_plural': 'Resúmenes Diarios de Visitas',
+                'ordering': ['fecha', 'tipo', 'estado'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenHorarioAccesos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hora', models.DateTimeField(verbose_name='Hora')),
+                ('tipo', models.CharField(max_length=7, verbose_name='Tipo de movimiento')),
+                ('total', models.IntegerField(default=0, verbose_name='Total')),
+            ],
+            options={
+                'verbose_name': 'Resumen Horario de Accesos',
+                'verbose_name_plural': 'Resúmenes Horarios de Accesos',
+                'ordering': ['hora', 'tipo'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='resumenhorarioaccesos',
+            constraint=models.UniqueConstraint(fields=('hora', 'tipo'), name='resumen_accesos_hora_tipo_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumendiariovisitas',
+            constraint=models.UniqueConstraint(fields=('fecha', 'tipo', 'estado'), name='resumen_visitas_fecha_tipo_estado_uniq'),
+        ),
+    ]
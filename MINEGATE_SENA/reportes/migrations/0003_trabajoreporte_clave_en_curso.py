@@ -0,0 +1,32 @@
+# Generated by Django 4.2.27 on 2026-10-18 13:11
+
+from django.db import migrations, models
+
+
+def descartar_trabajos_duplicados(apps, schema_editor):
+    """Deja en curso solo el trabajo más reciente de cada clave."""
+    TrabajoReporte = apps.get_model("reportes", "TrabajoReporte")
+    vistas = set()
+    en_curso = TrabajoReporte.objects.filter(estado__in=["pendiente", "procesando"]).order_by("-fecha_creacion", "-id")
+    for trabajo in en_curso.only("id", "clave"):
+        if trabajo.clave in vistas:
+            TrabajoReporte.objects.filter(id=trabajo.id).update(
+                estado="error",
+                mensaje_error="Trabajo duplicado descartado.",
+            )
+        vistas.add(trabajo.clave)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0002_resumenes'),
+    ]
+
+    operations = [
+        migrations.RunPython(descartar_trabajos_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='trabajoreporte',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado__in', ['pendiente', 'procesando'])), fields=('clave',), name='trabajo_reporte_clave_en_curso'),
+        ),
+    ]
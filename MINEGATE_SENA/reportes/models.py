@@ -1,2 +1,113 @@
-﻿from django.db import models
+﻿from django.contrib.auth.models import User
+from django.db import models
 
+
+class TrabajoReporte(models.Model):
+	"""
+	Generación en segundo plano de un reporte general (PDF o Excel).
+	La clave identifica los filtros normalizados, el formato y la versión de
+	los datos: un trabajo completado con la misma clave se reutiliza. Solo
+	puede haber un trabajo pendiente o procesando por clave.
+	"""
+	FORMATO_CHOICES = [
+		("pdf", "PDF"),
+		("xlsx", "Excel"),
+	]
+
+	ESTADO_CHOICES = [
+		("pendiente", "Pendiente"),
+		("procesando", "Procesando"),
+		("completado", "Completado"),
+		("error", "Error"),
+	]
+
+	clave = models.CharField(max_length=64, db_index=True, verbose_name="Clave")
+	formato = models.CharField(max_length=4, choices=FORMATO_CHOICES, verbose_name="Formato")
+	filtros = models.JSONField(default=dict, verbose_name="Filtros")
+	estado = models.CharField(
+		max_length=10,
+		choices=ESTADO_CHOICES,
+		default="pendiente",
+		verbose_name="Estado",
+	)
+	progreso = models.PositiveSmallIntegerField(default=0, verbose_name="Progreso (%)")
+	archivo = models.FileField(
+		upload_to="reportes/trabajos/",
+		blank=True,
+		verbose_name="Archivo generado",
+	)
+	mensaje_error = models.TextField(blank=True, verbose_name="Mensaje de error")
+	solicitado_por = models.ForeignKey(
+		User,
+		on_delete=models.SET_NULL,
+		null=True,
+		blank=True,
+		related_name="+",
+		verbose_name="Solicitado por",
+	)
+	fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+	fecha_finalizacion = models.DateTimeField(null=True, blank=True, verbose_name="Fecha de finalización")
+
+	class Meta:
+		verbose_name = "Trabajo de Reporte"
+		verbose_name_plural = "Trabajos de Reportes"
+		ordering = ["-fecha_creacion"]
+		constraints = [
+			models.UniqueConstraint(
+				fields=["clave"],
+				condition=models.Q(estado__in=["pendiente", "procesando"]),
+				name="trabajo_reporte_clave_en_curso",
+			),
+		]
+
+	def __str__(self):
+		return f"Reporte {self.get_formato_display()} #{self.id} - {self.get_estado_display()}"
+
+
+class ResumenDiarioVisitas(models.Model):
+	"""
+	Cantidad de visitas por día de solicitud (hora local), tipo y estado.
+	Se mantiene de forma incremental con signals (ver reportes.resumenes) y
+	se reconstruye con el comando reconstruir_resumenes.
+	"""
+	TIPO_CHOICES = [
+		("interna", "Interna"),
+		("externa", "Externa"),
+	]
+
+	fecha = models.DateField(verbose_name="Fecha de solicitud")
+	tipo = models.CharField(max_length=10, choices=TIPO_CHOICES, verbose_name="Tipo de visita")
+	estado = models.CharField(max_length=30, verbose_name="Estado")
+	total = models.IntegerField(default=0, verbose_name="Total")
+
+	class Meta:
+		verbose_name = "Resumen Diario de Visitas"
+		verbose_name_plural = "Resúmenes Diarios de Visitas"
+		ordering = ["fecha", "tipo", "estado"]
+		constraints = [
+			models.UniqueConstraint(fields=["fecha", "tipo", "estado"], name="resumen_visitas_fecha_tipo_estado_uniq"),
+		]
+
+	def __str__(self):
+		return f"{self.fecha} {self.tipo} {self.estado}: {self.total}"
+
+
+class ResumenHorarioAccesos(models.Model):
+	"""
+	Cantidad de entradas y salidas a la mina por hora (inicio de la hora en
+	zona local). Se mantiene de forma incremental con signals.
+	"""
+	hora = models.DateTimeField(verbose_name="Hora")
+	tipo = models.CharField(max_length=7, verbose_name="Tipo de movimiento")
+	total = models.IntegerField(default=0, verbose_name="Total")
+
+	class Meta:
+		verbose_name = "Resumen Horario de Accesos"
+		verbose_name_plural = "Resúmenes Horarios de Accesos"
+		ordering = ["hora", "tipo"]
+		constraints = [
+			models.UniqueConstraint(fields=["hora", "tipo"], name="resumen_accesos_hora_tipo_uniq"),
+		]
+
+	def __str__(self):
+		return f"{self.hora:%Y-%m-%d %H:00} {self.tipo}: {self.total}"
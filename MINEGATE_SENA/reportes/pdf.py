@@ -0,0 +1,373 @@
+﻿"""
+Generación del reporte general de visitas en PDF con ReportLab.
+
+Los reportes grandes se dividen en bloques de visitas que se renderizan en
+paralelo en un pool de procesos y se concatenan con pypdf. Cada visita
+empieza en una página nueva, de modo que el resultado es el mismo que al
+renderizar todo en un solo documento. El pool es uno por proceso del
+servidor, se crea al primer uso y lo comparten todos los reportes, así que
+el número de procesos hijos nunca pasa de REPORTES_PDF_PROCESOS. Los logos y
+estilos se cargan una vez por proceso.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.utils import timezone
+from pypdf import PdfWriter
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Image, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+
+_COLOR_MARCA = colors.HexColor("#39a900")
+_COLOR_TITULO_VISITA = colors.HexColor("#0f766e")
+_COLOR_BORDE = colors.HexColor("#9ca3af")
+_COLOR_FONDO = colors.HexColor("#f9fafb")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _logos():
+	"""Contenido de los logos SICAM y SENA, o None si alguno no existe."""
+	base_dir = os.path.dirname(__file__)
+	logo_sicam_path = os.path.normpath(os.path.join(base_dir, '..', 'static', 'img', 'Logo_SICAM.png'))
+	logo_sena_candidates = [
+		os.path.normpath(os.path.join(base_dir, '..', 'usuarios', 'static', 'img', 'Blanco SENA.png')),
+		os.path.normpath(os.path.join(base_dir, '..', '..', 'usuarios', 'static', 'img', 'Blanco SENA.png')),
+	]
+	logo_sena_path = next((p for p in logo_sena_candidates if os.path.exists(p)), None)
+	if not os.path.exists(logo_sicam_path) or not logo_sena_path:
+		return None
+
+	with open(logo_sicam_path, "rb") as sicam, open(logo_sena_path, "rb") as sena:
+		return sicam.read(), sena.read()
+
+
+@lru_cache(maxsize=1)
+def estilos_reporte():
+	"""Hoja de estilos del reporte con los estilos propios ya registrados."""
+	estilos = getSampleStyleSheet()
+	estilos.add(ParagraphStyle(
+		'TituloReporteGeneral',
+		parent=estilos['Title'],
+		fontSize=16,
+		textColor=colors.HexColor("#39a900"),
+		spaceAfter=8,
+		alignment=TA_CENTER,
+		fontName='Helvetica-Bold'
+	))
+	estilos.add(ParagraphStyle(
+		'AvisoNoAsistentes',
+		parent=estilos['Normal'],
+		fontSize=9,
+		textColor=colors.HexColor("#666666"),
+		spaceAfter=5,
+	))
+	return estilos
+
+
+def crear_encabezado_pdf(elementos, estilos):
+	"""Crea un encabezado profesional con logos y título"""
+	logos = _logos()
+	
+	logo_data = []
+	if logos:
+		logo_sicam = Image(BytesIO(logos[0]), width=1.2*inch, height=0.8*inch)
+		logo_sena = Image(BytesIO(logos[1]), width=1.2*inch, height=0.8*inch)
+		logo_data = [[
+			logo_sicam,
+			Paragraph("<font color='white'><b>SICAM SENA</b><br/>Centro Minero</font>", estilos["Normal"]),
+			logo_sena,
+		]]
+	else:
+		logo_data = [[
+			"",
+			Paragraph("<font color='white'><b>SISTEMA DE CONTROL DE ACCESO A MINA</b><br/>SENA - Centro Minero</font>", estilos["Normal"]),
+			"",
+		]]
+	
+	tabla_logos = Table(logo_data, colWidths=[1.5*inch, 3*inch, 1.5*inch])
+	tabla_logos.setStyle(TableStyle([
+		('BACKGROUND', (0, 0), (-1, -1), colors.HexColor("#0f6b0f")),
+		('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+		('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+		('TEXTCOLOR', (0, 0), (-1, -1), colors.white),
+		('TOPPADDING', (0, 0), (-1, -1), 8),
+		('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+		('LEFTPADDING', (0, 0), (-1, -1), 10),
+		('RIGHTPADDING', (0, 0), (-1, -1), 10),
+	]))
+	
+	elementos.append(tabla_logos)
+	elementos.append(Spacer(1, 10))
+	elementos.append(Spacer(1, 2))
+	linea = Table([['']]*1, colWidths=[7.5*inch])
+	linea.setStyle(TableStyle([
+		('BACKGROUND', (0, 0), (-1, -1), colors.HexColor("#39a900")),
+		('LEFTPADDING', (0, 0), (-1, -1), 0),
+		('RIGHTPADDING', (0, 0), (-1, -1), 0),
+		('TOPPADDING', (0, 0), (-1, -1), 2),
+		('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+	]))
+	elementos.append(linea)
+	elementos.append(Spacer(1, 10))
+
+
+def _txt(valor, limite=60):
+	texto = str(valor or "-").strip()
+	if len(texto) <= limite:
+		return texto
+	return f"{texto[: limite - 3]}..."
+
+
+def _hora(valor):
+	return valor.strftime("%H:%M") if valor else "-"
+
+
+def _documento(destino):
+	return SimpleDocTemplate(
+		destino,
+		pagesize=landscape(A4),
+		leftMargin=30,
+		rightMargin=30,
+		topMargin=40,
+		bottomMargin=30,
+	)
+
+
+def _elementos_portada(total, generado):
+	estilos = estilos_reporte()
+	elementos = []
+	crear_encabezado_pdf(elementos, estilos)
+	elementos.append(Paragraph("REPORTE GENERAL DE VISITAS", estilos["TituloReporteGeneral"]))
+	elementos.append(Paragraph(
+		f"<i>Generado: {generado} | Total de visitas: {total}</i>",
+		estilos["Normal"],
+	))
+	elementos.append(Spacer(1, 15))
+	return elementos
+
+
+def _elementos_visita(fila, indice):
+	estilos = estilos_reporte()
+	elementos = []
+	titulo_visita = Table(
+		[[f"Visita {indice}: {_txt(fila['nombre'], 80)} ({fila['tipo']} #{fila['id']})"]],
+		colWidths=[780],
+	)
+	titulo_visita.setStyle(
+		TableStyle(
+			[
+				("BACKGROUND", (0, 0), (-1, -1), _COLOR_TITULO_VISITA),
+				("TEXTCOLOR", (0, 0), (-1, -1), colors.white),
+				("FONTNAME", (0, 0), (-1, -1), "Helvetica-Bold"),
+				("FONTSIZE", (0, 0), (-1, -1), 10),
+				("LEFTPADDING", (0, 0), (-1, -1), 10),
+				("TOPPADDING", (0, 0), (-1, -1), 6),
+				("BOTTOMPADDING", (0, 0), (-1, -1), 6),
+			]
+		)
+	)
+	elementos.append(titulo_visita)
+	elementos.append(Spacer(1, 5))
+
+	detalle_visita = [
+		["Nombre/Programa", _txt(fila["nombre"], 90), "Tipo", _txt(fila["tipo"], 20)],
+		["Responsable", _txt(fila["responsable"], 70), "Documento", _txt(fila["documento"], 30)],
+		["Correo", _txt(fila["correo"], 70), "Estado", _txt(fila["estado"], 40)],
+		[
+			"Fecha Solicitud",
+			fila["fecha_solicitud"].strftime("%d/%m/%Y %H:%M"),
+			"Fecha Visita",
+			fila["fecha_visita"].strftime("%d/%m/%Y") if fila["fecha_visita"] else "-",
+		],
+		["Cantidad Visitantes", str(fila["cantidad"]), "Codigo", str(fila["id"])],
+	]
+
+	tabla_visita = Table(detalle_visita, colWidths=[110, 250, 110, 210])
+	tabla_visita.setStyle(
+		TableStyle(
+			[
+				("GRID", (0, 0), (-1, -1), 0.4, _COLOR_BORDE),
+				("BACKGROUND", (0, 0), (0, -1), colors.HexColor("#e5f3dd")),
+				("BACKGROUND", (2, 0), (2, -1), colors.HexColor("#e5f3dd")),
+				("BACKGROUND", (1, 0), (1, -1), _COLOR_FONDO),
+				("BACKGROUND", (3, 0), (3, -1), _COLOR_FONDO),
+				("FONTNAME", (0, 0), (0, -1), "Helvetica-Bold"),
+				("FONTNAME", (2, 0), (2, -1), "Helvetica-Bold"),
+				("FONTSIZE", (0, 0), (-1, -1), 8),
+				("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+				("LEFTPADDING", (0, 0), (-1, -1), 7),
+				("RIGHTPADDING", (0, 0), (-1, -1), 7),
+				("TOPPADDING", (0, 0), (-1, -1), 5),
+				("BOTTOMPADDING", (0, 0), (-1, -1), 5),
+			]
+		)
+	)
+	elementos.append(tabla_visita)
+
+	if fila["asistentes"]:
+		elementos.append(Spacer(1, 7))
+		elementos.append(Paragraph(f"<b>Visitantes Registrados ({len(fila['asistentes'])})</b>", estilos["Heading4"]))
+		elementos.append(Spacer(1, 3))
+
+		data_asistentes = [["Nombre", "Tipo Doc", "Numero Doc", "Correo", "Telefono", "Estado", "Entrada", "Salida"]]
+		for asistente in fila["asistentes"]:
+			data_asistentes.append(
+				[
+					_txt(asistente["nombre"], 30),
+					_txt(asistente["tipo_documento"], 16),
+					_txt(asistente["numero_documento"], 16),
+					_txt(asistente["correo"], 30),
+					_txt(asistente["telefono"], 16),
+					_txt(asistente["estado"], 22),
+					_hora(asistente.get("hora_entrada")),
+					_hora(asistente.get("hora_salida")),
+				]
+			)
+
+		tabla_asistentes = Table(
+			data_asistentes,
+			colWidths=[135, 85, 80, 150, 75, 105, 45, 45],
+			repeatRows=1,
+		)
+		tabla_asistentes.setStyle(
+			TableStyle(
+				[
+					("BACKGROUND", (0, 0), (-1, 0), _COLOR_MARCA),
+					("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+					("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+					("FONTSIZE", (0, 0), (-1, 0), 8),
+					("FONTSIZE", (0, 1), (-1, -1), 7),
+					("GRID", (0, 0), (-1, -1), 0.35, _COLOR_BORDE),
+					("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.HexColor("#fcfcfc"), colors.HexColor("#f3f4f6")]),
+					("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+					("ALIGN", (2, 1), (2, -1), "CENTER"),
+					("LEFTPADDING", (0, 0), (-1, -1), 6),
+					("RIGHTPADDING", (0, 0), (-1, -1), 6),
+					("TOPPADDING", (0, 0), (-1, -1), 4),
+					("BOTTOMPADDING", (0, 0), (-1, -1), 4),
+				]
+			)
+		)
+		elementos.append(tabla_asistentes)
+	else:
+		elementos.append(Spacer(1, 6))
+		elementos.append(Paragraph("<i>No hay visitantes registrados para esta visita aún.</i>", estilos["AvisoNoAsistentes"]))
+	return elementos
+
+
+def _renderizar_bloque(filas, inicio, total, generado):
+	"""
+	Renderiza un bloque de visitas consecutivas (la primera con número
+	inicio) y retorna los bytes del PDF. El bloque que empieza en 1 incluye
+	el encabezado del reporte.
+	"""
+	buffer = BytesIO()
+	elementos = _elementos_portada(total, generado) if inicio == 1 else []
+	for desplazamiento, fila in enumerate(filas):
+		indice = inicio + desplazamiento
+		elementos.extend(_elementos_visita(fila, indice))
+		if desplazamiento < len(filas) - 1:
+			elementos.append(PageBreak())
+		elif indice == total:
+			elementos.append(Spacer(1, 10))
+	_documento(buffer).build(elementos)
+	return buffer.getvalue()
+
+
+def _procesos_disponibles():
+	procesos = getattr(settings, "REPORTES_PDF_PROCESOS", None)
+	return max(int(procesos or os.cpu_count() or 1), 1)
+
+
+def _obtener_pool():
+	"""Pool de procesos compartido del proceso actual; se crea al primer uso."""
+	global _pool
+	with _pool_lock:
+		if _pool is None:
+			# "spawn" evita heredar hilos y conexiones abiertas del proceso
+			# del servidor; los procesos hijos solo usan ReportLab.
+			_pool = ProcessPoolExecutor(
+				max_workers=_procesos_disponibles(),
+				mp_context=multiprocessing.get_context("spawn"),
+			)
+		return _pool
+
+
+def _descartar_pool(pool):
+	"""Descarta un pool roto (por ejemplo, si murió un proceso hijo)."""
+	global _pool
+	with _pool_lock:
+		if _pool is pool:
+			_pool = None
+	pool.shutdown(wait=False, cancel_futures=True)
+
+
+def escribir_reporte_visitas_pdf(filas, destino, progreso=None, procesos=None, visitas_por_bloque=None):
+	"""
+	Escribe el reporte general en destino (archivo o HttpResponse). Si se
+	indica, progreso(procesadas, total) se llama a medida que se terminan
+	las visitas.
+
+	Con más de un bloque de visitas y más de un proceso disponible, los
+	bloques se renderizan en paralelo en el pool compartido y se unen con
+	pypdf; con procesos=1 o un solo bloque, el reporte se renderiza en un
+	solo documento dentro del proceso actual.
+	"""
+	filas = list(filas)
+	total = len(filas)
+	generado = timezone.localtime().strftime('%d/%m/%Y %H:%M')
+	procesos = procesos or _procesos_disponibles()
+	visitas_por_bloque = visitas_por_bloque or getattr(settings, "REPORTES_PDF_VISITAS_POR_BLOQUE", 25)
+
+	if not filas:
+		elementos = _elementos_portada(total, generado)
+		elementos.append(Paragraph("No hay visitas para los filtros seleccionados.", estilos_reporte()["Normal"]))
+		_documento(destino).build(elementos)
+		return
+
+	bloques = [
+		(filas[inicio:inicio + visitas_por_bloque], inicio + 1)
+		for inicio in range(0, total, visitas_por_bloque)
+	]
+	if procesos == 1 or len(bloques) == 1:
+		destino.write(_renderizar_bloque(filas, 1, total, generado))
+		if progreso:
+			progreso(total, total)
+		return
+
+	partes = [None] * len(bloques)
+	procesadas = 0
+	pool = _obtener_pool()
+	try:
+		futuros = {
+			pool.submit(_renderizar_bloque, bloque, inicio, total, generado): posicion
+			for posicion, (bloque, inicio) in enumerate(bloques)
+		}
+		for futuro in as_completed(futuros):
+			posicion = futuros[futuro]
+			partes[posicion] = futuro.result()
+			procesadas += len(bloques[posicion][0])
+			if progreso:
+				progreso(procesadas, total)
+	except BrokenProcessPool:
+		_descartar_pool(pool)
+		raise
+
+	escritor = PdfWriter()
+	for parte in partes:
+		escritor.append(BytesIO(parte))
+	escritor.write(destino)
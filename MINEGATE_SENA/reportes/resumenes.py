@@ -0,0 +1,190 @@
+﻿"""
+Tablas de resumen para tendencias: visitas por día de solicitud, tipo y
+estado, y movimientos de acceso a la mina por hora. Se mantienen de forma
+incremental en cada escritura (signals y el registro por lotes) y se
+reconstruyen desde las tablas originales con reconstruir_resumenes(). Las
+consultas de tendencias leen solo estas tablas, sin importar el tamaño del
+historial.
+"""
+
+from collections import Counter
+from datetime import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Trunc, TruncDate, TruncHour
+from django.utils import timezone
+
+from control_acceso_mina.models import RegistroAccesoMina
+from core.fechas import rango_fechas_local
+from visitaExterna.models import VisitaExterna
+from visitaInterna.models import VisitaInterna
+
+from .models import ResumenDiarioVisitas, ResumenHorarioAccesos
+
+
+AGRUPACIONES = {
+	"dia": "day",
+	"semana": "week",
+	"mes": "month",
+	"anio": "year",
+}
+
+_MODELOS_VISITA = {
+	"interna": VisitaInterna,
+	"externa": VisitaExterna,
+}
+
+
+def _sumar(modelo, claves, delta):
+	"""Suma delta al contador de la fila con esas claves, creándola si no existe."""
+	if not delta:
+		return
+	if modelo.objects.filter(**claves).update(total=F("total") + delta):
+		return
+	try:
+		with transaction.atomic():
+			modelo.objects.create(total=delta, **claves)
+	except IntegrityError:
+		# Otra conexión creó la fila entre el update y el create.
+		modelo.objects.filter(**claves).update(total=F("total") + delta)
+
+
+def inicio_hora(fecha_hora):
+	"""Inicio de la hora local que contiene fecha_hora."""
+	return timezone.localtime(fecha_hora).replace(minute=0, second=0, microsecond=0)
+
+
+def clave_visita(tipo, fecha_solicitud, estado):
+	return {"fecha": timezone.localdate(fecha_solicitud), "tipo": tipo, "estado": estado}
+
+
+def mover_visita(anterior, nueva):
+	"""
+	Ajusta el resumen de visitas: resta la clave anterior y suma la nueva.
+	Cualquiera de las dos puede ser None (creación o borrado).
+	"""
+	if anterior == nueva:
+		return
+	if anterior:
+		_sumar(ResumenDiarioVisitas, anterior, -1)
+	if nueva:
+		_sumar(ResumenDiarioVisitas, nueva, 1)
+
+
+def registrar_accesos(registros, signo=1):
+	"""
+	Suma (o resta, con signo=-1) los movimientos al resumen horario. Se llama
+	por cada registro desde los signals y una vez por lote tras bulk_create.
+
+	La escritura se difiere hasta que confirme la transacción del registro y
+	cada UPDATE se confirma por sí solo: todos los escaneos de una misma hora
+	actualizan la misma fila y, dentro de la transacción del escaneo, su
+	bloqueo los serializaría aunque sean de personas distintas. Si el proceso
+	cae entre ambas escrituras, reconstruir_resumenes() corrige el conteo.
+	"""
+	conteos = Counter((inicio_hora(r.fecha_hora), r.tipo) for r in registros)
+	if conteos:
+		transaction.on_commit(lambda: _sumar_accesos(conteos, signo))
+
+
+def _sumar_accesos(conteos, signo):
+	for (hora, tipo), total in conteos.items():
+		_sumar(ResumenHorarioAccesos, {"hora": hora, "tipo": tipo}, signo * total)
+
+
+def reconstruir_resumenes():
+	"""
+	Reconstruye ambas tablas de resumen desde las visitas y el historial de
+	accesos. Retorna la cantidad de filas de resumen creadas por tabla.
+	"""
+	with transaction.atomic():
+		ResumenDiarioVisitas.objects.all().delete()
+		ResumenHorarioAccesos.objects.all().delete()
+
+		resumen_visitas = []
+		for tipo, modelo in _MODELOS_VISITA.items():
+			conteos = (
+				modelo.objects.annotate(fecha=TruncDate("fecha_solicitud"))
+				.values("fecha", "estado")
+				.annotate(total=Count("id"))
+				.order_by()
+			)
+			resumen_visitas.extend(
+				ResumenDiarioVisitas(fecha=c["fecha"], tipo=tipo, estado=c["estado"], total=c["total"])
+				for c in conteos
+			)
+		ResumenDiarioVisitas.objects.bulk_create(resumen_visitas, batch_size=1000)
+
+		conteos = (
+			RegistroAccesoMina.objects.annotate(hora=TruncHour("fecha_hora"))
+			.values("hora", "tipo")
+			.annotate(total=Count("id"))
+			.order_by()
+		)
+		resumen_accesos = [
+			ResumenHorarioAccesos(hora=c["hora"], tipo=c["tipo"], total=c["total"])
+			for c in conteos
+		]
+		ResumenHorarioAccesos.objects.bulk_create(resumen_accesos, batch_size=1000)
+
+	return {"visitas": len(resumen_visitas), "accesos": len(resumen_accesos)}
+
+
+def _periodo(valor):
+	if isinstance(valor, datetime):
+		valor = timezone.localtime(valor).date()
+	return valor.isoformat()
+
+
+def obtener_tendencias(desde, hasta, agrupar="dia"):
+	"""
+	Tendencias entre las fechas desde y hasta (inclusive) agrupadas por día,
+	semana, mes o año: visitas solicitadas por tipo y estado, y entradas y
+	salidas de la mina. Son dos consultas sobre las tablas de resumen.
+	"""
+	tipo_periodo = AGRUPACIONES[agrupar]
+
+	visitas = {}
+	conteos = (
+		ResumenDiarioVisitas.objects.filter(fecha__range=(desde, hasta))
+		.annotate(periodo=Trunc("fecha", tipo_periodo))
+		.values("periodo", "tipo", "estado")
+		.annotate(suma=Sum("total"))
+		.order_by("periodo")
+	)
+	for c in conteos:
+		if not c["suma"]:
+			continue
+		periodo = _periodo(c["periodo"])
+		fila = visitas.setdefault(
+			periodo,
+			{"periodo": periodo, "interna": 0, "externa": 0, "total": 0, "por_estado": {}},
+		)
+		fila[c["tipo"]] += c["suma"]
+		fila["total"] += c["suma"]
+		fila["por_estado"][c["estado"]] = fila["por_estado"].get(c["estado"], 0) + c["suma"]
+
+	inicio, fin = rango_fechas_local(desde, hasta)
+	accesos = {}
+	conteos = (
+		ResumenHorarioAccesos.objects.filter(hora__gte=inicio, hora__lt=fin)
+		.annotate(periodo=Trunc("hora", tipo_periodo))
+		.values("periodo", "tipo")
+		.annotate(suma=Sum("total"))
+		.order_by("periodo")
+	)
+	for c in conteos:
+		if not c["suma"]:
+			continue
+		periodo = _periodo(c["periodo"])
+		fila = accesos.setdefault(periodo, {"periodo": periodo, "entradas": 0, "salidas": 0})
+		fila["entradas" if c["tipo"] == "ENTRADA" else "salidas"] += c["suma"]
+
+	return {
+		"desde": desde.isoformat(),
+		"hasta": hasta.isoformat(),
+		"agrupar": agrupar,
+		"visitas": list(visitas.values()),
+		"accesos": list(accesos.values()),
+	}
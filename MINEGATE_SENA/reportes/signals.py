@@ -0,0 +1,80 @@
+﻿"""
+Signals que incrementan la versión de los datos de los reportes cuando cambian
+las visitas, sus asistentes o los registros de acceso (horas de entrada y
+salida). Las escrituras con bulk_create o update() no disparan signals: esos
+caminos deben llamar a incrementar_version_datos.
+
+También mantienen las tablas de resumen (reportes.resumenes): el de visitas
+dentro de la misma transacción de la escritura y el horario de accesos al
+confirmarse, para no bloquear los escaneos (ver registrar_accesos).
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from control_acceso_mina.models import RegistroAccesoMina
+from visitaExterna.models import AsistenteVisitaExterna, VisitaExterna
+from visitaInterna.models import AsistenteVisitaInterna, VisitaInterna
+
+from .resumenes import clave_visita, mover_visita, registrar_accesos
+from .versiones import incrementar_version_datos
+
+
+@receiver(post_save, sender=VisitaInterna)
+@receiver(post_delete, sender=VisitaInterna)
+@receiver(post_save, sender=VisitaExterna)
+@receiver(post_delete, sender=VisitaExterna)
+@receiver(post_save, sender=AsistenteVisitaInterna)
+@receiver(post_delete, sender=AsistenteVisitaInterna)
+@receiver(post_save, sender=AsistenteVisitaExterna)
+@receiver(post_delete, sender=AsistenteVisitaExterna)
+@receiver(post_save, sender=RegistroAccesoMina)
+@receiver(post_delete, sender=RegistroAccesoMina)
+def datos_reporte_modificados(sender, instance, **kwargs):
+	transaction.on_commit(incrementar_version_datos)
+
+
+_TIPOS_VISITA = {VisitaInterna: "interna", VisitaExterna: "externa"}
+
+
+@receiver(pre_save, sender=VisitaInterna)
+@receiver(pre_save, sender=VisitaExterna)
+def guardar_resumen_anterior(sender, instance, update_fields=None, **kwargs):
+	"""Recuerda fecha y estado guardados para mover la visita en el resumen."""
+	instance._resumen_anterior = None
+	if instance.pk is None:
+		return
+	if update_fields is not None and not {"estado", "fecha_solicitud"} & set(update_fields):
+		instance._resumen_anterior = False
+		return
+	anterior = sender.objects.filter(pk=instance.pk).values_list("fecha_solicitud", "estado").first()
+	if anterior:
+		instance._resumen_anterior = clave_visita(_TIPOS_VISITA[sender], *anterior)
+
+
+@receiver(post_save, sender=VisitaInterna)
+@receiver(post_save, sender=VisitaExterna)
+def actualizar_resumen_visita(sender, instance, **kwargs):
+	anterior = instance.__dict__.pop("_resumen_anterior", None)
+	if anterior is False:
+		return
+	mover_visita(anterior, clave_visita(_TIPOS_VISITA[sender], instance.fecha_solicitud, instance.estado))
+
+
+@receiver(post_delete, sender=VisitaInterna)
+@receiver(post_delete, sender=VisitaExterna)
+def descontar_resumen_visita(sender, instance, **kwargs):
+	mover_visita(clave_visita(_TIPOS_VISITA[sender], instance.fecha_solicitud, instance.estado), None)
+
+
+@receiver(post_save, sender=RegistroAccesoMina)
+def sumar_resumen_acceso(sender, instance, created, **kwargs):
+	# El historial de accesos no se edita: solo cuentan altas y borrados.
+	if created:
+		registrar_accesos([instance])
+
+
+@receiver(post_delete, sender=RegistroAccesoMina)
+def descontar_resumen_acceso(sender, instance, **kwargs):
+	registrar_accesos([instance], signo=-1)
@@ -0,0 +1,73 @@
+/**
+ * Descarga de reportes generales mediante trabajos en segundo plano.
+ *
+ * Los enlaces con data-reporte-trabajo="pdf|xlsx" solicitan el trabajo a
+ * data-url-trabajo, consultan su progreso y descargan el archivo al terminar.
+ * Si el servidor no responde como se espera, se usa el enlace directo.
+ */
+(function () {
+  if (window.reportesTrabajosIniciado) return;
+  window.reportesTrabajosIniciado = true;
+
+  const INTERVALO_CONSULTA_MS = 1500;
+
+  const obtenerCookie = (nombre) => {
+    const valor = document.cookie
+      .split(';')
+      .map((parte) => parte.trim())
+      .find((parte) => parte.startsWith(`${nombre}=`));
+    return valor ? decodeURIComponent(valor.slice(nombre.length + 1)) : '';
+  };
+
+  const esperar = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+  const consultarHastaTerminar = async (datos, alAvanzar) => {
+    let trabajo = datos;
+    while (trabajo.estado === 'pendiente' || trabajo.estado === 'procesando') {
+      alAvanzar(trabajo);
+      await esperar(INTERVALO_CONSULTA_MS);
+      const response = await fetch(trabajo.url_estado, { credentials: 'same-origin' });
+      if (!response.ok) throw new Error(response.statusText);
+      trabajo = await response.json();
+    }
+    return trabajo;
+  };
+
+  document.addEventListener('click', async (event) => {
+    const enlace = event.target.closest('a[data-reporte-trabajo]');
+    if (!enlace || enlace.dataset.generando === '1') return;
+    event.preventDefault();
+
+    const contenidoOriginal = enlace.innerHTML;
+    enlace.dataset.generando = '1';
+    enlace.setAttribute('aria-busy', 'true');
+    const mostrarProgreso = (trabajo) => {
+      enlace.textContent = `Generando... ${trabajo.progreso || 0}%`;
+    };
+
+    try {
+      const cuerpo = new FormData();
+      cuerpo.append('formato', enlace.dataset.reporteTrabajo);
+      const response = await fetch(enlace.dataset.urlTrabajo, {
+        method: 'POST',
+        body: cuerpo,
+        headers: { 'X-CSRFToken': obtenerCookie('csrftoken') },
+        credentials: 'same-origin'
+      });
+      if (!response.ok) throw new Error(response.statusText);
+
+      const trabajo = await consultarHastaTerminar(await response.json(), mostrarProgreso);
+      if (trabajo.estado !== 'completado') {
+        window.alert(trabajo.mensaje || 'No fue posible generar el reporte.');
+        return;
+      }
+      window.location.href = trabajo.url_descarga;
+    } catch (error) {
+      window.location.href = enlace.href;
+    } finally {
+      enlace.innerHTML = contenidoOriginal;
+      enlace.dataset.generando = '';
+      enlace.removeAttribute('aria-busy');
+    }
+  });
+})();
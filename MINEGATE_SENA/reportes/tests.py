@@ -1,2 +1,724 @@
-﻿from django.test import TestCase
+﻿import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+from io import BytesIO
+from unittest import mock
+from urllib.parse import urlencode
 
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+from pypdf import PdfReader
+
+from control_acceso_mina.models import RegistroAccesoMina
+from core.versiones import cache_coordinacion
+from reportes.datos import (
+	horarios_acceso,
+	iterar_filas,
+	obtener_filas,
+	paginar_filas,
+	paginar_filas_en_cache,
+)
+from reportes.excel import CONTENT_TYPE_XLSX
+from reportes.models import ResumenDiarioVisitas, ResumenHorarioAccesos, TrabajoReporte
+from reportes import pdf, trabajos
+from reportes.pdf import escribir_reporte_visitas_pdf
+from reportes.resumenes import obtener_tendencias, reconstruir_resumenes, registrar_accesos
+from reportes.trabajos import clave_trabajo, ejecutar_trabajo, solicitar_reporte
+from visitaExterna.models import AsistenteVisitaExterna, VisitaExterna
+from visitaInterna.models import AsistenteVisitaInterna, VisitaInterna
+
+
+def _crear_visita_interna(**kwargs):
+	datos = {
+		"estado": "aprobada_final",
+		"nombre_programa": "Tecnologia en Minas",
+		"numero_ficha": 12345,
+		"responsable": "Instructor Interno",
+		"tipo_documento_responsable": "CC",
+		"documento_responsable": "10001",
+		"correo_responsable": "interno@example.com",
+		"telefono_responsable": "3000000000",
+		"cantidad_aprendices": 20,
+	}
+	datos.update(kwargs)
+	return VisitaInterna.objects.create(**datos)
+
+
+def _crear_visita_externa(**kwargs):
+	datos = {
+		"estado": "aprobada_final",
+		"nombre": "Colegio Minero",
+		"nombre_responsable": "Docente Externo",
+		"tipo_documento_responsable": "CC",
+		"documento_responsable": "50005",
+		"correo_responsable": "externo@example.com",
+		"telefono_responsable": "3100000000",
+		"cantidad_visitantes": 10,
+	}
+	datos.update(kwargs)
+	return VisitaExterna.objects.create(**datos)
+
+
+class ReporteExcelTests(TestCase):
+	def setUp(self):
+		self.admin = User.objects.create_user(username="admin", password="1234", is_staff=True)
+		self.client.force_login(self.admin)
+		ahora = timezone.now()
+		self.interna = _crear_visita_interna(
+			fecha_solicitud=ahora - timedelta(days=3),
+			fecha_visita=timezone.localdate(),
+		)
+		self.externa = _crear_visita_externa(fecha_solicitud=ahora - timedelta(days=1))
+		AsistenteVisitaInterna.objects.create(
+			visita=self.interna, nombre_completo="Aprendiz Uno", tipo_documento="CC", numero_documento="20002",
+		)
+		AsistenteVisitaExterna.objects.create(
+			visita=self.externa, nombre_completo="Visitante Uno", tipo_documento="CC", numero_documento="60006",
+		)
+
+	def _abrir(self, response):
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response["Content-Type"], CONTENT_TYPE_XLSX)
+		return load_workbook(BytesIO(b"".join(response.streaming_content)))
+
+	def _descargar(self, **params):
+		return self._abrir(self.client.get(reverse("reportes:descargar_excel"), params))
+
+	def test_excel_tiene_una_hoja_por_tipo_y_hoja_de_asistentes(self):
+		libro = self._descargar()
+		self.assertEqual(libro.sheetnames, ["Visitas internas", "Visitas externas", "Asistentes"])
+
+		internas = list(libro["Visitas internas"].iter_rows(min_row=2, values_only=True))
+		self.assertEqual(len(internas), 1)
+		self.assertEqual(internas[0][0], self.interna.id)
+		self.assertEqual(internas[0][1], "Tecnologia en Minas")
+		self.assertEqual(internas[0][6], 20)
+		self.assertIsInstance(internas[0][7], datetime)
+		self.assertEqual(internas[0][8].date(), timezone.localdate())
+
+		asistentes = list(libro["Asistentes"].iter_rows(min_row=2, values_only=True))
+		self.assertEqual([fila[3] for fila in asistentes], ["Visitante Uno", "Aprendiz Uno"])
+
+	def test_excel_respeta_filtros_de_tipo_y_fecha(self):
+		libro = self._descargar(tipo="interna")
+		self.assertEqual(libro["Visitas externas"].max_row, 1)
+
+		desde = (timezone.localdate() - timedelta(days=2)).isoformat()
+		libro = self._descargar(fecha_desde=desde)
+		self.assertEqual(libro["Visitas internas"].max_row, 1)
+		self.assertEqual(libro["Visitas externas"]["B2"].value, "Colegio Minero")
+
+	def test_excel_individual_incluye_horarios_de_acceso(self):
+		RegistroAccesoMina.objects.create(
+			documento="20002",
+			nombre_completo="Aprendiz Uno",
+			categoria="Visitante Interno",
+			visita_tipo="interna",
+			visita_id=self.interna.id,
+			tipo="ENTRADA",
+		)
+		response = self.client.get(
+			reverse("reportes:descargar_excel_individual", args=["interna", self.interna.id])
+		)
+		libro = self._abrir(response)
+		self.assertEqual(libro.sheetnames, ["Visita", "Asistentes"])
+
+		fila = next(libro["Asistentes"].iter_rows(min_row=2, values_only=True))
+		self.assertEqual(fila[0], "Aprendiz Uno")
+		self.assertIsInstance(fila[5], datetime)
+		self.assertIsNone(fila[6])
+
+
+FILTROS_TODAS = {"tipo": "todas", "estado": "", "fecha_desde": None, "fecha_hasta": None}
+
+# Las pruebas que cuentan consultas usan una caché en memoria: con la caché por
+# defecto en base de datos cada lectura de la caché también es una consulta.
+CACHE_EN_MEMORIA = {
+	"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+	"coordinacion": {
+		"BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+		"LOCATION": "coordinacion",
+	},
+}
+
+
+def _sembrar_visitas(cantidad):
+	# bulk_create evita los signals de notificación por correo y QR.
+	ahora = timezone.now()
+	internas = VisitaInterna.objects.bulk_create([
+		VisitaInterna(
+			estado="aprobada_final",
+			nombre_programa=f"Programa {i}",
+			numero_ficha=i,
+			responsable="Instructor",
+			tipo_documento_responsable="CC",
+			documento_responsable=str(10000 + i),
+			correo_responsable="interno@example.com",
+			telefono_responsable="3000000000",
+			cantidad_aprendices=2,
+			fecha_solicitud=ahora - timedelta(hours=2 * i),
+		)
+		for i in range(cantidad)
+	])
+	externas = VisitaExterna.objects.bulk_create([
+		VisitaExterna(
+			estado="pendiente",
+			nombre=f"Colegio {i}",
+			nombre_responsable="Docente",
+			tipo_documento_responsable="CC",
+			documento_responsable=str(50000 + i),
+			correo_responsable="externo@example.com",
+			telefono_responsable="3100000000",
+			cantidad_visitantes=2,
+			fecha_solicitud=ahora - timedelta(hours=2 * i + 1),
+		)
+		for i in range(cantidad)
+	])
+	if internas[0].pk is None:
+		internas = list(VisitaInterna.objects.all())
+		externas = list(VisitaExterna.objects.all())
+	AsistenteVisitaInterna.objects.bulk_create([
+		AsistenteVisitaInterna(
+			visita=visita, nombre_completo=f"Aprendiz {j}", tipo_documento="TI", numero_documento=f"{visita.pk}-{j}",
+		)
+		for visita in internas
+		for j in range(2)
+	])
+	AsistenteVisitaExterna.objects.bulk_create([
+		AsistenteVisitaExterna(
+			visita=visita, nombre_completo=f"Visitante {j}", tipo_documento="CC", numero_documento=f"{visita.pk}-{j}",
+		)
+		for visita in externas
+		for j in range(2)
+	])
+
+
+class ReporteDatosTests(TestCase):
+	def test_obtener_filas_usa_consultas_fijas(self):
+		# Visitas de ambos tipos en una consulta a la vista, y asistentes y
+		# horarios de acceso por tipo.
+		_sembrar_visitas(3)
+		with self.assertNumQueries(5):
+			obtener_filas(FILTROS_TODAS)
+
+		_sembrar_visitas(30)
+		with self.assertNumQueries(5):
+			filas = obtener_filas(FILTROS_TODAS)
+
+		self.assertEqual(len(filas), 66)
+		self.assertTrue(all(len(fila["asistentes"]) == 2 for fila in filas))
+		fechas = [fila["fecha_solicitud"] for fila in filas]
+		self.assertEqual(fechas, sorted(fechas, reverse=True))
+
+	def test_obtener_filas_resuelve_etiquetas_de_choices(self):
+		_sembrar_visitas(1)
+		filas = {fila["tipo"]: fila for fila in obtener_filas(FILTROS_TODAS)}
+		self.assertEqual(filas["Externa"]["estado"], "Pendiente")
+		self.assertEqual(filas["Interna"]["asistentes"][0]["tipo_documento"], "Tarjeta de Identidad")
+
+	def test_iterar_filas_consulta_asistentes_por_bloque(self):
+		_sembrar_visitas(10)
+		# Una consulta de visitas y, por cada bloque de 4 (con ambos tipos),
+		# una de asistentes y una de horarios de acceso por tipo.
+		with self.assertNumQueries(1 + 5 * 2 * 2):
+			filas = list(iterar_filas(FILTROS_TODAS, chunk_size=4))
+
+		self.assertEqual(len(filas), 20)
+		self.assertEqual([fila["tipo"] for fila in filas[:2]], ["Interna", "Externa"])
+		self.assertTrue(all(len(fila["asistentes"]) == 2 for fila in filas))
+
+
+class ReportePaginacionTests(TestCase):
+	def setUp(self):
+		cache.clear()
+
+	def _recorrer(self, tamano):
+		paginas = []
+		pagina = paginar_filas(FILTROS_TODAS, tamano=tamano)
+		paginas.append(pagina)
+		while pagina["cursor_siguiente"]:
+			pagina = paginar_filas(FILTROS_TODAS, cursor=pagina["cursor_siguiente"], tamano=tamano)
+			paginas.append(pagina)
+		return paginas
+
+	def test_paginas_recorren_el_listado_completo_en_orden(self):
+		_sembrar_visitas(7)
+		esperado = [(fila["tipo"], fila["id"]) for fila in obtener_filas(FILTROS_TODAS)]
+
+		paginas = self._recorrer(tamano=3)
+		obtenido = [(fila["tipo"], fila["id"]) for pagina in paginas for fila in pagina["filas"]]
+		self.assertEqual(obtenido, esperado)
+		self.assertEqual(len(paginas), 5)
+		self.assertTrue(all(pagina["total"] == 14 for pagina in paginas))
+		self.assertIsNone(paginas[0]["cursor_anterior"])
+		self.assertTrue(all(fila["total_asistentes"] == 2 for fila in paginas[0]["filas"]))
+
+		anterior = paginar_filas(FILTROS_TODAS, cursor=paginas[2]["cursor_anterior"], anterior=True, tamano=3)
+		self.assertEqual(anterior["filas"], paginas[1]["filas"])
+		primera = paginar_filas(FILTROS_TODAS, cursor=paginas[1]["cursor_anterior"], anterior=True, tamano=3)
+		self.assertEqual(primera["filas"], paginas[0]["filas"])
+		self.assertIsNone(primera["cursor_anterior"])
+
+	def test_desempata_visitas_con_la_misma_fecha_de_solicitud(self):
+		_sembrar_visitas(4)
+		fecha = timezone.now()
+		VisitaInterna.objects.update(fecha_solicitud=fecha)
+		VisitaExterna.objects.update(fecha_solicitud=fecha)
+
+		paginas = self._recorrer(tamano=3)
+		obtenido = [(fila["tipo"], fila["id"]) for pagina in paginas for fila in pagina["filas"]]
+		self.assertEqual(len(obtenido), 8)
+		self.assertEqual(len(set(obtenido)), 8)
+
+	def test_pagina_usa_consultas_fijas_y_cursor_invalido_vuelve_al_inicio(self):
+		_sembrar_visitas(30)
+		# Conteo y página sobre la vista, y un conteo de asistentes por tipo.
+		with self.assertNumQueries(4):
+			pagina = paginar_filas(FILTROS_TODAS, cursor="no-valido", tamano=10)
+		self.assertEqual(len(pagina["filas"]), 10)
+		self.assertIsNone(pagina["cursor_anterior"])
+
+	def test_vista_de_asistentes_por_visita(self):
+		_sembrar_visitas(1)
+		admin = User.objects.create_user(username="admin", password="1234", is_staff=True)
+		self.client.force_login(admin)
+		visita = VisitaInterna.objects.get()
+
+		response = self.client.get(reverse("reportes:asistentes_visita", args=["interna", visita.id]))
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual([a["nombre"] for a in response.json()["asistentes"]], ["Aprendiz 0", "Aprendiz 1"])
+
+		response = self.client.get(reverse("reportes:index"))
+		self.assertContains(response, "Programa 0")
+		self.assertContains(response, reverse("reportes:asistentes_visita", args=["interna", visita.id]))
+
+	def test_panel_administrativo_pagina_la_seccion_de_reportes(self):
+		_sembrar_visitas(51)
+		admin = User.objects.create_superuser(username="root", password="1234", email="root@example.com")
+		self.client.force_login(admin)
+		url = reverse("core:panel_administrativo_seccion", args=["reportes"])
+
+		response = self.client.get(url, {"tipo": "todas"})
+		self.assertEqual(response.status_code, 200)
+		pagina = response.context["pagina_reportes"]
+		self.assertEqual(len(response.context["filas_reportes"]), 100)
+		self.assertEqual(response.context["total_filas_reportes"], 102)
+		self.assertContains(response, "Siguientes")
+
+		response = self.client.get(url, {"tipo": "todas", "cursor": pagina["cursor_siguiente"]})
+		self.assertEqual(len(response.context["filas_reportes"]), 2)
+		self.assertEqual(response.context["query_string_reportes"], "tipo=todas")
+
+
+class TrabajoReporteTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.media = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+		ajustes = override_settings(MEDIA_ROOT=self.media)
+		ajustes.enable()
+		self.addCleanup(ajustes.disable)
+
+		self.admin = User.objects.create_user(username="admin", password="1234", is_staff=True)
+		self.client.force_login(self.admin)
+		_sembrar_visitas(3)
+
+	def _solicitar(self, formato="pdf", **params):
+		url = reverse("reportes:solicitar_trabajo")
+		if params:
+			url = f"{url}?{urlencode(params)}"
+		with self.captureOnCommitCallbacks(execute=False):
+			response = self.client.post(url, {"formato": formato})
+		return response
+
+	def test_trabajo_genera_el_archivo_y_se_descarga(self):
+		response = self._solicitar("xlsx", tipo="interna")
+		self.assertEqual(response.status_code, 202)
+		datos = response.json()
+		self.assertEqual(datos["estado"], "pendiente")
+
+		ejecutar_trabajo(datos["id"])
+
+		datos = self.client.get(datos["url_estado"]).json()
+		self.assertEqual(datos["estado"], "completado")
+		self.assertEqual(datos["progreso"], 100)
+
+		response = self.client.get(datos["url_descarga"])
+		libro = load_workbook(BytesIO(b"".join(response.streaming_content)))
+		self.assertEqual(libro["Visitas internas"].max_row, 4)
+		self.assertEqual(libro["Visitas externas"].max_row, 1)
+
+	@override_settings(CACHES=CACHE_EN_MEMORIA)
+	def test_reporte_identico_se_sirve_del_archivo_guardado(self):
+		primero = self._solicitar("pdf", estado="aprobada_final").json()
+		ejecutar_trabajo(primero["id"])
+
+		filtros = {"tipo": "todas", "estado": "aprobada_final", "fecha_desde": None, "fecha_hasta": None}
+		# Marca de datos (visitas por tipo y último registro) y búsqueda del trabajo.
+		with self.assertNumQueries(4):
+			trabajo = solicitar_reporte("pdf", filtros)
+		self.assertEqual(trabajo.id, primero["id"])
+
+		response = self._solicitar("pdf", estado="aprobada_final")
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.json()["estado"], "completado")
+
+		otro_filtro = self._solicitar("pdf", estado="pendiente").json()
+		self.assertNotEqual(otro_filtro["id"], primero["id"])
+
+	def test_cambio_de_datos_invalida_el_archivo_guardado(self):
+		primero = self._solicitar("pdf").json()
+		ejecutar_trabajo(primero["id"])
+
+		with self.captureOnCommitCallbacks(execute=True):
+			_crear_visita_externa()
+
+		segundo = self._solicitar("pdf").json()
+		self.assertNotEqual(segundo["id"], primero["id"])
+		self.assertEqual(segundo["estado"], "pendiente")
+
+	def test_registros_nuevos_invalidan_el_archivo_aunque_la_version_no_cambie(self):
+		primero = self._solicitar("pdf").json()
+		ejecutar_trabajo(primero["id"])
+
+		# bulk_create no dispara signals: la versión en caché queda igual, como
+		# cuando el registro lo hace otro proceso con una caché local.
+		visita = VisitaInterna.objects.order_by("id").first()
+		RegistroAccesoMina.objects.bulk_create([
+			RegistroAccesoMina(
+				documento="1", nombre_completo="Persona", categoria="Visitante Interno",
+				visita_tipo="interna", visita_id=visita.id, tipo="ENTRADA",
+			),
+		])
+
+		segundo = self._solicitar("pdf").json()
+		self.assertNotEqual(segundo["id"], primero["id"])
+
+	def test_reiniciar_la_cache_no_reutiliza_claves_anteriores(self):
+		claves = {clave_trabajo("pdf", FILTROS_TODAS)}
+		with self.captureOnCommitCallbacks(execute=True):
+			_crear_visita_externa()
+		claves.add(clave_trabajo("pdf", FILTROS_TODAS))
+
+		# Reinicio del servidor: la caché (y el contador de versión) se pierde.
+		with mock.patch("core.versiones.time.time", return_value=time.time() + 1):
+			cache_coordinacion().clear()
+			self.assertNotIn(clave_trabajo("pdf", FILTROS_TODAS), claves)
+
+	def test_trabajo_en_curso_no_se_duplica(self):
+		primero = self._solicitar("pdf").json()
+		segundo = self._solicitar("pdf").json()
+		self.assertEqual(primero["id"], segundo["id"])
+		self.assertEqual(TrabajoReporte.objects.count(), 1)
+
+	def test_solicitudes_simultaneas_comparten_el_trabajo(self):
+		primero = self._solicitar("pdf", estado="aprobada_final").json()
+		filtros = {"tipo": "todas", "estado": "aprobada_final", "fecha_desde": None, "fecha_hasta": None}
+		self.assertEqual(TrabajoReporte.objects.get().clave, clave_trabajo("pdf", filtros))
+
+		# La segunda petición consultó antes de que existiera el primer trabajo.
+		vigente = trabajos._trabajo_vigente
+		respuestas = [lambda clave: None, vigente]
+		with mock.patch("reportes.trabajos._trabajo_vigente", side_effect=lambda clave: respuestas.pop(0)(clave)):
+			with self.captureOnCommitCallbacks(execute=False) as callbacks:
+				segundo = solicitar_reporte("pdf", filtros)
+		self.assertEqual(segundo.id, primero["id"])
+		self.assertEqual(TrabajoReporte.objects.count(), 1)
+		self.assertEqual(callbacks, [])
+
+	def test_descarga_directa_pequena_se_renderiza_en_la_peticion(self):
+		with mock.patch("reportes.pdf._obtener_pool") as obtener_pool:
+			response = self.client.get(reverse("reportes:descargar_pdf"))
+		self.assertEqual(response["Content-Type"], "application/pdf")
+		self.assertTrue(response.content.startswith(b"%PDF"))
+		obtener_pool.assert_not_called()
+		self.assertFalse(TrabajoReporte.objects.exists())
+
+	@override_settings(REPORTES_PDF_MAXIMO_DIRECTO=2)
+	def test_descarga_directa_grande_pasa_a_trabajo(self):
+		with mock.patch("reportes.views.obtener_filas") as obtener_filas_vista:
+			with self.captureOnCommitCallbacks(execute=False):
+				response = self.client.get(reverse("reportes:descargar_pdf"))
+		# El conteo decide; las filas se arman solo en el trabajo.
+		obtener_filas_vista.assert_not_called()
+		self.assertEqual(response.status_code, 202)
+		datos = response.json()
+		self.assertEqual(datos["formato"], "pdf")
+
+		ejecutar_trabajo(datos["id"])
+		response = self.client.get(reverse("reportes:descargar_pdf"))
+		self.assertRedirects(
+			response,
+			reverse("reportes:descargar_trabajo", args=[datos["id"]]),
+			fetch_redirect_response=False,
+		)
+
+
+class ReportePdfParaleloTests(TestCase):
+	def _filas(self, cantidad):
+		_sembrar_visitas(cantidad)
+		return obtener_filas(FILTROS_TODAS)
+
+	def _paginas(self, contenido):
+		return [pagina.extract_text() for pagina in PdfReader(BytesIO(contenido)).pages]
+
+	def test_bloques_en_paralelo_equivalen_al_documento_secuencial(self):
+		filas = self._filas(5)
+		secuencial = BytesIO()
+		escribir_reporte_visitas_pdf(filas, secuencial, procesos=1)
+
+		avances = []
+		paralelo = BytesIO()
+		escribir_reporte_visitas_pdf(
+			filas, paralelo, procesos=2, visitas_por_bloque=3,
+			progreso=lambda procesadas, total: avances.append((procesadas, total)),
+		)
+
+		paginas_secuencial = self._paginas(secuencial.getvalue())
+		paginas_paralelo = self._paginas(paralelo.getvalue())
+		self.assertEqual(len(paginas_paralelo), len(paginas_secuencial))
+		self.assertIn("REPORTE GENERAL DE VISITAS", paginas_paralelo[0])
+		self.assertIn("Total de visitas: 10", paginas_paralelo[0])
+		for indice, (fila, pagina) in enumerate(zip(filas, paginas_paralelo), start=1):
+			self.assertIn(f"Visita {indice}: {fila['nombre']}", pagina)
+		self.assertEqual(sorted(avances)[-1], (10, 10))
+
+	def test_reportes_sucesivos_comparten_el_pool(self):
+		filas = self._filas(3)
+		escribir_reporte_visitas_pdf(filas, BytesIO(), procesos=2, visitas_por_bloque=3)
+		pool = pdf._obtener_pool()
+		escribir_reporte_visitas_pdf(filas, BytesIO(), procesos=2, visitas_por_bloque=3)
+		self.assertIs(pdf._obtener_pool(), pool)
+
+	def test_reporte_sin_visitas(self):
+		destino = BytesIO()
+		escribir_reporte_visitas_pdf([], destino, procesos=2)
+		self.assertIn("No hay visitas", self._paginas(destino.getvalue())[0])
+
+
+class HorariosAccesoTests(TestCase):
+	def _registrar(self, visita_id, documento, tipo, minutos, visita_tipo="interna"):
+		RegistroAccesoMina.objects.create(
+			documento=documento,
+			nombre_completo="Persona",
+			categoria="Visitante Interno",
+			visita_tipo=visita_tipo,
+			visita_id=visita_id,
+			tipo=tipo,
+			fecha_hora=self.inicio + timedelta(minutes=minutos),
+		)
+
+	def setUp(self):
+		self.inicio = timezone.now().replace(microsecond=0) - timedelta(hours=5)
+
+	def test_primera_entrada_y_ultima_salida_por_persona_y_visita(self):
+		self._registrar(1, "100", "ENTRADA", 0)
+		self._registrar(1, "100", "SALIDA", 30)
+		self._registrar(1, "100", "ENTRADA", 60)
+		self._registrar(1, "100", "SALIDA", 90)
+		self._registrar(1, "200", "ENTRADA", 10)
+		self._registrar(2, "100", "ENTRADA", 120)
+		self._registrar(1, "300", "ENTRADA", 5, visita_tipo="externa")
+
+		with self.assertNumQueries(1):
+			horarios = horarios_acceso("interna", [1, 2])
+
+		self.assertEqual(set(horarios), {(1, "100"), (1, "200"), (2, "100")})
+		self.assertEqual(horarios[(1, "100")], (self.inicio, self.inicio + timedelta(minutes=90)))
+		self.assertEqual(horarios[(1, "200")], (self.inicio + timedelta(minutes=10), None))
+		self.assertEqual(horarios[(2, "100")][0], self.inicio + timedelta(minutes=120))
+
+	def test_filas_del_reporte_incluyen_horarios_de_asistentes(self):
+		_sembrar_visitas(2)
+		visita = VisitaInterna.objects.order_by("id").first()
+		documento = visita.asistentes.order_by("nombre_completo").first().numero_documento
+		self._registrar(visita.id, documento, "ENTRADA", 0)
+
+		fila = next(fila for fila in obtener_filas(FILTROS_TODAS) if fila["tipo"] == "Interna" and fila["id"] == visita.id)
+		asistente = next(a for a in fila["asistentes"] if a["numero_documento"] == documento)
+		self.assertEqual(asistente["hora_entrada"], self.inicio)
+		self.assertIsNone(asistente["hora_salida"])
+
+
+@override_settings(CACHES=CACHE_EN_MEMORIA)
+class ReporteCacheTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		_sembrar_visitas(3)
+
+	def test_paginas_en_cache_no_consultan_mientras_no_cambien_los_datos(self):
+		pagina = paginar_filas_en_cache(FILTROS_TODAS)
+		with self.assertNumQueries(0):
+			self.assertEqual(paginar_filas_en_cache(FILTROS_TODAS), pagina)
+
+		otros_filtros = dict(FILTROS_TODAS, tipo="externa")
+		self.assertEqual(paginar_filas_en_cache(otros_filtros)["total"], 3)
+
+	def test_cambios_en_visitas_y_asistentes_invalidan_la_cache(self):
+		self.assertEqual(paginar_filas_en_cache(FILTROS_TODAS)["total"], 6)
+
+		with self.captureOnCommitCallbacks(execute=True):
+			_crear_visita_interna(nombre_programa="Programa Nuevo")
+		self.assertEqual(paginar_filas_en_cache(FILTROS_TODAS)["total"], 7)
+
+		visita = VisitaExterna.objects.order_by("id").first()
+		with self.captureOnCommitCallbacks(execute=True):
+			visita.asistentes.first().delete()
+		filas = paginar_filas_en_cache(FILTROS_TODAS)["filas"]
+		fila = next(f for f in filas if f["tipo"] == "Externa" and f["id"] == visita.id)
+		self.assertEqual(fila["total_asistentes"], 1)
+
+	def test_filas_completas_no_se_guardan_en_cache(self):
+		with mock.patch("reportes.datos.cache") as cache_reportes:
+			obtener_filas(FILTROS_TODAS)
+		cache_reportes.set.assert_not_called()
+
+	def test_registro_de_acceso_invalida_la_cache(self):
+		pagina = paginar_filas_en_cache(FILTROS_TODAS)
+		with self.assertNumQueries(0):
+			paginar_filas_en_cache(FILTROS_TODAS)
+
+		with self.captureOnCommitCallbacks(execute=True):
+			RegistroAccesoMina.objects.create(
+				documento="1", nombre_completo="Persona", categoria="Visitante Interno",
+				visita_tipo="interna", visita_id=pagina["filas"][0]["id"], tipo="ENTRADA",
+			)
+		with self.assertNumQueries(4):
+			paginar_filas_en_cache(FILTROS_TODAS)
+
+
+class ResumenesTests(TestCase):
+	def setUp(self):
+		self.hoy = timezone.localdate()
+		self.ahora = timezone.localtime().replace(minute=10, second=0, microsecond=0)
+
+	def _resumen_visitas(self):
+		return {
+			(r.fecha, r.tipo, r.estado): r.total
+			for r in ResumenDiarioVisitas.objects.exclude(total=0)
+		}
+
+	def _resumen_accesos(self):
+		return {(r.hora, r.tipo): r.total for r in ResumenHorarioAccesos.objects.exclude(total=0)}
+
+	def _registrar(self, tipo, fecha_hora):
+		with self.captureOnCommitCallbacks(execute=True):
+			return RegistroAccesoMina.objects.create(
+				documento="100", nombre_completo="Persona", categoria="Visitante Interno",
+				visita_tipo="interna", visita_id=1, tipo=tipo, fecha_hora=fecha_hora,
+			)
+
+	def test_resumen_de_visitas_sigue_altas_cambios_de_estado_y_borrados(self):
+		ayer = self.ahora - timedelta(days=1)
+		interna = _crear_visita_interna(estado="pendiente", fecha_solicitud=ayer)
+		_crear_visita_interna(estado="pendiente", fecha_solicitud=ayer)
+		externa = _crear_visita_externa(fecha_solicitud=self.ahora)
+		self.assertEqual(self._resumen_visitas(), {
+			(ayer.date(), "interna", "pendiente"): 2,
+			(self.hoy, "externa", "aprobada_final"): 1,
+		})
+
+		interna.estado = "aprobada_final"
+		interna.save()
+		externa.save(update_fields=["nombre"])
+		externa.delete()
+		self.assertEqual(self._resumen_visitas(), {
+			(ayer.date(), "interna", "pendiente"): 1,
+			(ayer.date(), "interna", "aprobada_final"): 1,
+		})
+
+	def test_resumen_de_accesos_por_hora_incluye_registros_por_lote(self):
+		hora = self.ahora.replace(minute=0)
+		self._registrar("ENTRADA", self.ahora)
+		salida = self._registrar("SALIDA", self.ahora + timedelta(minutes=20))
+		self.assertEqual(self._resumen_accesos(), {(hora, "ENTRADA"): 1, (hora, "SALIDA"): 1})
+
+		with self.captureOnCommitCallbacks(execute=True):
+			salida.delete()
+		self.assertEqual(self._resumen_accesos(), {(hora, "ENTRADA"): 1})
+
+		lote = RegistroAccesoMina.objects.bulk_create([
+			RegistroAccesoMina(
+				documento=str(i), nombre_completo="Persona", categoria="Visitante Interno",
+				visita_tipo="interna", visita_id=1, tipo="ENTRADA", fecha_hora=self.ahora,
+			)
+			for i in range(3)
+		])
+		with self.assertNumQueries(1), self.captureOnCommitCallbacks(execute=True):
+			registrar_accesos(lote)
+		self.assertEqual(self._resumen_accesos(), {(hora, "ENTRADA"): 4})
+
+	def test_resumen_de_accesos_se_escribe_despues_de_confirmar_el_escaneo(self):
+		hora = self.ahora.replace(minute=0)
+		with self.captureOnCommitCallbacks() as callbacks:
+			RegistroAccesoMina.objects.create(
+				documento="100", nombre_completo="Persona", categoria="Visitante Interno",
+				visita_tipo="interna", visita_id=1, tipo="ENTRADA", fecha_hora=self.ahora,
+			)
+			# Dentro de la transacción del escaneo no se toca la fila del resumen.
+			self.assertEqual(self._resumen_accesos(), {})
+
+		for callback in callbacks:
+			callback()
+		self.assertEqual(self._resumen_accesos(), {(hora, "ENTRADA"): 1})
+
+	def test_reconstruccion_coincide_con_el_mantenimiento_incremental(self):
+		_crear_visita_interna(estado="pendiente", fecha_solicitud=self.ahora - timedelta(days=40))
+		_crear_visita_interna(fecha_solicitud=self.ahora)
+		_crear_visita_externa(fecha_solicitud=self.ahora).delete()
+		_crear_visita_externa(estado="rechazada", fecha_solicitud=self.ahora)
+		self._registrar("ENTRADA", self.ahora - timedelta(days=2))
+		self._registrar("SALIDA", self.ahora)
+		visitas, accesos = self._resumen_visitas(), self._resumen_accesos()
+
+		ResumenDiarioVisitas.objects.all().delete()
+		ResumenHorarioAccesos.objects.all().delete()
+		reconstruir_resumenes()
+		self.assertEqual(self._resumen_visitas(), visitas)
+		self.assertEqual(self._resumen_accesos(), accesos)
+
+		# Las altas con bulk_create no pasan por signals: la reconstrucción las incluye.
+		_sembrar_visitas(2)
+		reconstruir_resumenes()
+		self.assertEqual(sum(self._resumen_visitas().values()), 7)
+
+	def test_tendencias_agrupan_por_periodo_con_dos_consultas(self):
+		_crear_visita_interna(estado="pendiente", fecha_solicitud=self.ahora)
+		_crear_visita_interna(fecha_solicitud=self.ahora)
+		_crear_visita_externa(fecha_solicitud=self.ahora - timedelta(days=400))
+		self._registrar("ENTRADA", self.ahora)
+		self._registrar("SALIDA", self.ahora + timedelta(minutes=30))
+		self._registrar("ENTRADA", self.ahora - timedelta(days=400))
+
+		with self.assertNumQueries(2):
+			datos = obtener_tendencias(self.hoy - timedelta(days=30), self.hoy, "mes")
+		periodo = self.hoy.replace(day=1).isoformat()
+		self.assertEqual(datos["visitas"], [{
+			"periodo": periodo, "interna": 2, "externa": 0, "total": 2,
+			"por_estado": {"pendiente": 1, "aprobada_final": 1},
+		}])
+		self.assertEqual(datos["accesos"], [{"periodo": periodo, "entradas": 1, "salidas": 1}])
+
+		datos = obtener_tendencias(self.hoy - timedelta(days=800), self.hoy, "anio")
+		self.assertEqual(sum(fila["total"] for fila in datos["visitas"]), 3)
+		self.assertEqual(sum(fila["entradas"] for fila in datos["accesos"]), 2)
+
+	def test_endpoint_de_tendencias_valida_parametros(self):
+		admin = User.objects.create_user(username="admin", password="1234", is_staff=True)
+		self.client.force_login(admin)
+		_crear_visita_externa(fecha_solicitud=self.ahora)
+
+		respuesta = self.client.get(reverse("reportes:tendencias"))
+		self.assertEqual(respuesta.status_code, 200)
+		datos = respuesta.json()
+		self.assertEqual(datos["hasta"], self.hoy.isoformat())
+		self.assertEqual(datos["visitas"][-1]["externa"], 1)
+
+		self.assertEqual(self.client.get(reverse("reportes:tendencias"), {"agrupar": "siglo"}).status_code, 400)
+		respuesta = self.client.get(reverse("reportes:tendencias"), {"fecha_desde": "2026-02-01", "fecha_hasta": "2026-01-01"})
+		self.assertEqual(respuesta.status_code, 400)
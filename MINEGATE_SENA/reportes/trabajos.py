@@ -0,0 +1,210 @@
+﻿"""
+Trabajos de generación de reportes en segundo plano.
+
+El usuario solicita un reporte y recibe un trabajo; un hilo lo genera y
+guarda el archivo en MEDIA_ROOT mientras la interfaz consulta el progreso.
+La clave del trabajo se deriva de los filtros normalizados, el formato, la
+versión de los datos (reportes.versiones) y una marca leída de la base de
+datos (marca_datos): si ya existe un trabajo completado con la misma clave,
+se devuelve ese archivo sin generar nada. La marca hace que un archivo
+guardado no se reutilice aunque el contador en caché se pierda o no se vea
+desde otro proceso cuando se agregan o eliminan visitas, asistentes o
+registros de acceso.
+"""
+
+import hashlib
+import json
+import logging
+import tempfile
+import threading
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from control_acceso_mina.models import RegistroAccesoMina
+
+from .datos import contar_visitas, filtrar_visitas, filtros_serializables, iterar_filas, obtener_filas
+from .excel import escribir_reporte_visitas
+from .models import TrabajoReporte
+from .pdf import escribir_reporte_visitas_pdf
+from .versiones import obtener_version_datos
+
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONES = {"pdf": "pdf", "xlsx": "xlsx"}
+
+# Cada cuántas filas se guarda el progreso de un trabajo.
+_INTERVALO_PROGRESO = 50
+
+# Un trabajo sin terminar después de este tiempo se considera abandonado
+# (por ejemplo, si el proceso del servidor se reinició mientras generaba).
+_TIEMPO_MAXIMO = timedelta(minutes=30)
+
+
+def _filtros_desde_json(datos):
+	return {
+		"tipo": datos["tipo"],
+		"estado": datos["estado"],
+		"fecha_desde": date.fromisoformat(datos["fecha_desde"]) if datos["fecha_desde"] else None,
+		"fecha_hasta": date.fromisoformat(datos["fecha_hasta"]) if datos["fecha_hasta"] else None,
+	}
+
+
+def marca_datos(filtros):
+	"""
+	Huella durable de los datos que cubre el reporte: cantidad y último id de
+	las visitas y asistentes filtrados por tipo, y último registro de acceso.
+	"""
+	marca = []
+	for queryset in filtrar_visitas(filtros):
+		if queryset is None:
+			marca.append(None)
+			continue
+		marca.append(queryset.aggregate(
+			total_visitas=Count("id", distinct=True),
+			ultima_visita=Max("id"),
+			total_asistentes=Count("asistentes", distinct=True),
+			ultimo_asistente=Max("asistentes__id"),
+		))
+	marca.append(RegistroAccesoMina.objects.aggregate(ultimo=Max("id"))["ultimo"])
+	return marca
+
+
+def clave_trabajo(formato, filtros, version=None):
+	if version is None:
+		version = obtener_version_datos()
+	contenido = json.dumps(
+		[formato, filtros_serializables(filtros), version, marca_datos(filtros)],
+		sort_keys=True,
+	)
+	return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+def _trabajo_vigente(clave):
+	return (
+		TrabajoReporte.objects.filter(clave=clave, estado__in=["pendiente", "procesando", "completado"])
+		.order_by("-fecha_creacion")
+		.first()
+	)
+
+
+def solicitar_reporte(formato, filtros, usuario=None):
+	"""
+	Retorna el trabajo que corresponde a los filtros: uno completado o en curso
+	con la misma clave, o uno nuevo que se genera en segundo plano.
+
+	La restricción trabajo_reporte_clave_en_curso admite un solo trabajo en
+	curso por clave: si dos peticiones iguales llegan a la vez, la segunda
+	recibe el trabajo que creó la primera en lugar de generar otro.
+	"""
+	clave = clave_trabajo(formato, filtros)
+	existente = _trabajo_vigente(clave)
+	if existente and existente.estado == "completado" and existente.archivo:
+		return existente
+	if existente and existente.estado != "completado":
+		if existente.fecha_creacion >= timezone.now() - _TIEMPO_MAXIMO:
+			return existente
+		TrabajoReporte.objects.filter(id=existente.id).update(
+			estado="error",
+			mensaje_error="El trabajo no terminó a tiempo.",
+			fecha_finalizacion=timezone.now(),
+		)
+
+	limpiar_trabajos_antiguos()
+	try:
+		with transaction.atomic():
+			trabajo = TrabajoReporte.objects.create(
+				clave=clave,
+				formato=formato,
+				filtros=filtros_serializables(filtros),
+				solicitado_por=usuario,
+			)
+	except IntegrityError:
+		# Otra petición creó el trabajo entre la consulta y el create.
+		return _trabajo_vigente(clave)
+	transaction.on_commit(lambda: _iniciar_en_segundo_plano(trabajo.id))
+	return trabajo
+
+
+def _iniciar_en_segundo_plano(trabajo_id):
+	threading.Thread(
+		target=_ejecutar_en_hilo,
+		args=(trabajo_id,),
+		daemon=True,
+	).start()
+
+
+def _ejecutar_en_hilo(trabajo_id):
+	close_old_connections()
+	try:
+		ejecutar_trabajo(trabajo_id)
+	finally:
+		close_old_connections()
+
+
+def ejecutar_trabajo(trabajo_id):
+	"""Genera el archivo de un trabajo pendiente y lo deja completado o con error."""
+	actualizados = TrabajoReporte.objects.filter(id=trabajo_id, estado="pendiente").update(estado="procesando")
+	if not actualizados:
+		return
+	trabajo = TrabajoReporte.objects.get(id=trabajo_id)
+	filtros = _filtros_desde_json(trabajo.filtros)
+
+	def progreso(procesadas, total):
+		if total and (procesadas % _INTERVALO_PROGRESO == 0 or procesadas == total):
+			# El último tramo se reserva para escribir y guardar el archivo.
+			porcentaje = min(int(procesadas * 90 / total), 90)
+			TrabajoReporte.objects.filter(id=trabajo_id).update(progreso=porcentaje)
+
+	try:
+		if trabajo.formato == "pdf":
+			archivo = _generar_pdf(filtros, progreso)
+		else:
+			archivo = _generar_excel(filtros, progreso)
+
+		with archivo:
+			nombre = f"reporte_visitas_{trabajo.id}.{EXTENSIONES[trabajo.formato]}"
+			trabajo.archivo.save(nombre, File(archivo), save=False)
+		trabajo.estado = "completado"
+		trabajo.progreso = 100
+	except Exception as exc:
+		logger.exception("Error generando el trabajo de reporte %s", trabajo_id)
+		trabajo.estado = "error"
+		trabajo.mensaje_error = str(exc)[:500]
+
+	trabajo.fecha_finalizacion = timezone.now()
+	trabajo.save(update_fields=["estado", "progreso", "archivo", "mensaje_error", "fecha_finalizacion"])
+	return trabajo
+
+
+def _generar_pdf(filtros, progreso):
+	archivo = tempfile.TemporaryFile()
+	escribir_reporte_visitas_pdf(obtener_filas(filtros), archivo, progreso=progreso)
+	archivo.seek(0)
+	return archivo
+
+
+def _generar_excel(filtros, progreso):
+	total = contar_visitas(filtros)
+
+	def filas_con_progreso():
+		for procesadas, fila in enumerate(iterar_filas(filtros), start=1):
+			yield fila
+			progreso(procesadas, total)
+
+	return escribir_reporte_visitas(filas_con_progreso())
+
+
+def limpiar_trabajos_antiguos():
+	"""Elimina los trabajos (y sus archivos) más antiguos que la retención configurada."""
+	horas = getattr(settings, "REPORTES_TRABAJOS_RETENCION_HORAS", 24)
+	limite = timezone.now() - timedelta(hours=horas)
+	for trabajo in TrabajoReporte.objects.filter(fecha_creacion__lt=limite).exclude(estado="procesando"):
+		if trabajo.archivo:
+			trabajo.archivo.delete(save=False)
+		trabajo.delete()
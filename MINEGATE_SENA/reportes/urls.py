@@ -6,6 +6,11 @@ app_name = "reportes"
 
 urlpatterns = [
 	path("", views.index, name="index"),
+	path("asistentes/<str:tipo>/<int:id_visita>/", views.asistentes_visita, name="asistentes_visita"),
+	path("tendencias/", views.tendencias, name="tendencias"),
+	path("trabajos/", views.solicitar_trabajo, name="solicitar_trabajo"),
+	path("trabajos/<int:id_trabajo>/", views.estado_trabajo, name="estado_trabajo"),
+	path("trabajos/<int:id_trabajo>/descargar/", views.descargar_trabajo, name="descargar_trabajo"),
 	path("descargar/pdf/", views.descargar_pdf, name="descargar_pdf"),
 	path("descargar/excel/", views.descargar_excel, name="descargar_excel"),
 	path("descargar/pdf/<str:tipo>/<int:id_visita>/", views.descargar_pdf_individual, name="descargar_pdf_individual"),
@@ -0,0 +1,23 @@
+﻿"""
+Versión de los datos de los reportes.
+
+Un contador en caché que se incrementa cada vez que se guarda o elimina una
+visita, un asistente o un registro de acceso (ver reportes.signals). Los
+resultados derivados de esos datos, como las filas en caché y los archivos
+de los trabajos de reporte, se guardan bajo una clave que incluye la
+versión: mientras no cambie, se pueden reutilizar. El contador se maneja con
+core.versiones, que lo mantiene creciente aunque la caché se reinicie.
+"""
+
+from core.versiones import incrementar_version, obtener_version
+
+
+CLAVE_VERSION_DATOS = "reportes:version_datos"
+
+
+def obtener_version_datos():
+	return obtener_version(CLAVE_VERSION_DATOS)
+
+
+def incrementar_version_datos():
+	return incrementar_version(CLAVE_VERSION_DATOS)
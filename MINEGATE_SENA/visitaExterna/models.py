@@ -79,6 +79,10 @@ class VisitaExterna(models.Model):
         verbose_name = "Visita Externa"
         verbose_name_plural = "Visitas Externas"  
         db_table = 'visita_externa'
+        indexes = [
+            # Listados combinados ordenados por solicitud (vista visita_unificada).
+            models.Index(fields=['fecha_solicitud', 'id'], name='visita_externa_fsol_id_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nombre} - {self.nombre_responsable}"
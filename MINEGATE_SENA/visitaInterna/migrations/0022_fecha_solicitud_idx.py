@@ -0,0 +1,17 @@
+# Generated by Django 4.2.27 on 2026-10-18 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visitaInterna', '0021_alter_visitainterna_estado_historialreprogramacion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='visitainterna',
+            index=models.Index(fields=['fecha_solicitud', 'id'], name='visita_interna_fsol_id_idx'),
+        ),
+    ]
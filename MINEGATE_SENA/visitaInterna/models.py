@@ -88,6 +88,10 @@ class VisitaInterna(models.Model):
         verbose_name_plural = "Visitas Internas"
         ordering = ['-id']
         db_table = 'visita_interna'
+        indexes = [
+            # Listados combinados ordenados por solicitud (vista visita_unificada).
+            models.Index(fields=['fecha_solicitud', 'id'], name='visita_interna_fsol_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nombre_programa}"